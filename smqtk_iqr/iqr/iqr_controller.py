@@ -100,7 +100,9 @@ class IqrController:
             now = time.time()
             with self._map_rlock:
                 LOG.debug("Checking session expiration timeouts")
-                for sid in self._iqr_session_timeout.keys():
+                # Copy the keys, as expired sessions are removed while
+                # iterating.
+                for sid in list(self._iqr_session_timeout.keys()):
                     to = self._iqr_session_timeout[sid]
                     la = self._iqr_session_last_access[sid]
                     t = now - la
@@ -227,13 +229,17 @@ class IqrController:
         """
         Remove an IQR Session by session UUID.
 
+        The removed session is closed, waking any threads waiting for it to
+        change.
+
         :raises KeyError: The given UUID doesn't exist in this controller.
 
         :param session_uuid: Session UUID
 
         """
         with self._map_rlock:
-            del self._iqr_sessions[session_uuid]
+            session = self._iqr_sessions.pop(session_uuid)
             if session_uuid in self._iqr_session_timeout:
                 del self._iqr_session_timeout[session_uuid]
                 del self._iqr_session_last_access[session_uuid]
+        session.close()
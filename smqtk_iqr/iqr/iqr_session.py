@@ -1,4 +1,6 @@
+from collections import Counter
 import io
+import itertools
 import json
 import logging
 import threading
@@ -91,6 +93,17 @@ class IqrSession ():
         self.uuid = session_uid or str(uuid.uuid1()).replace('-', '')
         self.lock = threading.RLock()
 
+        # Revision of this session's adjudication, working set and result
+        # state. This is incremented whenever any of these change.
+        self.revision = 0
+        # Notified whenever the revision changes, or the session is closed.
+        self._revision_cond = threading.Condition(self.lock)
+        # If this session was removed from use, see ``close``.
+        self.closed = False
+        # Random token distinguishing this session instance from others that
+        # may later be created with the same UUID.
+        self._instance_token = uuid.uuid4().hex[:8]
+
         self.pos_seed_neighbors = int(pos_seed_neighbors)
         self.distance_metric = distance_metric
         self.autoneg_select_ratio: int = autoneg_select_ratio
@@ -117,6 +130,13 @@ class IqrSession ():
         self.positive_descriptors: Set[DescriptorElement] = set()
         self.negative_descriptors: Set[DescriptorElement] = set()
 
+        # Number of positively/negatively adjudicated descriptors, external or
+        # in the working set, per descriptor UID. This index is built on first
+        # use by ``get_adjudication_state`` and then maintained incrementally
+        # as adjudications change. None when not built.
+        self._pos_uid_counts: Optional[Counter] = None
+        self._neg_uid_counts: Optional[Counter] = None
+
         # Sets of descriptor elements that were used in the last refinement
         #   to achieve the currently cached results, i.e. "contributed" to the
         #   current results state.
@@ -163,6 +183,56 @@ class IqrSession ():
         # RankRelvancy instance that is used for producing results.
         self.rank_relevancy_with_feedback = rank_relevancy_with_feedback
 
+    @property
+    def change_token(self) -> str:
+        """
+        Opaque token that changes whenever this session's adjudication,
+        working set or result state changes, including across session
+        instances with the same UUID.
+        """
+        return "%s-%d" % (self._instance_token, self.revision)
+
+    def _bump_revision(self) -> None:
+        """
+        Record that the state of this session has changed, waking any threads
+        waiting in ``wait_for_change``.
+        """
+        with self.lock:
+            self.revision += 1
+            self._revision_cond.notify_all()
+
+    def close(self) -> None:
+        """
+        Mark this session as removed from use, e.g. by its controller, waking
+        any threads waiting in ``wait_for_change``.
+        """
+        with self.lock:
+            self.closed = True
+            self._revision_cond.notify_all()
+
+    def wait_for_change(self, revision: int,
+                        timeout: Optional[float] = None) -> int:
+        """
+        Block until this session's revision differs from the one given, until
+        this session is closed or until the timeout elapses. The session lock
+        is released while waiting.
+
+        Callers should check ``closed`` after waiting.
+
+        :param revision: Revision the caller last observed.
+        :param timeout: Maximum number of seconds to wait. If None, wait
+            indefinitely.
+
+        :return: The current revision, which is equal to the given revision
+            if the timeout elapsed or the session was closed without a
+            change.
+        """
+        with self._revision_cond:
+            self._revision_cond.wait_for(
+                lambda: self.revision != revision or self.closed, timeout
+            )
+            return self.revision
+
     def __enter__(self) -> "IqrSession":
         self.lock.acquire()
         return self
@@ -199,11 +269,21 @@ class IqrSession ():
         positive = set(positive)
         negative = set(negative)
         with self.lock:
+            pos_before = set(self.external_positive_descriptors)
             self.external_positive_descriptors.update(positive)
             self.external_positive_descriptors.difference_update(negative)
+            self._update_uid_counts(self._pos_uid_counts, pos_before,
+                                    self.external_positive_descriptors)
 
+            neg_before = set(self.external_negative_descriptors)
             self.external_negative_descriptors.update(negative)
             self.external_negative_descriptors.difference_update(positive)
+            self._update_uid_counts(self._neg_uid_counts, neg_before,
+                                    self.external_negative_descriptors)
+
+            if (pos_before != self.external_positive_descriptors or
+                    neg_before != self.external_negative_descriptors):
+                self._bump_revision()
 
     def adjudicate(
         self,
@@ -256,6 +336,8 @@ class IqrSession ():
             if pos_changed:
                 # Reset ordered positives cache if pos adjudications changed.
                 self._ordered_pos = None
+                self._update_uid_counts(self._pos_uid_counts, pos_before,
+                                        self.positive_descriptors)
 
             neg_before = set(self.negative_descriptors)
             self.negative_descriptors.update(new_negatives)
@@ -265,10 +347,68 @@ class IqrSession ():
             if neg_changed:
                 # Reset ordered negatives cache if neg adjudications changed.
                 self._ordered_neg = None
+                self._update_uid_counts(self._neg_uid_counts, neg_before,
+                                        self.negative_descriptors)
 
             if pos_changed or neg_changed:
                 # Reset non-adjudicated cache if anything changed.
                 self._ordered_non_adj = None
+                self._bump_revision()
+
+    @staticmethod
+    def _update_uid_counts(
+        counts: Optional[Counter],
+        before: Set[DescriptorElement],
+        after: Set[DescriptorElement]
+    ) -> None:
+        """
+        Update an adjudication UID count index, if built, with the change
+        between two states of an adjudicated descriptor set.
+        """
+        if counts is None:
+            return
+        for d in after - before:
+            counts[d.uuid()] += 1
+        for d in before - after:
+            uid = d.uuid()
+            counts[uid] -= 1
+            if counts[uid] <= 0:
+                del counts[uid]
+
+    def get_adjudication_state(
+        self, uids: Iterable[Hashable]
+    ) -> List[Tuple[bool, bool]]:
+        """
+        Get whether descriptors with the given UIDs are currently adjudicated
+        as positive and/or negative, including external adjudications.
+
+        Lookups are constant time per UID against an index that is maintained
+        as adjudications change.
+
+        :param uids: Descriptor UIDs to look up.
+
+        :return: List of ``(is_pos, is_neg)`` tuples parallel to the given
+            UIDs.
+
+        """
+        with self.lock:
+            pos_counts = self._pos_uid_counts
+            if pos_counts is None:
+                pos_counts = self._pos_uid_counts = Counter(
+                    d.uuid() for d in itertools.chain(
+                        self.positive_descriptors,
+                        self.external_positive_descriptors
+                    )
+                )
+            neg_counts = self._neg_uid_counts
+            if neg_counts is None:
+                neg_counts = self._neg_uid_counts = Counter(
+                    d.uuid() for d in itertools.chain(
+                        self.negative_descriptors,
+                        self.external_negative_descriptors
+                    )
+                )
+            return [(uid in pos_counts, uid in neg_counts) for uid in uids]
 
     def update_working_set(self, nn_index: NearestNeighborsIndex) -> None:
         """
@@ -305,6 +445,7 @@ class IqrSession ():
                     nn_index.nn(p, n=self.pos_seed_neighbors)[0]
                 )
                 self._wi_seeds_used.add(p.uuid())
+                self._bump_revision()
 
     def refine(self) -> None:
         """ Refine current model results based on current adjudication state
@@ -387,6 +528,7 @@ class IqrSession ():
             # Clear result view caches
             self._ordered_results = self._ordered_pos = self._ordered_neg = \
                 self._ordered_non_adj = None
+            self._bump_revision()
 
     def ordered_results(self) -> List[Tuple[DescriptorElement, float]]:
         """
@@ -536,6 +678,40 @@ class IqrSession ():
                 # Shallow copy of the list to protect against external mutation
                 return list(r)
 
+    def get_unadjudicated_relevancy_sample(
+        self, n: int
+    ) -> List[Tuple[DescriptorElement, float]]:
+        """
+        Return a sample of ``n`` non-adjudicated descriptor elements as tuples
+        of ``(element, score)``, stratified across relevancy score quantiles,
+        in order of descending relevancy score.
+
+        The ordered non-adjudicated results are split into ``n`` strata of
+        equal size and the middle element of each stratum is selected. This
+        way the sample spans the whole relevancy range instead of only the top
+        of the ranking.
+
+        If there are ``n`` or fewer non-adjudicated results, all of them are
+        returned. If refinement has not yet occurred since session creation
+        or the last reset, an empty list is returned.
+
+        :param n: Number of elements to sample.
+
+        :raises ValueError: The sample size given is negative.
+
+        """
+        if n < 0:
+            raise ValueError("Sample size must not be negative (given {})."
+                             .format(n))
+        if n == 0:
+            return []
+        unadj_ordered = self.get_unadjudicated_relevancy()
+        total = len(unadj_ordered)
+        if total <= n:
+            return unadj_ordered
+        idx = ((np.arange(n) + 0.5) * (total / n)).astype(int)
+        return [unadj_ordered[i] for i in idx]
+
     def reset(self) -> None:
         """ Reset the IQR Search state
 
@@ -549,6 +725,7 @@ class IqrSession ():
             self.negative_descriptors.clear()
             self.external_positive_descriptors.clear()
             self.external_negative_descriptors.clear()
+            self._pos_uid_counts = self._neg_uid_counts = None
             self.rank_contrib_pos.clear()
             self.rank_contrib_pos_ext.clear()
             self.rank_contrib_neg.clear()
@@ -558,6 +735,7 @@ class IqrSession ():
             self.feedback_list = None
             self._ordered_results = self._ordered_pos = self._ordered_neg = \
                 self._ordered_non_adj = None
+            self._bump_revision()
 
     ###########################################################################
     # I/O Methods
@@ -658,3 +836,4 @@ class IqrSession ():
                 for uid, vector_list in source:
                     e = load_descriptor(uid, vector_list)
                     target.add(e)
+            self._bump_revision()
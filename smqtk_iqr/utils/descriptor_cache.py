@@ -0,0 +1,160 @@
+import collections
+import logging
+import os
+import os.path as osp
+import tempfile
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+
+LOG = logging.getLogger(__name__)
+
+
+class DescriptorCache (object):
+    """
+    Thread-safe cache of descriptor vectors keyed by the checksum of the
+    content they were generated from.
+
+    Vectors are held in a bounded in-memory LRU tier and, optionally, in an
+    unbounded on-disk tier of ``.npy`` files that persists across restarts.
+    Vectors found on disk are promoted back into the memory tier.
+
+    Cached vectors are only meaningful for the descriptor generator
+    configuration that produced them, so a disk directory should not be
+    shared between differently configured generators.
+
+    Example::
+
+        >>> cache = DescriptorCache(max_entries=2)
+        >>> cache.get('abc') is None
+        True
+        >>> cache.put('abc', np.zeros(4))
+        >>> cache.get('abc').shape
+        (4,)
+        >>> cache.stats()['hits'], cache.stats()['misses']
+        (1, 1)
+
+    """
+
+    def __init__(self, max_entries: int = 1024,
+                 disk_dir: Optional[str] = None):
+        """
+        :param max_entries: Maximum number of vectors held in memory. Least
+            recently used vectors are evicted beyond this. A value of 0
+            disables the memory tier.
+        :param disk_dir: Optional directory to additionally persist vectors
+            in. This is created if it does not exist.
+
+        :raises ValueError: The given maximum number of entries is negative.
+        """
+        if max_entries < 0:
+            raise ValueError("Maximum number of cache entries must not be "
+                             "negative (given {}).".format(max_entries))
+        self.max_entries = int(max_entries)
+        self.disk_dir = disk_dir
+        if disk_dir is not None and not osp.isdir(disk_dir):
+            os.makedirs(disk_dir)
+        self._lock = threading.RLock()
+        self._entries: "collections.OrderedDict[str, np.ndarray]" = \
+            collections.OrderedDict()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _disk_path(self, key: str) -> str:
+        assert self.disk_dir is not None
+        # Shard by key prefix to keep directory sizes reasonable.
+        return osp.join(self.disk_dir, key[:2], key + '.npy')
+
+    def _put_memory(self, key: str, vector: np.ndarray) -> None:
+        # Assumes the lock is held.
+        if self.max_entries == 0:
+            return
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Get the cached vector for the given content checksum, if any.
+
+        :param key: Content checksum string.
+
+        :return: Cached vector or None if not cached. The returned array
+            should not be modified.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return vector
+            if self.disk_dir is not None:
+                try:
+                    vector = np.load(self._disk_path(key))
+                except (IOError, ValueError):
+                    vector = None
+                if vector is not None:
+                    self._put_memory(key, vector)
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return vector
+            self._misses += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """
+        Cache a vector for the given content checksum.
+
+        :param key: Content checksum string.
+        :param vector: Descriptor vector to cache.
+        """
+        vector = np.asarray(vector)
+        with self._lock:
+            self._put_memory(key, vector)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            if not osp.isfile(path):
+                d = osp.dirname(path)
+                if not osp.isdir(d):
+                    os.makedirs(d, exist_ok=True)
+                # Write-then-rename so concurrent readers never see a partial
+                # file.
+                fd, tmp_path = tempfile.mkstemp(suffix='.npy', dir=d)
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        np.save(f, vector)
+                    os.replace(tmp_path, path)
+                except Exception:
+                    LOG.warning("Failed to write cached descriptor to '%s'",
+                                path, exc_info=True)
+                    if osp.exists(tmp_path):
+                        os.remove(tmp_path)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache usage statistics.
+
+        :return: Dictionary of the number of ``hits`` (of which
+            ``disk_hits`` were from the disk tier), ``misses``, memory tier
+            ``evictions``, current memory tier ``entries`` and the
+            ``max_entries`` bound.
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
@@ -0,0 +1,115 @@
+import numpy as np
+from typing import Optional, Union
+
+
+class IndexPermutation (object):
+    """
+    Seeded pseudo-random permutation over the integer range ``[0, size)``.
+
+    This is a bijection computed on demand via a balanced Feistel network with
+    cycle-walking, so any index or contiguous run of indices may be mapped
+    without materializing (or shuffling) the whole range. The same ``size``
+    and ``seed`` always produce the same permutation.
+
+    Example paging through a permuted sequence::
+
+        >>> p = IndexPermutation(10, seed=0)
+        >>> sorted(p.page(0, 10).tolist())
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+        >>> p.page(2, 5).tolist() == p.page(0, 10)[2:5].tolist()
+        True
+
+    """
+
+    #: Number of Feistel rounds applied.
+    ROUNDS = 4
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        """
+        :param size: Number of elements in the permuted range.
+        :param seed: Integer seed of the permutation. If None, a seed is
+            randomly generated.
+
+        :raises ValueError: The given size is negative.
+        """
+        if size < 0:
+            raise ValueError("Permutation size must not be negative (given {})."
+                             .format(size))
+        if seed is None:
+            seed = int(np.random.randint(0, 2**31 - 1))
+        self.size = int(size)
+        self.seed = int(seed)
+        # Half-width in bits of the smallest even-width power-of-two domain
+        # covering ``size``. Cycle-walking out of the ``[size, 4*size)`` excess
+        # therefore takes fewer than 4 steps on average.
+        self._half_bits = max(1, (max(self.size - 1, 1).bit_length() + 1) // 2)
+        self._half_mask = np.uint64((1 << self._half_bits) - 1)
+        rng = np.random.RandomState(self.seed % 2**32)
+        self._round_keys = rng.randint(0, 2**32, size=self.ROUNDS,
+                                       dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _round(self, r: np.ndarray, key: np.uint64) -> np.ndarray:
+        """
+        Feistel round function: a multiply-xorshift mix of ``r`` with the
+        round key, truncated to the half-width.
+        """
+        x = r ^ key
+        x = x * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(29)
+        x = x * np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(32)
+        return x & self._half_mask
+
+    def _encrypt(self, x: np.ndarray) -> np.ndarray:
+        shift = np.uint64(self._half_bits)
+        left = x >> shift
+        right = x & self._half_mask
+        for key in self._round_keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << shift) | right
+
+    def permute(self, indices: Union[int, np.ndarray]) -> np.ndarray:
+        """
+        Map indices in ``[0, size)`` to their permuted positions.
+
+        :param indices: Integer index or array of indices to map.
+
+        :raises IndexError: An index was outside the ``[0, size)`` range.
+
+        :return: Array of permuted indices the same shape as the input, which
+            is 0-dimensional for a scalar index.
+        """
+        idx = np.asarray(indices, dtype=np.int64)
+        if idx.size and (idx.min() < 0 or idx.max() >= self.size):
+            raise IndexError("Permutation index out of range [0, {})."
+                             .format(self.size))
+        # Work on a 1D array so that scalar input may be assigned into.
+        x = np.atleast_1d(idx).astype(np.uint64)
+        # The round function relies on uint64 multiplication wrapping around.
+        with np.errstate(over='ignore'):
+            out = self._encrypt(x)
+            # Cycle-walk values landing outside of the range back into it.
+            walk = out >= self.size
+            while walk.any():
+                out[walk] = self._encrypt(out[walk])
+                walk = out >= self.size
+        return out.astype(np.int64).reshape(idx.shape)
+
+    def page(self, i: Optional[int] = None,
+             j: Optional[int] = None) -> np.ndarray:
+        """
+        Get the permuted indices for the ``[i, j)`` slice of the permuted
+        sequence, with python slice semantics for omitted or negative bounds.
+
+        :param i: Starting position (inclusive).
+        :param j: Ending position (exclusive).
+
+        :return: Array of permuted indices.
+        """
+        start, stop, _ = slice(i, j).indices(self.size)
+        if stop <= start:
+            return np.empty((0,), dtype=np.int64)
+        return self.permute(np.arange(start, stop, dtype=np.int64))
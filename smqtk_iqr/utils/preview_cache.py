@@ -1,22 +1,48 @@
-import imageio  # type: ignore
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import json
 import logging
 import os
-import shutil
-from typing import Callable, Dict, Hashable
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import PIL.Image
 
 from smqtk_iqr.utils import video
 import smqtk_dataprovider
+from smqtk_dataprovider.impls.data_element.file import DataFileElement
 from smqtk_dataprovider.utils.file import safe_create_dir
-from smqtk_iqr.utils.mimetype import get_mimetypes
 
 
 LOG = logging.getLogger(__name__)
-MIMETYPES = get_mimetypes()
+
+
+class PreviewPending (Exception):
+    """
+    A preview is being generated in the background and is not available yet.
+    """
 
 
 class PreviewCache (object):
     """
     Create and cache saved located of preview images for data elements.
+
+    Previews are downscaled thumbnails stored in a content-addressed directory
+    structure (by data element SHA1 checksum), so they persist across
+    restarts and are shared between data elements of identical content. When
+    a size budget is given, the least recently used previews are removed
+    once the total size of the stored previews exceeds it.
+
+    Metadata of each preview (its shape, format and size in bytes) is recorded
+    once when the preview is generated, kept in memory and persisted in a JSON
+    sidecar file next to the preview, so it never needs to be re-read from the
+    image itself.
+
+    Video previews are generated in the background, one ffmpeg pass per video.
+    Until a video preview is ready, requests for it raise ``PreviewPending``
+    and a placeholder image (see ``placeholder_path``) may be shown instead.
     """
 
     # Preview generation methods based on content type
@@ -29,21 +55,215 @@ class PreviewCache (object):
     #   path to the generated preview image.
     PREVIEW_GEN_METHOD: Dict[Hashable, Callable] = {}
 
-    def __init__(self, cache_dir: str):
+    # File extensions of supported thumbnail image formats.
+    IMAGE_FORMAT_EXT = {
+        "JPEG": ".jpg",
+        "WEBP": ".webp",
+        "PNG": ".png",
+    }
+
+    # File extensions of supported animated video preview formats.
+    VIDEO_FORMAT_EXT = {
+        "WEBP": ".webp",
+        "GIF": ".gif",
+    }
+
+    # File extension appended to a preview's path for its metadata sidecar.
+    METADATA_EXT = ".json"
+
+    def __init__(self, cache_dir: str, max_dimension: int = 256,
+                 image_format: str = "JPEG",
+                 max_bytes: Optional[int] = None,
+                 video_format: str = "WEBP",
+                 video_workers: int = 1):
         """
         :param cache_dir: Directory to cache preview image elements into.
+            Previews already in this directory are reused.
+        :param max_dimension: Maximum width and height in pixels of generated
+            previews. Aspect ratio is preserved.
+        :param image_format: PIL format name to save image previews in. One
+            of "JPEG", "WEBP" or "PNG".
+        :param max_bytes: Optional total size budget in bytes of the stored
+            previews, beyond which the least recently used ones are removed.
+        :param video_format: Format to save animated video previews in. One
+            of "WEBP" or "GIF".
+        :param video_workers: Number of video previews generated concurrently
+            in the background.
+
+        :raises ValueError: Unsupported image or video format or invalid
+            maximum dimension or size.
         """
+        image_format = image_format.upper()
+        if image_format not in self.IMAGE_FORMAT_EXT:
+            raise ValueError("Unsupported preview image format '%s'. Must be "
+                             "one of: %s"
+                             % (image_format,
+                                ', '.join(sorted(self.IMAGE_FORMAT_EXT))))
+        video_format = video_format.upper()
+        if video_format not in self.VIDEO_FORMAT_EXT:
+            raise ValueError("Unsupported preview video format '%s'. Must be "
+                             "one of: %s"
+                             % (video_format,
+                                ', '.join(sorted(self.VIDEO_FORMAT_EXT))))
+        if max_dimension < 1:
+            raise ValueError("Maximum preview dimension must be positive "
+                             "(given %s)." % max_dimension)
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("Maximum preview cache size must not be negative "
+                             "(given %s)." % max_bytes)
         self._cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_dimension = int(max_dimension)
+        self.image_format = image_format
+        self.max_bytes = max_bytes
+        self.video_format = video_format
+        self._lock = threading.RLock()
         # Cache of preview images for data elements encountered.
         self._preview_cache: Dict[Hashable, str] = {}
-        self._video_work_dir = os.path.join(cache_dir, 'tmp_video_work')
+        # Sizes in bytes of the stored previews, least recently used first.
+        self._preview_sizes: "collections.OrderedDict[str, int]" = \
+            collections.OrderedDict()
+        self._total_bytes = 0
+        # Metadata of stored previews.
+        self._preview_metadata: Dict[str, Dict[str, Any]] = {}
+        # Content checksums of data elements encountered, by UUID, so that
+        # polling for a pending preview does not hash its data again.
+        self._content_checksums: Dict[Hashable, str] = {}
+        # Background generation of video previews, by preview path.
+        self._video_executor = ThreadPoolExecutor(
+            max_workers=video_workers,
+            thread_name_prefix="PreviewCache-video"
+        )
+        self._pending_videos: Dict[str, Future] = {}
+        self._scan_cache_dir()
 
-    def __del__(self) -> None:
+    @property
+    def total_bytes(self) -> int:
         """
-        Cleanup after ourselves.
+        :return: Total size in bytes of the stored previews.
+        """
+        with self._lock:
+            return self._total_bytes
+
+    def _preview_dir(self) -> str:
+        # Previews of different sizes are kept apart so that changing the
+        # configuration does not serve stale previews.
+        return os.path.join(self._cache_dir, "%dpx" % self.max_dimension)
+
+    def _scan_cache_dir(self) -> None:
+        """
+        Index previews stored by previous runs, least recently modified first.
+        """
+        preview_dir = self._preview_dir()
+        if not os.path.isdir(preview_dir):
+            return
+        found = []
+        for dirpath, _, filenames in os.walk(preview_dir):
+            for fn in filenames:
+                if fn.endswith(('.tmp', self.METADATA_EXT)):
+                    continue
+                fp = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(fp)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, fp, st.st_size))
+        for _, fp, size in sorted(found):
+            self._preview_sizes[fp] = size
+            self._total_bytes += size
+        LOG.debug("Found %d stored previews (%d bytes)",
+                  len(self._preview_sizes), self._total_bytes)
+        self._evict()
+
+    def _touch(self, fp: str) -> None:
+        """
+        Mark a stored preview as most recently used, indexing it if new.
+        Assumes the lock is held.
+        """
+        if fp in self._preview_sizes:
+            self._preview_sizes.move_to_end(fp)
+        else:
+            size = os.path.getsize(fp)
+            self._preview_sizes[fp] = size
+            self._total_bytes += size
+        # Persist recency across restarts.
+        try:
+            os.utime(fp)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """
+        Remove least recently used previews until within the size budget,
+        always keeping the most recently used one. Assumes the lock is held.
+        """
+        if self.max_bytes is None:
+            return
+        evicted = set()
+        while self._total_bytes > self.max_bytes and \
+                len(self._preview_sizes) > 1:
+            fp, size = self._preview_sizes.popitem(last=False)
+            self._total_bytes -= size
+            evicted.add(fp)
+            self._preview_metadata.pop(fp, None)
+            LOG.debug("Evicting preview '%s'", fp)
+            for path in (fp, fp + self.METADATA_EXT):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if evicted:
+            self._preview_cache = {k: v for k, v in self._preview_cache.items()
+                                   if v not in evicted}
+
+    def preview_path(self, elem: smqtk_dataprovider.DataElement,
+                     ext: str) -> str:
+        """
+        Get the content-addressed path of the preview for the given data
+        element.
+
+        :param elem: Data element to get the preview path for.
+        :param ext: Preview file extension, including the leading dot.
+
+        :return: Path to the preview image for the given data element.
+        """
+        uid = elem.uuid()
+        with self._lock:
+            checksum = self._content_checksums.get(uid)
+        if checksum is None:
+            checksum = self._content_sha1(elem)
+            with self._lock:
+                self._content_checksums[uid] = checksum
+        return os.path.join(self._preview_dir(), checksum[:2],
+                            checksum + ext)
+
+    @staticmethod
+    def _content_sha1(elem: smqtk_dataprovider.DataElement,
+                      chunk_size: int = 2**20) -> str:
+        """
+        Get the SHA1 checksum of a data element's content, streaming files
+        from disk instead of reading them into memory whole.
+        """
+        if isinstance(elem, DataFileElement):
+            sha1 = hashlib.sha1()
+            with open(elem.write_temp(), 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    sha1.update(chunk)
+            return sha1.hexdigest()
+        return elem.sha1()
+
+    def placeholder_path(self) -> str:
+        """
+        Get the path to a placeholder image to show while a preview is
+        pending, creating it if needed.
+
+        :return: Path to the placeholder image.
         """
-        for fp in self._preview_cache.values():
-            os.remove(fp)
+        fp = os.path.join(self._cache_dir, "pending.png")
+        if not os.path.isfile(fp):
+            img = PIL.Image.new("RGB", (self.max_dimension,
+                                        self.max_dimension), (192, 192, 192))
+            self._save_image(img, fp, "PNG")
+        return fp
 
     def get_preview_image(self, elem: smqtk_dataprovider.DataElement) -> str:
         """
@@ -52,15 +272,63 @@ class PreviewCache (object):
         :raises ValueError: Do not know how to generate a preview image for the
             given element's content type.
 
+        :raises PreviewPending: The preview is being generated in the
+            background.
+
         :param elem: Data element to generate a preview image for.
 
         :return: Path to the preview image for the given data element.
 
         """
-        if elem.uuid() in self._preview_cache:
-            return self._preview_cache[elem.uuid()]
+        return self.get_preview(elem)[0]
+
+    def get_preview(
+        self, elem: smqtk_dataprovider.DataElement
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Get the filepath to the preview image for the given data element
+        together with its metadata.
+
+        Unlike calling ``get_metadata`` after ``get_preview_image``, the
+        preview cannot be evicted in between.
 
-        # else, generate preview image based on content type / content class
+        :raises ValueError: Do not know how to generate a preview image for the
+            given element's content type.
+
+        :raises PreviewPending: The preview is being generated in the
+            background.
+
+        :param elem: Data element to generate a preview image for.
+
+        :return: Path to the preview image for the given data element, and the
+            preview's metadata as returned by ``get_metadata``.
+
+        """
+        with self._lock:
+            fp = self._preview_cache.get(elem.uuid())
+            if fp is not None and os.path.isfile(fp):
+                self._touch(fp)
+                return fp, self._load_metadata(fp)
+
+        while True:
+            fp = self._generate_preview(elem)
+            with self._lock:
+                # Another preview stored meanwhile may have evicted this one.
+                if os.path.isfile(fp):
+                    metadata = self._load_metadata(fp)
+                    self._preview_cache[elem.uuid()] = fp
+                    self._preview_metadata[fp] = metadata
+                    self._touch(fp)
+                    self._evict()
+                    return fp, metadata
+            LOG.debug("Preview '%s' was evicted before use, generating it "
+                      "again", fp)
+
+    def _generate_preview(self, elem: smqtk_dataprovider.DataElement) -> str:
+        """
+        Generate the preview image of a data element based on its content type
+        or content class, returning its path.
+        """
         if elem.content_type() in self.PREVIEW_GEN_METHOD:
             LOG.debug("Generating preview image based on content type: "
                       "%s", elem.content_type)
@@ -79,58 +347,170 @@ class PreviewCache (object):
                 raise ValueError("No preview generation method for the data "
                                  "element provided, of content type '%s'."
                                  % elem.content_type())
-        self._preview_cache[elem.uuid()] = fp
         return fp
 
-    # noinspection PyMethodMayBeStatic
+    def get_metadata(self, preview_path: str) -> Dict[str, Any]:
+        """
+        Get the metadata of a preview image returned by
+        ``get_preview_image``.
+
+        :param preview_path: Path to the preview image.
+
+        :return: Dictionary of the preview's ``shape`` as (width, height), its
+            PIL image ``format`` and its size in ``bytes``. This should not be
+            modified.
+        """
+        metadata = self._load_metadata(preview_path)
+        with self._lock:
+            self._preview_metadata[preview_path] = metadata
+        return metadata
+
+    def _load_metadata(self, preview_path: str) -> Dict[str, Any]:
+        """
+        Get the metadata of a preview image from memory or its sidecar file,
+        otherwise reading it from the image and writing its sidecar file.
+        """
+        with self._lock:
+            metadata = self._preview_metadata.get(preview_path)
+        if metadata is not None:
+            return metadata
+        sidecar_path = preview_path + self.METADATA_EXT
+        try:
+            with open(sidecar_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            pass
+        # Opening only reads the image header.
+        with PIL.Image.open(preview_path) as img:
+            metadata = {
+                "shape": list(img.size),
+                "format": img.format,
+                "bytes": os.path.getsize(preview_path),
+            }
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp',
+                                        dir=os.path.dirname(preview_path))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metadata, f)
+            os.replace(tmp_path, sidecar_path)
+        except Exception:
+            LOG.warning("Failed to write preview metadata to '%s'",
+                        sidecar_path, exc_info=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return metadata
+
+    @staticmethod
+    def _save_image(img: PIL.Image.Image, output_fp: str,
+                    image_format: str) -> None:
+        """
+        Atomically save an image to the given path.
+        """
+        out_dir = os.path.dirname(output_fp)
+        safe_create_dir(out_dir)
+        fd, tmp_fp = tempfile.mkstemp(suffix='.tmp', dir=out_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, format=image_format)
+            os.replace(tmp_fp, output_fp)
+        except BaseException:
+            if os.path.exists(tmp_fp):
+                os.remove(tmp_fp)
+            raise
+
+    # noinspection PyUnusedLocal
     def gen_image_preview(
         self, elem: smqtk_dataprovider.DataElement, output_dir: str
     ) -> str:
         """
-        Copy temporary image to specified output filepath.
+        Save a downscaled thumbnail of the image to the content-addressed
+        preview path.
 
         :param elem: Data element to get the preview image for.
 
-        :param output_dir: Directory to save generated image to.
+        :param output_dir: Directory to save generated image to. Unused, as
+            the preview path is determined by the element's content.
 
         """
-        output_fp = os.path.join(
-            output_dir,
-            "%s%s" % (str(elem.uuid()),
-                      MIMETYPES.guess_extension(elem.content_type()))  # type: ignore
+        output_fp = self.preview_path(
+            elem, self.IMAGE_FORMAT_EXT[self.image_format]
         )
         if not os.path.isfile(output_fp):
             tmp_img_fp = elem.write_temp()
-            shutil.copy(tmp_img_fp, output_fp)
-            elem.clean_temp()
+            try:
+                with PIL.Image.open(tmp_img_fp) as img:
+                    img.thumbnail((self.max_dimension, self.max_dimension))
+                    thumb: PIL.Image.Image = img
+                    # JPEG cannot store alpha or palette images.
+                    if self.image_format == "JPEG" and img.mode != "RGB":
+                        thumb = img.convert("RGB")
+                    self._save_image(thumb, output_fp, self.image_format)
+            finally:
+                elem.clean_temp()
         return output_fp
 
+    # noinspection PyUnusedLocal
     def gen_video_preview(
         self, elem: smqtk_dataprovider.DataElement, output_dir: str
     ) -> str:
         """
-        Copy temporary image to specified output filepath.
+        Queue generation of a downscaled, animated preview of frames sampled
+        from the video to the content-addressed preview path.
 
         :param elem: Data element to get the preview image for.
 
-        :param output_dir: Directory to save generated image to.
+        :param output_dir: Directory to save generated image to. Unused, as
+            the preview path is determined by the element's content.
+
+        :raises PreviewPending: The preview is being generated in the
+            background.
+
+        :raises RuntimeError: Generation of the preview failed. It is
+            attempted again when next requested.
 
         """
-        output_fp = os.path.join(output_dir,
-                                 "%s.gif" % elem.uuid())
-        if not os.path.isfile(output_fp):
-            tmp_vid_fp = elem.write_temp()
-            interval = 0.5  # ~2fps gif
-            fm = video.ffmpeg_extract_frame_map(
-                self._video_work_dir, tmp_vid_fp,
-                second_interval=interval
+        output_fp = self.preview_path(
+            elem, self.VIDEO_FORMAT_EXT[self.video_format]
+        )
+        with self._lock:
+            future = self._pending_videos.get(output_fp)
+            if future is not None and future.done():
+                del self._pending_videos[output_fp]
+                # Raises the generation error, if any.
+                future.result()
+                return output_fp
+            if os.path.isfile(output_fp):
+                return output_fp
+            if future is None:
+                LOG.debug("Queuing video preview generation for '%s'",
+                          output_fp)
+                self._pending_videos[output_fp] = self._video_executor.submit(
+                    self._write_video_preview, elem, output_fp
+                )
+        raise PreviewPending("Preview of '%s' is being generated."
+                             % elem.uuid())
+
+    def _write_video_preview(self, elem: smqtk_dataprovider.DataElement,
+                             output_fp: str) -> None:
+        """
+        Atomically write an animated preview of a video with ffmpeg.
+        """
+        out_dir = os.path.dirname(output_fp)
+        safe_create_dir(out_dir)
+        fd, tmp_fp = tempfile.mkstemp(suffix='.tmp', dir=out_dir)
+        os.close(fd)
+        # Files are used in place, other elements are written out once.
+        tmp_vid_fp = elem.write_temp()
+        try:
+            video.ffmpeg_animated_preview(
+                tmp_vid_fp, tmp_fp, self.video_format.lower(),
+                max_dimension=self.max_dimension, fps=2
             )
-            img_arrays = []
-            for frm_num in sorted(fm.keys()):
-                img_arrays.append(imageio.imread(fm[frm_num]))
-            imageio.mimwrite(output_fp, img_arrays, duration=interval)
+            os.replace(tmp_fp, output_fp)
+        finally:
             elem.clean_temp()
-        return output_fp
+            if os.path.exists(tmp_fp):
+                os.remove(tmp_fp)
 
 
 PreviewCache.PREVIEW_GEN_METHOD = {
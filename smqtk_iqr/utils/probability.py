@@ -72,8 +72,8 @@ def adjust_proba(proba: Union[np.ndarray, Iterable],
     if np.any(adj_proba < 0):
         raise ValueError("Probabilities must be at least 0.")
     # After eliminating the possibility of a negative value, we only need to
-    # test if the sum is close to zero
-    if np.isclose(adj_proba.sum(), 0):
+    # test if the sum of each row is close to zero
+    if np.any(np.isclose(adj_proba.sum(axis=1), 0)):
         raise ValueError("At least one probability must be positive.")
 
     # Prevent exponential overflow (this cancels out on return)
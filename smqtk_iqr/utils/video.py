@@ -120,6 +120,55 @@ def ffmpeg_extract_frame(
     #                        % (t, p.returncode))
 
 
+def ffmpeg_animated_preview(
+    input_filepath: str, output_filepath: str, output_format: str = 'webp',
+    max_dimension: int = 256, fps: float = 2, max_duration: float = 0,
+    ffmpeg_exe: str = 'ffmpeg'
+) -> None:
+    """
+    Generate a downscaled, looping animated preview of a video in one pass.
+
+    Frames are sampled, scaled and encoded as they are decoded by a single
+    ffmpeg process, so neither the video nor its frames are held in memory or
+    written to intermediate files.
+
+    :raises RuntimeError: ffmpeg failed to generate the preview.
+
+    :param input_filepath: Path to the video to generate a preview of.
+
+    :param output_filepath: Path to write the preview to.
+
+    :param output_format: ffmpeg output format of the preview, e.g. "webp" or
+        "gif".
+
+    :param max_dimension: Maximum width and height in pixels of the preview.
+        Aspect ratio is preserved.
+
+    :param fps: Frames per second to sample from the video.
+
+    :param max_duration: Maximum number of seconds of the video to preview.
+        If <=0, the whole video is previewed.
+
+    :param ffmpeg_exe: ffmpeg executable to use. By default, we attempt to use
+        what is available of the PATH.
+
+    """
+    vf = "fps=%s,scale=w=%d:h=%d:force_original_aspect_ratio=decrease" \
+         % (fps, max_dimension, max_dimension)
+    cmd = [ffmpeg_exe, '-y', '-loglevel', 'error', '-i', input_filepath]
+    if max_duration > 0:
+        cmd += ['-t', str(max_duration)]
+    cmd += ['-vf', vf, '-an', '-loop', '0', '-f', output_format,
+            output_filepath]
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+    _, err = p.communicate()
+    if p.returncode:
+        raise RuntimeError("FFmpeg failed to generate a preview of '%s' "
+                           "(return code: %d). Error:\n%s"
+                           % (input_filepath, p.returncode, err))
+
+
 def ffmpeg_extract_frame_map(
     working_dir: str, video_filepath: str, second_offset: float = 0,
     second_interval: float = 0, max_duration: float = 0, frames: Iterable[int] = (),
@@ -1,7 +1,10 @@
+import threading
 import time
-from typing import Tuple, Iterable, Union, Any
+from typing import Dict, IO, Tuple, Iterable, Optional, Union, Any
 import flask
 import requests
+import requests.adapters
+from urllib3.util.retry import Retry
 
 from smqtk_core.dict import merge_dict
 
@@ -36,43 +39,144 @@ def make_response_json(
 class ServiceProxy (object):
     """
     Helper class for interacting with an external service.
+
+    Requests are made through a shared ``requests.Session`` whose connection
+    pool keeps connections to the service alive between requests. Requests
+    failing to connect, or receiving a 502, 503 or 504 response to an
+    idempotent method, are retried with exponential backoff.
+
+    Latency counters are kept per method and endpoint, see ``stats``.
     """
 
-    def __init__(self, url: str):
+    #: Response status codes of idempotent requests that are retried.
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(
+        self, url: str, pool_size: int = 10,
+        timeout: Optional[float] = None, retries: int = 2,
+        backoff_factor: float = 0.1
+    ):
         """
         Parameters
         ---
             url : str
                 URL to base requests on.
+            pool_size : int
+                Maximum number of connections to the service kept alive for
+                reuse.
+            timeout : float | None
+                Seconds to wait for the service to respond before giving up.
+                If None, wait forever.
+            retries : int
+                Number of times a failed request is retried.
+            backoff_factor : float
+                Factor of the exponential backoff between retries in seconds.
         """
         # Append http:// to the head of the URL if neither http(s) are present
         if not (url.startswith('http://') or url.startswith('https://')):
             url = 'http://' + url
         self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=backoff_factor,
+                              status_forcelist=self.RETRY_STATUSES,
+                              raise_on_status=False)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # (method, endpoint) to request count, error count and total and
+        # maximum latency in seconds.
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
 
     def _compose(self, endpoint: str) -> str:
         return '/'.join([self.url, endpoint])
 
+    def _request(self, method: str, endpoint: str,
+                 **kwargs: Any) -> requests.Response:
+        s = time.perf_counter()
+        error = True
+        try:
+            r = self.session.request(method, self._compose(endpoint),
+                                     timeout=self.timeout, **kwargs)
+            error = r.status_code >= 500
+            return r
+        finally:
+            elapsed = time.perf_counter() - s
+            with self._stats_lock:
+                st = self._stats.setdefault((method, endpoint), {
+                    'count': 0, 'errors': 0,
+                    'total_seconds': 0., 'max_seconds': 0.,
+                })
+                st['count'] += 1
+                st['errors'] += error
+                st['total_seconds'] += elapsed
+                st['max_seconds'] = max(st['max_seconds'], elapsed)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get latency counters of requests made through this proxy.
+
+        :return: Dictionary of "<METHOD> <endpoint>" keys to the number of
+            requests made (``count``), the number of those that failed or
+            received a server error response (``errors``), and the total,
+            mean and maximum request latency in seconds (``total_seconds``,
+            ``mean_seconds``, ``max_seconds``).
+        """
+        with self._stats_lock:
+            return {
+                '%s %s' % key: dict(st, mean_seconds=st['total_seconds'] /
+                                    st['count'])
+                for key, st in self._stats.items()
+            }
+
     def get(
         self, endpoint: str, **params: Union[str, Iterable[str], bytes, None]
     ) -> requests.Response:
         # Make params None if its empty.
-        return requests.get(self._compose(endpoint), params)
+        return self._request('GET', endpoint, params=params)
 
     def post(
         self, endpoint: str, **params: Union[str, Iterable[str], bytes, None]
     ) -> requests.Response:
         # Make params None if its empty.
-        return requests.post(self._compose(endpoint), data=params)
+        return self._request('POST', endpoint, data=params)
+
+    def post_body(
+        self, endpoint: str, body: Union[bytes, IO[bytes]], content_type: str,
+        **params: Union[str, Iterable[str], bytes, None]
+    ) -> requests.Response:
+        """
+        POST a raw request body, sending parameters as URL arguments.
+
+        File objects are streamed as the body instead of being read into
+        memory.
+
+        :param endpoint: Endpoint to POST to.
+        :param body: Body bytes or binary file object to stream.
+        :param content_type: Mimetype of the body.
+        :param params: URL arguments.
+
+        :return: Response of the request.
+        """
+        return self._request('POST', endpoint, params=params, data=body,
+                             headers={'Content-Type': content_type})
 
     def put(
         self, endpoint: str, **params: Union[str, Iterable[str], bytes, None]
     ) -> requests.Response:
         # Make params None if its empty.
-        return requests.put(self._compose(endpoint), data=params)
+        return self._request('PUT', endpoint, data=params)
 
     def delete(
         self, endpoint: str, **params: Union[str, Iterable[str], bytes, None]
     ) -> requests.Response:
         # Make params None if its empty.
-        return requests.delete(self._compose(endpoint), params=params)
+        return self._request('DELETE', endpoint, params=params)
@@ -2,16 +2,29 @@ from __future__ import print_function
 
 import base64
 import binascii
+import collections
+import io
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import json
 import pickle
+import tempfile
+import threading
+import time
 import unittest.mock as mock
+import uuid
 import urllib.parse
 
 import flask
 import six
 import logging
 
-from typing import Any, List, Dict, Optional, Tuple, Union
+from typing import (
+    Any, BinaryIO, cast, Dict, Hashable, Iterator, List, Optional, Sequence,
+    Tuple, Union
+)
+
+import numpy as np
 
 from smqtk_relevancy import RankRelevancy
 from smqtk_descriptors import (
@@ -29,11 +42,18 @@ from smqtk_iqr.iqr import IqrSession
 from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
 from smqtk_descriptors.impls.descriptor_set.memory import MemoryDescriptorSet
 from smqtk_iqr.utils import probability
+from smqtk_iqr.utils.descriptor_cache import DescriptorCache
 from smqtk_core.configuration import (
     make_default_config,
     from_config_dict
 )
 from smqtk_iqr.utils.web import make_response_json
+from smqtk_iqr.web.classifier_service.lazy_classifier_collection import \
+    LazyClassifyDescriptorCollection
+from smqtk_iqr.web.classifier_service.model_store import \
+    ClassifierModelStore
+from smqtk_iqr.web.classifier_service.result_cache import \
+    ClassificationResultCache
 import smqtk_iqr.web
 
 LOG = logging.getLogger(__name__)
@@ -94,6 +114,74 @@ def labels_from_input(label_str: Optional[str]) -> Optional[List[str]]:
     return labels
 
 
+def adjustments_from_input(adjustment_str: Optional[str]) -> Dict[str, float]:
+    """
+    Parse out optional class probability adjustments from the provided
+    JSON-encoded dictionary of class labels to numeric values.
+
+    :param str adjustment_str: JSON encoded value to parse from.
+
+    :raises ValueError: Invalid adjustment string.
+
+    :return: Dictionary of class labels to adjustment values. This is empty if
+        no adjustments were provided.
+    :rtype: dict[str, float]
+    """
+    if adjustment_str is None:
+        return {}
+    try:
+        adjustments = json.loads(adjustment_str)
+    except json.JSONDecodeError:
+        raise ValueError("Adjustment(s) are not properly formatted JSON.")
+    if not isinstance(adjustments, dict):
+        raise ValueError("Adjustment(s) must be a JSON object of labels to "
+                         "values.")
+    for label, val in adjustments.items():
+        if not isinstance(label, str):
+            raise ValueError("Adjustment label '%s' is not a string type."
+                             % label)
+        if not isinstance(val, (int, float)):
+            raise ValueError("Adjustment value %s for label '%s' is not an "
+                             "int or float" % (val, label))
+    return adjustments
+
+
+def adjust_predictions(
+    predictions: Sequence[Dict[Hashable, float]],
+    adjustments: Dict[str, float]
+) -> List[Dict[Hashable, float]]:
+    """
+    Apply class probability adjustments to a sequence of class-to-probability
+    predictions from one classifier. See
+    ``smqtk_iqr.utils.probability.adjust_proba``.
+
+    The predictions are adjusted together as a single ``(n_items,
+    n_classes)`` matrix, so all predictions must have the same class labels,
+    as is the case for the output of a single classifier.
+
+    Adjustment values are negated before being applied, following the
+    convention of higher values corresponding to higher precision (and lower
+    recall) for a class.
+
+    :param predictions: Class-to-probability predictions to adjust.
+    :param adjustments: Class label to adjustment value mapping. Classes not
+        present are not adjusted.
+
+    :raises ValueError: Prediction probabilities were invalid.
+
+    :return: New list of adjusted predictions.
+    """
+    if not predictions:
+        return []
+    proba_labels = list(predictions[0].keys())
+    proba = np.array([[p[k] for k in proba_labels] for p in predictions],
+                     dtype=float)
+    adj = np.array([-adjustments.get(cast(str, label), 0.0)
+                    for label in proba_labels])
+    adj_proba = probability.adjust_proba(proba, adj)
+    return [dict(zip(proba_labels, row)) for row in adj_proba.tolist()]
+
+
 class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
     """
     Headless web-app providing a RESTful API for classifying new data against
@@ -128,13 +216,20 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
     """
 
     CONFIG_ENABLE_CLASSIFIER_REMOVAL = "enable_classifier_removal"
+    CONFIG_CLASSIFY_BATCH_SIZE = "classify_batch_size"
+    CONFIG_DESCRIPTOR_CACHE = "descriptor_cache"
+    CONFIG_CLASSIFY_UIDS_CACHE_SIZE = "classify_uids_cache_size"
     CONFIG_CLASSIFIER_COLLECTION = "classifier_collection"
+    CONFIG_MAX_RESIDENT_CLASSIFIERS = "max_resident_classifiers"
+    CONFIG_MODEL_STORE_DIR = "classifier_model_store_dir"
     CONFIG_CLASSIFICATION_FACTORY = "classification_factory"
     CONFIG_DESCRIPTOR_GENERATOR = "descriptor_generator"
     CONFIG_DESCRIPTOR_FACTORY = "descriptor_factory"
     CONFIG_DESCRIPTOR_SET = "descriptor_set"
     CONFIG_IMMUTABLE_LABELS = "immutable_labels"
     CONFIG_IQR_CLASSIFIER = "iqr_state_classifier_config"
+    CONFIG_IQR_TRAINING_WORKERS = "iqr_classifier_training_workers"
+    CONFIG_IQR_TRAINING_JOB_HISTORY = "iqr_classifier_training_job_history"
 
     DEFAULT_IQR_STATE_CLASSIFIER_KEY = '__default__'
 
@@ -148,9 +243,38 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
 
         c[cls.CONFIG_ENABLE_CLASSIFIER_REMOVAL] = False
 
-        # Static classifier configurations
+        # Number of items described and classified together by
+        # POST /classify_batch.
+        c[cls.CONFIG_CLASSIFY_BATCH_SIZE] = 32
+
+        # Cache of descriptor vectors keyed by content checksum, so repeated
+        # classification of the same content skips descriptor generation.
+        # Up to `max_entries` vectors are held in memory. If `disk_dir` is
+        # set, vectors are also persisted there as ".npy" files.
+        c[cls.CONFIG_DESCRIPTOR_CACHE] = {
+            "max_entries": 1024,
+            "disk_dir": None,
+        }
+        # Number of per-classifier, per-UID predictions of POST /classify_uids
+        # to cache. A value of 0 disables caching.
+        c[cls.CONFIG_CLASSIFY_UIDS_CACHE_SIZE] = 10000
+
+        # Static classifier configurations. These are instantiated on first
+        # use rather than at startup.
         c[cls.CONFIG_CLASSIFIER_COLLECTION] = \
             ClassifyDescriptorCollection.get_default_config()
+        # Maximum number of classifiers kept loaded at a time, whether
+        # configured or added at runtime. Least recently used classifiers are
+        # unloaded beyond this. If None, loaded classifiers are never
+        # unloaded.
+        c[cls.CONFIG_MAX_RESIDENT_CLASSIFIERS] = None
+        # Optional directory to store classifiers uploaded via
+        # POST /classifier or trained via POST /iqr_classifier in. Stored
+        # classifiers are registered again on startup. Without it, they are
+        # stored in a temporary directory for the lifetime of the service.
+        # Either way, they are loaded on first use and may be unloaded like
+        # static classifiers.
+        c[cls.CONFIG_MODEL_STORE_DIR] = None
         # Classification element factory for new classification results.
         c[cls.CONFIG_CLASSIFICATION_FACTORY] = \
             ClassificationElementFactory.get_default_config()
@@ -171,6 +295,12 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
             ClassifyDescriptorSupervised.get_impls()
         )
         c[cls.CONFIG_IMMUTABLE_LABELS] = []
+        # Maximum number of IQR state classifiers trained concurrently. Jobs
+        # beyond this wait in a queue so training does not starve inference.
+        c[cls.CONFIG_IQR_TRAINING_WORKERS] = 1
+        # Number of completed IQR state classifier training jobs whose status
+        # is retained for GET /iqr_classifier_job.
+        c[cls.CONFIG_IQR_TRAINING_JOB_HISTORY] = 100
 
         return c
 
@@ -182,6 +312,25 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
 
         self.immutable_labels = set(json_config[self.CONFIG_IMMUTABLE_LABELS])
 
+        self.classify_batch_size = \
+            int(json_config.get(self.CONFIG_CLASSIFY_BATCH_SIZE, 32))
+
+        descr_cache_config = \
+            json_config.get(self.CONFIG_DESCRIPTOR_CACHE, {})
+        self.descriptor_cache = DescriptorCache(
+            max_entries=int(descr_cache_config.get("max_entries", 1024)),
+            disk_dir=descr_cache_config.get("disk_dir", None),
+        )
+
+        self.classify_uids_cache = ClassificationResultCache(int(
+            json_config.get(self.CONFIG_CLASSIFY_UIDS_CACHE_SIZE, 10000)
+        ))
+        # Version of the classifier currently registered under each label,
+        # incremented whenever a label is (re-)added or removed. Labels not
+        # present are at version 0.
+        self._classifier_versions: Dict[str, int] = {}
+        self._classifier_versions_lock = threading.Lock()
+
         # Convert configuration into SMQTK plugin instances.
         #   - Static classifier configurations.
         #       - Skip the example config key
@@ -197,10 +346,37 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
             ClassificationElementFactory.from_config(
                 json_config[self.CONFIG_CLASSIFICATION_FACTORY]
             )
-        #: :type: ClassifyDescriptorCollection
-        self.classifier_collection = ClassifyDescriptorCollection.from_config(
-            json_config[self.CONFIG_CLASSIFIER_COLLECTION]
-        )
+        #: :type: LazyClassifyDescriptorCollection
+        self.classifier_collection = \
+            LazyClassifyDescriptorCollection.from_config(
+                json_config[self.CONFIG_CLASSIFIER_COLLECTION],
+                max_resident=json_config.get(
+                    self.CONFIG_MAX_RESIDENT_CLASSIFIERS, None),
+            )
+
+        # Store of classifier models added at runtime. Classifiers are
+        # registered with loaders from the store, so they may be unloaded like
+        # configured ones. Without a configured directory, models are stored
+        # in a temporary directory removed with this service.
+        self._model_store_lock = threading.RLock()
+        model_store_dir = json_config.get(self.CONFIG_MODEL_STORE_DIR, None)
+        self._model_store_tmp_dir: Optional[tempfile.TemporaryDirectory] = \
+            None
+        if not model_store_dir:
+            self._model_store_tmp_dir = tempfile.TemporaryDirectory(
+                prefix='classifier_model_store_'
+            )
+            model_store_dir = self._model_store_tmp_dir.name
+        self.model_store = ClassifierModelStore(model_store_dir)
+        for label in self.model_store.labels():
+            try:
+                self.classifier_collection.add_classifier_loader(
+                    label, self.model_store.loader(label)
+                )
+            except ValueError:
+                LOG.warning("Stored classifier model label '%s' conflicts "
+                            "with a configured classifier, ignoring it.",
+                            label)
 
         # Descriptor generator + factory
         self.descriptor_factory = DescriptorElementFactory.from_config(
@@ -226,6 +402,20 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         self.iqr_state_classifier_config = \
             json_config[self.CONFIG_IQR_CLASSIFIER]
 
+        # Background training of IQR state classifiers.
+        self._training_executor = ThreadPoolExecutor(
+            max_workers=int(json_config.get(self.CONFIG_IQR_TRAINING_WORKERS,
+                                            1)),
+            thread_name_prefix="iqr_classifier_training",
+        )
+        self.training_job_history = int(
+            json_config.get(self.CONFIG_IQR_TRAINING_JOB_HISTORY, 100))
+        # Training job ID to status information, oldest first.
+        self._training_jobs: "collections.OrderedDict[str, Dict[str, Any]]" = \
+            collections.OrderedDict()
+        # Lock for the above jobs and for reserving labels of pending jobs.
+        self._training_lock = threading.RLock()
+
         self.add_routes()
 
     def add_routes(self) -> None:
@@ -251,6 +441,12 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         self.add_url_rule('/classify',
                           view_func=self.classify,
                           methods=['POST'])
+        self.add_url_rule('/classify_batch',
+                          view_func=self.classify_batch,
+                          methods=['POST'])
+        self.add_url_rule('/descriptor_cache_stats',
+                          view_func=self.get_descriptor_cache_stats,
+                          methods=['GET'])
         self.add_url_rule('/classifier',
                           view_func=self.get_classifier,
                           methods=['GET'])
@@ -260,6 +456,9 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         self.add_url_rule('/iqr_classifier',
                           view_func=self.add_iqr_state_classifier,
                           methods=['POST'])
+        self.add_url_rule('/iqr_classifier_job',
+                          view_func=self.get_iqr_classifier_job,
+                          methods=['GET'])
         if self.enable_classifier_removal:
             self.add_url_rule('/classifier',
                               view_func=self.del_classifier,
@@ -329,8 +528,6 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         requested classifiers), returning a map of classifier descriptive
         labels to their class-to-probability results.
 
-        TODO: Add `adjustment` param from POST /classify
-
         Arguments
             uid_list:
                 JSON list of UIDs of descriptors in the configured descriptor
@@ -341,10 +538,15 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                 Optional string label or JSON list of string labels defining
                 specific classifiers to use for inferencing against the
                 descriptors.
+            adjustment:
+                Optional JSON-encoded dictionary of labels to floats. See
+                ``POST /classify``.
 
         Possible error codes:
             400
-                No UIDs provided, or provided labels are malformed.
+                No UIDs provided, provided labels or adjustments are
+                malformed, or predictions could not be adjusted (e.g. all
+                class probabilities of a prediction are 0).
             404
                 Label or labels provided do not match any registered
                 classifier
@@ -383,6 +585,11 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                 flask.request.values.get('label', default=None))
         except ValueError as ex:
             return make_response_json(f"Invalid label(s) specified: {ex}", 400)
+        try:
+            adjustments = adjustments_from_input(
+                flask.request.values.get('adjustment', default=None))
+        except ValueError as ex:
+            return make_response_json(str(ex), 400)
 
         # Label list has been parsed at this point. Make sure its contents
         # meshes with available classifiers before retrieving descriptors.
@@ -397,18 +604,88 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                     missing_labels=list(missing_labels))
 
         try:
-            vec_list = self.descriptor_set.get_many_vectors(uid_list)
+            pred_map = self._classify_uids_cached(
+                uid_list,
+                sorted(self.classifier_collection.labels())
+                if labels is None else labels
+            )
         except KeyError:
             return make_response_json("One or more input UIDs did not exist in"
                                       " the configured descriptor set!", 400)
-        pred_map = self.classifier_collection.classify_arrays(
-            vec_list, labels=labels
-        )
-
-        # TODO: Add `adjustment` functionality like from `POST /classify`.
+        except TypeError:
+            return make_response_json("UIDs must be strings or integers.",
+                                      400)
+        if adjustments:
+            try:
+                pred_map = {label: adjust_predictions(preds, adjustments)
+                            for label, preds in pred_map.items()}
+            except ValueError as ex:
+                return make_response_json(str(ex), 400)
 
         return make_response_json("", 200, result=pred_map)
 
+    def _classifier_changed(self, label: str) -> None:
+        """
+        Record that the classifier registered under a label was added,
+        replaced or removed, invalidating its cached results.
+
+        :param label: Classifier label.
+        """
+        with self._classifier_versions_lock:
+            self._classifier_versions[label] = \
+                self._classifier_versions.get(label, 0) + 1
+        self.classify_uids_cache.invalidate(label)
+
+    def _classify_uids_cached(
+        self, uids: Sequence[Hashable], labels: Sequence[str]
+    ) -> Dict[str, List[Dict[Hashable, float]]]:
+        """
+        Classify descriptors of the configured descriptor set by UID, only
+        retrieving and classifying those without cached predictions.
+
+        :param uids: Descriptor UIDs to classify.
+        :param labels: Labels of the classifiers to use.
+
+        :raises KeyError: A UID without cached predictions is not in the
+            configured descriptor set.
+        :raises TypeError: A UID is not hashable.
+        :raises MissingLabelError: A given label is not registered.
+
+        :return: Predictions for each classifier label, parallel to the given
+            UIDs.
+        """
+        pred_map: Dict[str, List[Optional[Dict[Hashable, float]]]] = {}
+        versions = {}
+        missing_uids: Dict[Hashable, None] = {}
+        for label in labels:
+            with self._classifier_versions_lock:
+                versions[label] = self._classifier_versions.get(label, 0)
+            preds = self.classify_uids_cache.get_many(label, versions[label],
+                                                      uids)
+            pred_map[label] = preds
+            for uid, p in zip(uids, preds):
+                if p is None:
+                    missing_uids[uid] = None
+        if missing_uids:
+            m_uids = list(missing_uids)
+            uid_to_idx = {uid: i for i, uid in enumerate(m_uids)}
+            vectors = self.descriptor_set.get_many_vectors(m_uids)
+            for label, preds in pred_map.items():
+                idxs = [i for i, p in enumerate(preds) if p is None]
+                if not idxs:
+                    continue
+                l_uids = [uids[i] for i in idxs]
+                l_preds = self.classifier_collection.classify_arrays(
+                    [cast(np.ndarray, vectors[uid_to_idx[uid]])
+                     for uid in l_uids],
+                    labels=[label]
+                )[label]
+                self.classify_uids_cache.put_many(label, versions[label],
+                                                  l_uids, l_preds)
+                for i, p in zip(idxs, l_preds):
+                    preds[i] = p
+        return cast(Dict[str, List[Dict[Hashable, float]]], pred_map)
+
     # POST /classify
     def classify(self) -> Tuple[flask.Response, int]:
         """
@@ -481,7 +758,8 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
 
         Possible error codes:
             400
-                No bytes provided, or provided labels are malformed
+                No bytes provided, provided labels are malformed, or the
+                prediction could not be adjusted
             404
                 Label or labels provided do not match any registered
                 classifier
@@ -509,27 +787,10 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
             return make_response_json(f"Invalid label(s) specified: {ex}", 400)
 
         # Collect optional result probability adjustment values
-        #: :type: dict[collections.abc.Hashable, float]
-        adjustments = {}
-        if adjustment_str is not None:
-            try:
-                #: :type: dict[collections.abc.Hashable, float]
-                adjustments = json.loads(adjustment_str)
-
-                for label, val in six.iteritems(adjustments):
-                    if not isinstance(label, six.string_types):
-                        return make_response_json(
-                            "Adjustment label '%s' is not a string type."
-                            % label,
-                            400)
-                    if not isinstance(val, (int, float)):
-                        return make_response_json(
-                            "Adjustment value %s for label '%s' is not an int "
-                            "or float" % (val, label),
-                            400)
-            except json.JSONDecodeError:
-                return make_response_json(
-                    "Adjustment(s) are not properly formatted JSON.", 400)
+        try:
+            adjustments = adjustments_from_input(adjustment_str)
+        except ValueError as ex:
+            return make_response_json(str(ex), 400)
 
         if data_b64 is None:
             return make_response_json("No base-64 bytes provided.", 400)
@@ -540,9 +801,8 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         LOG.debug("Length of byte data: %d" % len(data_bytes))
 
         data_elem = DataMemoryElement(data_bytes, content_type, readonly=True)
-        descr_elem = self.descriptor_gen.generate_one_element(
-            data_elem, descr_factory=self.descriptor_factory
-        )
+        descr_elem = self.descriptor_factory.new_descriptor(data_elem.uuid())
+        descr_elem.set_vector(self._describe_data([data_elem])[0])
 
         try:
             clfr_map = self.classifier_collection.classify(
@@ -561,18 +821,248 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         for classifier_label, c_elem in six.iteritems(clfr_map):
             prediction = c_elem.get_classification()
             if adjustments:
-                proba_labels = list(prediction.keys())
-                proba = [prediction[k] for k in proba_labels]
-                # Use opposite of adjustments, because we already set the
-                # convention of "higher: precision, lower: recall"
-                adj = [-adjustments.get(label, 0.0) for label in proba_labels]
-                adj_proba = probability.adjust_proba(proba, adj)
-                prediction = dict(zip(proba_labels, adj_proba[0]))
+                try:
+                    prediction = adjust_predictions([prediction],
+                                                    adjustments)[0]
+                except ValueError as ex:
+                    return make_response_json(str(ex), 400)
             c_json[classifier_label] = prediction
 
         return make_response_json('Finished classification.',
                                   result=c_json)
 
+    # POST /classify_batch
+    def classify_batch(self) -> Tuple[flask.Response, int]:
+        """
+        Describe and classify many data items in one request against all
+        currently stored classifiers (optionally a list of requested
+        classifiers), returning per-item maps of classifier descriptive labels
+        to their class-to-probability results.
+
+        Items are described and classified together in batches of the
+        configured ``classify_batch_size`` size.
+
+        Items may be given either as multipart form file uploads under the
+        ``data`` key, or as a newline-delimited JSON (``application/x-ndjson``)
+        request body where each line is an object with ``bytes_b64`` and
+        ``content_type`` keys. For the latter, other arguments are given as
+        URL parameters.
+
+        With curl on the command line::
+
+            $ curl -X POST localhost:5000/classify_batch \
+                -F "data=@/path/to/file1.png" \
+                -F "data=@/path/to/file2.png"
+
+            $ curl -X POST "localhost:5000/classify_batch?label=some_label" \
+                -H "Content-Type: application/x-ndjson" \
+                --data-binary @/path/to/items.ndjson
+
+        Data/Form arguments:
+            data
+                One or more uploaded files to be described and classified.
+            content_type
+                (Optional) The mimetype of all sent data, overriding the
+                mimetype of uploaded files and used for NDJSON items without
+                one.
+            label
+                (Optional) JSON-encoded label or list of labels
+            adjustment
+                (Optional) JSON-encoded dictionary of labels to floats. See
+                ``POST /classify``.
+
+        Possible error codes:
+            400
+                No items provided, an item is malformed or is missing its
+                content type, or provided labels or adjustments are malformed.
+            404
+                Label or labels provided do not match any registered
+                classifier
+
+        Returns: {
+            ...
+            result: [
+                {
+                    classifier-label: {
+                        class-label: prob,
+                        ...
+                    },
+                    ...
+                },
+                ...
+            ]
+        }
+
+        """
+        content_type = flask.request.values.get('content_type', default=None)
+        label_str = flask.request.values.get('label', default=None)
+        adjustment_str = flask.request.values.get('adjustment', default=None)
+
+        try:
+            labels = labels_from_input(label_str)
+        except ValueError as ex:
+            return make_response_json(f"Invalid label(s) specified: {ex}", 400)
+        try:
+            adjustments = adjustments_from_input(adjustment_str)
+        except ValueError as ex:
+            return make_response_json(str(ex), 400)
+
+        # Check labels before any descriptor generation.
+        if labels is not None:
+            missing_labels = (set(labels) -
+                              set(self.classifier_collection.labels()))
+            if missing_labels:
+                return make_response_json(
+                    "The following labels are not registered with any "
+                    "classifiers: " + ", ".join(map(repr, missing_labels)),
+                    404,
+                    missing_labels=list(missing_labels))
+
+        def iter_items() -> Iterator[Tuple[str, bytes]]:
+            # Yield (content_type, bytes) pairs, decoding lazily so that only
+            # one batch of item bytes is held in memory at a time.
+            if flask.request.mimetype == 'application/x-ndjson':
+                for line_no, line in enumerate(flask.request.stream, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                        item_bytes = base64.b64decode(item['bytes_b64'])
+                        item_ct = item.get('content_type', content_type)
+                    except (ValueError, KeyError, TypeError) as ex:
+                        raise ValueError("Invalid item on line %d: %s"
+                                         % (line_no, ex))
+                    if not item_ct:
+                        raise ValueError("No content type provided for item "
+                                         "on line %d." % line_no)
+                    yield item_ct, item_bytes
+            else:
+                for f in flask.request.files.getlist('data'):
+                    item_ct = content_type or f.mimetype
+                    if not item_ct:
+                        raise ValueError("No content type provided for file "
+                                         "'%s'." % f.filename)
+                    yield item_ct, f.read()
+
+        results: List[Dict[str, Dict[Hashable, float]]] = []
+        item_iter = iter_items()
+        try:
+            batch = list(itertools.islice(item_iter, self.classify_batch_size))
+            while batch:
+                results.extend(
+                    self._classify_data_batch(batch, labels, adjustments)
+                )
+                batch = list(itertools.islice(item_iter,
+                                              self.classify_batch_size))
+        except ValueError as ex:
+            return make_response_json(str(ex), 400)
+        except MissingLabelError as ex:
+            # Classifier removed since labels were checked above.
+            return make_response_json(
+                "The following labels are not registered with any"
+                " classifiers: '%s'"
+                % "', '".join(ex.labels),
+                404,
+                missing_labels=list(ex.labels))
+
+        if not results:
+            return make_response_json("No data items provided.", 400)
+
+        return make_response_json('Finished classification.',
+                                  result=results)
+
+    def _classify_data_batch(
+        self,
+        batch: Sequence[Tuple[str, bytes]],
+        labels: Optional[List[str]],
+        adjustments: Dict[str, float]
+    ) -> List[Dict[str, Dict[Hashable, float]]]:
+        """
+        Describe and classify a batch of data items.
+
+        :param batch: Sequence of ``(content_type, bytes)`` data items.
+        :param labels: Labels of the classifiers to use, or None for all.
+        :param adjustments: Class probability adjustments to apply, if any.
+
+        :raises ValueError: A content type is not supported by the descriptor
+            generator.
+        :raises MissingLabelError: A given label is not registered.
+
+        :return: Classifier label to class-to-probability maps for each item,
+            in input order.
+        """
+        data_elems = [DataMemoryElement(b, ct, readonly=True)
+                      for ct, b in batch]
+        vectors = self._describe_data(data_elems)
+        pred_map = self.classifier_collection.classify_arrays(
+            vectors, labels=labels
+        )
+        if adjustments:
+            pred_map = {label: adjust_predictions(preds, adjustments)
+                        for label, preds in pred_map.items()}
+        return [{label: preds[i] for label, preds in pred_map.items()}
+                for i in range(len(vectors))]
+
+    def _describe_data(
+        self,
+        data_elems: Sequence[DataMemoryElement]
+    ) -> List[np.ndarray]:
+        """
+        Get descriptor vectors for data elements, using the descriptor cache
+        where possible and generating descriptors for the rest together in
+        one call.
+
+        :param data_elems: Data elements to describe.
+
+        :raises ValueError: A content type is not supported by the descriptor
+            generator.
+
+        :return: Descriptor vectors, parallel to the input elements.
+        """
+        # Validate even cached content so that results do not depend on the
+        # cache state.
+        for d in data_elems:
+            self.descriptor_gen.raise_valid_element(d)
+        keys = [d.sha1() for d in data_elems]
+        vectors: List[Optional[np.ndarray]] = \
+            [self.descriptor_cache.get(k) for k in keys]
+        # Describe each distinct missing content once.
+        missing: Dict[str, DataMemoryElement] = {}
+        for k, d, v in zip(keys, data_elems, vectors):
+            if v is None:
+                missing.setdefault(k, d)
+        if missing:
+            descr_elems = list(self.descriptor_gen.generate_elements(
+                missing.values(), descr_factory=self.descriptor_factory
+            ))
+            generated = {k: cast(np.ndarray, e.vector())
+                         for k, e in zip(missing.keys(), descr_elems)}
+            for k, v in generated.items():
+                self.descriptor_cache.put(k, v)
+            vectors = [generated[k] if v is None else v
+                       for k, v in zip(keys, vectors)]
+        return cast(List[np.ndarray], vectors)
+
+    # GET /descriptor_cache_stats
+    def get_descriptor_cache_stats(self) -> Tuple[flask.Response, int]:
+        """
+        Get usage statistics of the descriptor cache used by ``POST
+        /classify`` and ``POST /classify_batch``.
+
+        Returns code 200 and the JSON return object: {
+            ...
+            hits=<int>,
+            disk_hits=<int>,
+            misses=<int>,
+            evictions=<int>,
+            entries=<int>,
+            max_entries=<int>
+        }
+
+        """
+        return make_response_json("Descriptor cache statistics.",
+                                  **self.descriptor_cache.stats())
+
     # GET /classifier
     def get_classifier(self) -> Union[Tuple[flask.Response, int],
                                       Tuple[bytes, int]]:
@@ -597,6 +1087,13 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
             $ curl -X GET localhost:5000/classifier -d label=some_label | \
                 base64 -d > /path/to/file.pkl
 
+        If the request accepts ``application/octet-stream``, the pickled bytes
+        are instead streamed back without base64 encoding. Classifiers from
+        the model store are streamed directly from their stored file::
+
+            $ curl -X GET "localhost:5000/classifier?label=some_label" \
+                -H "Accept: application/octet-stream" -o /path/to/file.pkl
+
         Data args:
             label
                 Label of the requested classifier
@@ -619,7 +1116,44 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                                       404,
                                       label=label)
 
-        clfr = self.classifier_collection.get_classifier(label)
+        binary = \
+            flask.request.accept_mimetypes.best == 'application/octet-stream'
+        if binary:
+            # Open the stored file once, as it may be removed concurrently.
+            try:
+                stored_f = open(self.model_store.path(label), 'rb')
+            except FileNotFoundError:
+                pass
+            else:
+                return flask.send_file(stored_f,
+                                       mimetype='application/octet-stream',
+                                       conditional=False), 200
+
+        try:
+            clfr = self.classifier_collection.get_classifier(label)
+        except (KeyError, FileNotFoundError):
+            # Removed since checking its label.
+            return make_response_json("Label '%s' does not refer to a "
+                                      "classifier currently registered."
+                                      % label,
+                                      404,
+                                      label=label)
+
+        if binary:
+            # Pickle through a temporary file so the pickled bytes are not
+            # held in memory alongside the classifier.
+            f = tempfile.TemporaryFile()
+            try:
+                pickle.dump(clfr, f)
+            except pickle.PicklingError:
+                f.close()
+                return make_response_json("Classifier corresponding to label "
+                                          "'%s' cannot be pickled." % label,
+                                          500,
+                                          label=label)
+            f.seek(0)
+            return flask.send_file(f, mimetype='application/octet-stream',
+                                   conditional=False), 200
 
         try:
             return base64.b64encode(pickle.dumps(clfr)), 200
@@ -671,6 +1205,19 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                 -d "lock_label=true" \
                 --data-urlencode "bytes_b64=$(base64 -w0 /path/to/file)"
 
+        Training happens on a bounded pool of background workers. By default
+        the request waits for training to finish. If "async=true" is given,
+        a 202 response with a training job ID is returned immediately
+        instead, and the job's progress may be queried with
+        ``GET /iqr_classifier_job``. The classifier is added to the collection
+        only once its training has completed. Like uploaded classifiers, the
+        trained classifier is written to the model store::
+
+            $ curl -X POST localhost:5000/iqr_classifier \
+                -d "label=some_label" \
+                -d "async=true" \
+                --data-urlencode "bytes_b64=$(base64 -w0 /path/to/file)"
+
         Form arguments:
             iqr_state_b64
                 base64 encoding of the bytes of the IQR session state save
@@ -682,14 +1229,18 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                 If 'true', disallow deletion of this label. If 'false', allow
                 deletion of this label. Only has an effect if deletion is
                 enabled for this service. (Default: 'false')
+            async
+                If 'true', return once training is queued instead of when it
+                has finished. (Default: 'false')
 
-        Returns 201.
+        Returns 201, or 202 with the training ``job_id`` if asynchronous.
 
         """
         data_b64 = flask.request.values.get('bytes_b64', default=None)
         label = flask.request.values.get('label', default=None)
         lock_clfr_str = flask.request.values.get('lock_label',
                                                  default='false')
+        async_str = flask.request.values.get('async', default='false')
 
         if data_b64 is None or len(data_b64) == 0:
             return make_response_json("No state base64 data provided.", 400)
@@ -702,6 +1253,13 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                                       " 'lock_label'. Was given: '%s'"
                                       % lock_clfr_str,
                                       400)
+        try:
+            train_async = bool(json.loads(async_str))
+        except json.JSONDecodeError:
+            return make_response_json("Invalid boolean value for"
+                                      " 'async'. Was given: '%s'"
+                                      % async_str,
+                                      400)
         try:
             # Using urlsafe version because it handles both regular and urlsafe
             # alphabets.
@@ -709,51 +1267,192 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         except (TypeError, binascii.Error) as ex:
             return make_response_json("Invalid base64 input: %s" % str(ex), 400)
 
-        # If the given label conflicts with one already in the collection,
-        # fail.
-        if label in self.classifier_collection.labels():
-            return make_response_json(
-                "Label already exists in classifier collection.", 400)
-
-        # Create dummy IqrSession to extract pos/neg descriptors.
-        rank_relevancy = mock.MagicMock(spec=RankRelevancy)
-        iqrs = IqrSession(rank_relevancy)
-        iqrs.set_state_bytes(data_bytes, self.descriptor_factory)
-        pos = iqrs.positive_descriptors | iqrs.external_positive_descriptors
-        neg = iqrs.negative_descriptors | iqrs.external_negative_descriptors
-        del iqrs
-
-        # Make a classifier instance from the stored config for IQR
-        # session-based classifiers.
-        # noinspection PyTypeChecker
-        #: :type: ClassifyDescriptorSupervised
-        classifier = from_config_dict(
-            self.iqr_state_classifier_config,
-            ClassifyDescriptorSupervised.get_impls()
-        )
-        classifier.train(class_examples={'positive': pos, 'negative': neg})
+        with self._training_lock:
+            # If the given label conflicts with one already in the collection,
+            # fail.
+            if label in self.classifier_collection.labels():
+                return make_response_json(
+                    "Label already exists in classifier collection.", 400)
+            # Likewise for one reserved by a pending training job.
+            if any(job['label'] == label and job['status'] in ('queued',
+                                                               'running')
+                   for job in self._training_jobs.values()):
+                return make_response_json(
+                    "Label is already being trained.", 400, label=label)
+
+            job_id = uuid.uuid4().hex
+            self._training_jobs[job_id] = {
+                'job_id': job_id,
+                'label': label,
+                'status': 'queued',
+                'error': None,
+                'queued_time': time.time(),
+                'start_time': None,
+                'end_time': None,
+            }
+            self._prune_training_jobs()
+            future = self._training_executor.submit(
+                self._train_iqr_state_classifier,
+                job_id, label, data_bytes, lock_clfr
+            )
+
+        if train_async:
+            return make_response_json("Queued training of IQR-session-based "
+                                      "classifier for label '%s'." % label,
+                                      202,
+                                      label=label, job_id=job_id)
 
         try:
-            self.classifier_collection.add_classifier(label, classifier)
+            future.result()
+        except Exception as ex:
+            # The label was checked to be free before training, so it being
+            # in the collection now means it was added during training.
+            if isinstance(ex, ValueError) and \
+                    label in self.classifier_collection.labels():
+                return make_response_json("Duplicate label ('%s') added "
+                                          "during classifier training of "
+                                          "provided IQR session state."
+                                          % label, 400,
+                                          label=label)
+            return make_response_json("Failed training IQR-session-based "
+                                      "classifier for label '%s': %s"
+                                      % (label, str(ex)), 500,
+                                      label=label, job_id=job_id)
+
+        return make_response_json("Finished training IQR-session-based "
+                                  "classifier for label '%s'." % label,
+                                  201,
+                                  label=label, job_id=job_id)
+
+    def _train_iqr_state_classifier(
+        self, job_id: str, label: str, data_bytes: bytes, lock_clfr: bool
+    ) -> None:
+        """
+        Train a classifier from IQR session state bytes and add it to the
+        classifier collection, recording progress in the given training job.
+
+        :param job_id: ID of the training job to update.
+        :param label: Label to add the trained classifier under.
+        :param data_bytes: IQR session state bytes.
+        :param lock_clfr: Disallow deletion of the new classifier.
+
+        :raises ValueError: The label was added to the collection while
+            training.
+        """
+        with self._training_lock:
+            job = self._training_jobs.get(job_id, {})
+            job['status'] = 'running'
+            job['start_time'] = time.time()
+        try:
+            # Create dummy IqrSession to extract pos/neg descriptors.
+            rank_relevancy = mock.MagicMock(spec=RankRelevancy)
+            iqrs = IqrSession(rank_relevancy)
+            iqrs.set_state_bytes(data_bytes, self.descriptor_factory)
+            pos = iqrs.positive_descriptors | \
+                iqrs.external_positive_descriptors
+            neg = iqrs.negative_descriptors | \
+                iqrs.external_negative_descriptors
+            del iqrs
+
+            # Make a classifier instance from the stored config for IQR
+            # session-based classifiers.
+            # noinspection PyTypeChecker
+            #: :type: ClassifyDescriptorSupervised
+            classifier = from_config_dict(
+                self.iqr_state_classifier_config,
+                ClassifyDescriptorSupervised.get_impls()
+            )
+            classifier.train(class_examples={'positive': pos, 'negative': neg})
+
+            # Classifier is only visible once fully trained. The model is
+            # stored so it may be unloaded, and on restart is registered
+            # again if the store directory is configured.
+            staged_path = self.model_store.stage_classifier(classifier)
+            try:
+                with self._model_store_lock:
+                    if label in self.classifier_collection.labels():
+                        raise ValueError("Duplicate label provided: '%s'"
+                                         % label)
+                    self.model_store.commit(label, staged_path)
+                    try:
+                        self.classifier_collection.add_classifier_loader(
+                            label, self.model_store.loader(label), classifier
+                        )
+                    except BaseException:
+                        self.model_store.remove(label)
+                        raise
+            finally:
+                self.model_store.discard(staged_path)
+            self._classifier_changed(label)
 
             # If we're allowing deletions, get the lock flag from the form and
             # set it for this classifier
             if self.enable_classifier_removal and lock_clfr:
                 self.immutable_labels.add(label)
+        except Exception as ex:
+            LOG.exception("Failed training IQR-session-based classifier for "
+                          "label '%s'", label)
+            with self._training_lock:
+                job['status'] = 'failed'
+                job['error'] = str(ex)
+                job['end_time'] = time.time()
+            raise
+        with self._training_lock:
+            job['status'] = 'finished'
+            job['end_time'] = time.time()
+
+    def _prune_training_jobs(self) -> None:
+        """
+        Drop the status of the oldest completed training jobs beyond the
+        configured history size. Assumes the training lock is held.
+        """
+        done = [j for j, job in self._training_jobs.items()
+                if job['status'] in ('finished', 'failed')]
+        for j in done[:max(len(done) - self.training_job_history, 0)]:
+            del self._training_jobs[j]
 
-        except ValueError as e:
-            if e.args[0].find('JSON') > -1:
-                return make_response_json("Tried to parse malformed JSON in "
-                                          "form argument.", 400)
-            return make_response_json("Duplicate label ('%s') added during "
-                                      "classifier training of provided IQR "
-                                      "session state." % label, 400,
-                                      label=label)
+    # GET /iqr_classifier_job
+    def get_iqr_classifier_job(self) -> Tuple[flask.Response, int]:
+        """
+        Get the status of an IQR state classifier training job started by
+        ``POST /iqr_classifier``.
 
-        return make_response_json("Finished training IQR-session-based "
-                                  "classifier for label '%s'." % label,
-                                  201,
-                                  label=label)
+        URL Arguments:
+            job_id
+                ID of the training job to query.
+
+        Possible error codes:
+            400
+                No job ID provided.
+            404
+                No job for the given ID. Status of completed jobs is only
+                retained for a configured number of the most recent jobs.
+
+        Returns code 200 on success and the JSON return object: {
+            ...
+            job_id=<str>,
+            label=<str>,
+            // One of "queued", "running", "finished" or "failed".
+            status=<str>,
+            // Failure message if the job failed, otherwise null.
+            error=<str|null>,
+            queued_time=<float>,
+            start_time=<float|null>,
+            end_time=<float|null>
+        }
+
+        """
+        job_id = flask.request.values.get('job_id', default=None)
+        if not job_id:
+            return make_response_json("No job ID provided.", 400)
+        with self._training_lock:
+            job = self._training_jobs.get(job_id, None)
+            if job is None:
+                return make_response_json("No training job for ID '%s'."
+                                          % job_id, 404, job_id=job_id)
+            job = dict(job)
+        return make_response_json("Training job '%s' is %s."
+                                  % (job_id, job['status']), 200, **job)
 
     # POST /classifier
     def add_classifier(self) -> Tuple[flask.Response, int]:
@@ -795,6 +1494,19 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                 -d "lock_label=true" \
                 --data-urlencode "bytes_b64=$(base64 -w0 /path/to/file.pkl)"
 
+        Alternatively, the pickled bytes may be streamed as an
+        ``application/octet-stream`` request body without base64 encoding,
+        with the other arguments given as URL parameters::
+
+            $ curl -X POST "localhost:5000/classifier?label=some_label" \
+                -H "Content-Type: application/octet-stream" \
+                --data-binary @/path/to/file.pkl
+
+        Uploaded classifiers are written to the model store, so they may be
+        unloaded and loaded again from it like configured classifiers. If a
+        model store directory is configured, they are also registered again
+        when the service restarts.
+
         Data/Form arguments:
             bytes_b64
                 Bytes, in the standard base64 encoding, of the pickled
@@ -819,12 +1531,20 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
         }
 
         """
-        clfr_b64 = flask.request.values.get('bytes_b64', default=None)
-        label = flask.request.values.get('label', default=None)
-        lock_clfr_str = flask.request.values.get('lock_label',
-                                                 default='false')
+        binary = flask.request.mimetype == 'application/octet-stream'
+        if binary:
+            # Don't touch the form so the body is left unread for streaming.
+            clfr_b64 = None
+            label = flask.request.args.get('label', default=None)
+            lock_clfr_str = flask.request.args.get('lock_label',
+                                                   default='false')
+        else:
+            clfr_b64 = flask.request.values.get('bytes_b64', default=None)
+            label = flask.request.values.get('label', default=None)
+            lock_clfr_str = flask.request.values.get('lock_label',
+                                                     default='false')
 
-        if clfr_b64 is None or len(clfr_b64) == 0:
+        if not binary and (clfr_b64 is None or len(clfr_b64) == 0):
             return make_response_json("No state base64 data provided.", 400)
         elif label is None or len(label) == 0:
             return make_response_json("No descriptive label provided.", 400)
@@ -845,16 +1565,49 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                                       400,
                                       label=label)
 
-        clfr = pickle.loads(base64.b64decode(clfr_b64.encode('utf-8')))
+        if binary:
+            clfr_file: BinaryIO = cast(BinaryIO, flask.request.stream)
+        else:
+            clfr_file = io.BytesIO(
+                base64.b64decode(cast(str, clfr_b64).encode('utf-8'))
+            )
 
         try:
-            self.classifier_collection.add_classifier(label, clfr)
+            # Receive and check the model outside the store lock, so a slow
+            # upload does not hold up other uploads and deletions. The model
+            # is only loaded again when first used.
+            staged_path = self.model_store.stage(clfr_file)
+            try:
+                self.model_store.validate(staged_path)
+                # Serialize storing uploads so concurrent uploads for a label
+                # cannot replace each other's model file.
+                with self._model_store_lock:
+                    if label in self.classifier_collection.labels():
+                        return make_response_json(
+                            "Label '%s' already exists in classifier "
+                            "collection." % label, 400, label=label)
+                    self.model_store.commit(label, staged_path)
+                    try:
+                        self.classifier_collection.add_classifier_loader(
+                            label, self.model_store.loader(label)
+                        )
+                    except BaseException:
+                        self.model_store.remove(label)
+                        raise
+            finally:
+                self.model_store.discard(staged_path)
+            self._classifier_changed(label)
 
             # If we're allowing deletions, get the lock flag from the form
             # and set it for this classifier
             if self.enable_classifier_removal and lock_clfr:
                 self.immutable_labels.add(label)
 
+        except EOFError:
+            return make_response_json("Classifier bytes provided for label "
+                                      "'%s' were empty or truncated." % label,
+                                      400,
+                                      label=label)
         except ValueError:
             return make_response_json("Data added for label '%s' is not a"
                                       " Classifier." % label,
@@ -897,7 +1650,10 @@ class SmqtkClassifierService (smqtk_iqr.web.SmqtkWebApp):
                                       405,
                                       label=label)
 
-        self.classifier_collection.remove_classifier(label)
+        with self._model_store_lock:
+            self.classifier_collection.remove_classifier(label)
+            self.model_store.remove(label)
+        self._classifier_changed(label)
 
         return make_response_json("Removed classifier with label '%s'."
                                   % label,
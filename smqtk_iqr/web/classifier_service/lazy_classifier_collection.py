@@ -0,0 +1,338 @@
+import collections
+import functools
+import logging
+from typing import (
+    Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping,
+    Optional, Sequence, Set, Tuple
+)
+
+import numpy as np
+
+from smqtk_classifier import (
+    ClassificationElement,
+    ClassificationElementFactory,
+    ClassifyDescriptor,
+    ClassifyDescriptorCollection,
+)
+from smqtk_classifier._defaults import DFLT_CLASSIFIER_FACTORY
+from smqtk_classifier.exceptions import MissingLabelError
+from smqtk_core.configuration import (
+    cls_conf_from_config_dict,
+    to_config_dict,
+)
+from smqtk_core.dict import merge_dict
+from smqtk_descriptors import DescriptorElement
+
+
+LOG = logging.getLogger(__name__)
+
+
+class LazyClassifyDescriptorCollection (ClassifyDescriptorCollection):
+    """
+    Classifier collection whose classifiers may be registered by a loader,
+    e.g. from their configuration, and only instantiated on first use.
+
+    At most ``max_resident`` loader-registered classifiers are kept
+    instantiated at a time. Beyond that, the least recently used ones are
+    unloaded and will be re-instantiated by their loader when next used.
+    Configured classifiers should therefore load their models from persistent
+    storage.
+
+    Classifier instances added via ``add_classifier`` have no loader to be
+    re-instantiated with, so they are always kept resident and do not count
+    towards ``max_resident``. Classifiers added at runtime should instead be
+    registered via ``add_classifier_loader`` with a loader from persistent
+    storage, as the classifier service does with its model store.
+
+    Classifiers are loaded without holding the collection's lock, and applying
+    all classifiers (``classify`` and ``classify_arrays``) loads and uses them
+    one at a time, so the least recently used ones may be unloaded in between.
+    """
+
+    def __init__(
+        self,
+        classifiers: Optional[Mapping[str, ClassifyDescriptor]] = None,
+        max_resident: Optional[int] = None,
+        **labeled_classifiers: ClassifyDescriptor
+    ):
+        """
+        :param classifiers: Optional dictionary of semantic label keys and
+            Classifier instance values.
+        :param max_resident: Maximum number of loader-registered classifiers
+            kept instantiated at a time, or None for no limit.
+        :param labeled_classifiers: Key-word arguments may be provided where
+            the key used is considered the semantic label of the provided
+            Classifier instance.
+
+        :raises ValueError: The given maximum number of resident classifiers
+            is not positive.
+        """
+        super(LazyClassifyDescriptorCollection, self).__init__(
+            classifiers, **labeled_classifiers
+        )
+        if max_resident is not None and max_resident < 1:
+            raise ValueError("Maximum number of resident classifiers must be "
+                             "positive (given {}).".format(max_resident))
+        self.max_resident = max_resident
+        # Label to loader of registered but possibly not instantiated
+        # classifiers.
+        self._label_to_loader: Dict[str, Callable[[], ClassifyDescriptor]] = {}
+        # Label to original configuration of classifiers registered from
+        # configuration.
+        self._label_to_config: Dict[str, Dict] = {}
+        # Labels of instantiated loader-registered classifiers, least recently
+        # used first.
+        self._resident_labels: "collections.OrderedDict[str, None]" = \
+            collections.OrderedDict()
+
+    @classmethod
+    def get_default_config(cls) -> Dict[str, Any]:
+        c = super(LazyClassifyDescriptorCollection, cls).get_default_config()
+        # Labels are listed on one level, so the resident limit is given to
+        # ``from_config`` separately instead.
+        del c['max_resident']
+        return c
+
+    @classmethod
+    def from_config(
+        cls,
+        config_dict: Dict,
+        merge_default: bool = True,
+        max_resident: Optional[int] = None
+    ) -> "LazyClassifyDescriptorCollection":
+        """
+        Register classifiers from a ``ClassifyDescriptorCollection``
+        configuration without instantiating them.
+
+        Classifier types are resolved here so that configuration errors are
+        still raised at construction.
+
+        :param config_dict: Collection configuration of labels to classifier
+            configurations.
+        :param merge_default: Merge the given configuration on top of the
+            default provided by ``get_default_config``.
+        :param max_resident: Maximum number of loader-registered classifiers
+            kept instantiated at a time, or None for no limit.
+
+        :raises ValueError: A classifier configuration was invalid.
+
+        :return: New collection instance.
+        """
+        if merge_default:
+            config_dict = merge_dict(cls.get_default_config(), config_dict)
+        inst = cls(max_resident=max_resident)
+        impls = ClassifyDescriptor.get_impls()
+        for label, classifier_config in config_dict.items():
+            # Skip the example section.
+            if label == cls.EXAMPLE_KEY:
+                continue
+            c_type, c_conf = cls_conf_from_config_dict(classifier_config,
+                                                       impls)
+            inst._label_to_loader[label] = \
+                functools.partial(c_type.from_config, c_conf)
+            inst._label_to_config[label] = classifier_config
+        return inst
+
+    def get_config(self) -> Dict[str, Any]:
+        """
+        Get the configuration of classifiers registered from configuration or
+        currently instantiated.
+        """
+        with self._label_to_classifier_lock:
+            c = dict(self._label_to_config)
+            for label, classifier in self._label_to_classifier.items():
+                if label not in c:
+                    c[label] = to_config_dict(classifier)
+        return c
+
+    def size(self) -> int:
+        return len(self.labels())
+
+    __len__ = size
+
+    def labels(self) -> Set[str]:
+        with self._label_to_classifier_lock:
+            return (set(self._label_to_classifier.keys()) |
+                    set(self._label_to_loader.keys()))
+
+    def resident_labels(self) -> Set[str]:
+        """
+        :return: Set of labels for currently instantiated classifiers.
+        """
+        with self._label_to_classifier_lock:
+            return set(self._label_to_classifier.keys())
+
+    def add_classifier(
+        self,
+        label: str,
+        classifier: ClassifyDescriptor
+    ) -> "LazyClassifyDescriptorCollection":
+        with self._label_to_classifier_lock:
+            if label in self._label_to_loader:
+                raise ValueError("Duplicate label provided: '%s'" % label)
+            super(LazyClassifyDescriptorCollection, self).add_classifier(
+                label, classifier
+            )
+        return self
+
+    def add_classifier_loader(
+        self,
+        label: str,
+        loader: Callable[[], ClassifyDescriptor],
+        classifier: Optional[ClassifyDescriptor] = None
+    ) -> "LazyClassifyDescriptorCollection":
+        """
+        Register a classifier to be instantiated by the given loader on first
+        use, and again whenever used after being unloaded.
+
+        :param label: String descriptive label for the classifier.
+        :param loader: Callable returning a new classifier instance.
+        :param classifier: Optional already loaded classifier instance to make
+            resident now.
+
+        :raises ValueError: The given classifier is not actually a classifier
+            instance, or if the label provided already exists in this
+            collection.
+
+        :return: Self.
+        """
+        if classifier is not None and \
+                not isinstance(classifier, ClassifyDescriptor):
+            raise ValueError("Not given a Classifier instance (given type"
+                             " %s)." % type(classifier))
+        with self._label_to_classifier_lock:
+            if label in self.labels():
+                raise ValueError("Duplicate label provided: '%s'" % label)
+            self._label_to_loader[label] = loader
+            if classifier is not None:
+                self._make_resident(label, classifier)
+        return self
+
+    def _make_resident(self, label: str,
+                       classifier: ClassifyDescriptor) -> None:
+        """
+        Record a loader-registered classifier as instantiated, unloading the
+        least recently used ones beyond the resident limit. Assumes the lock
+        is held.
+        """
+        self._label_to_classifier[label] = classifier
+        self._resident_labels[label] = None
+        while (self.max_resident is not None and
+               len(self._resident_labels) > self.max_resident):
+            evict_label, _ = self._resident_labels.popitem(last=False)
+            LOG.debug("Unloading classifier '%s'", evict_label)
+            del self._label_to_classifier[evict_label]
+
+    def _load(self, label: str) -> ClassifyDescriptor:
+        """
+        Get the classifier for a label, instantiating it with its loader if
+        it is not resident. The lock is released while the loader runs.
+
+        :raises KeyError: No classifier for the given label.
+        :raises ValueError: The loader did not return a classifier instance.
+        """
+        with self._label_to_classifier_lock:
+            if label in self._resident_labels:
+                self._resident_labels.move_to_end(label)
+                return self._label_to_classifier[label]
+            elif label not in self._label_to_loader:
+                return self._label_to_classifier[label]
+            loader = self._label_to_loader[label]
+
+        LOG.debug("Loading classifier '%s'", label)
+        classifier = loader()
+        if not isinstance(classifier, ClassifyDescriptor):
+            raise ValueError("Loader for label '%s' did not return a "
+                             "Classifier instance (given type %s)."
+                             % (label, type(classifier)))
+
+        with self._label_to_classifier_lock:
+            if label in self._resident_labels:
+                # Loaded concurrently, keep the instance already resident.
+                self._resident_labels.move_to_end(label)
+                return self._label_to_classifier[label]
+            # Only keep the instance if the label was not removed meanwhile.
+            if self._label_to_loader.get(label) is loader:
+                self._make_resident(label, classifier)
+        return classifier
+
+    def get_classifier(self, label: str) -> ClassifyDescriptor:
+        return self._load(label)
+
+    def remove_classifier(
+        self,
+        label: str
+    ) -> "LazyClassifyDescriptorCollection":
+        with self._label_to_classifier_lock:
+            if label in self._label_to_loader:
+                del self._label_to_loader[label]
+                self._label_to_config.pop(label, None)
+                if label in self._resident_labels:
+                    del self._resident_labels[label]
+                    del self._label_to_classifier[label]
+            else:
+                del self._label_to_classifier[label]
+        return self
+
+    def iter_classifiers(
+        self,
+        labels: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[str, ClassifyDescriptor]]:
+        """
+        Iterate over the classifiers for the labels given, or for all
+        classifiers if no labels were explicitly given, loading each one only
+        when it is reached.
+
+        Only referencing one classifier at a time lets the least recently used
+        ones be unloaded between loads.
+
+        :param labels: One or more labels of stored classifiers to retrieve.
+            If None, consider all stored classifiers.
+
+        :raises MissingLabelError: One or more labels provided do not
+            associate to any currently stored classifiers. Raised before any
+            classifier is loaded.
+
+        :return: Iterator of (label, classifier) pairs.
+        """
+        if labels is not None:
+            label_list = list(labels)
+            # If we're missing some of the requested labels, complain
+            missing_labels = set(label_list) - self.labels()
+            if missing_labels:
+                raise MissingLabelError(missing_labels)
+        else:
+            label_list = sorted(self.labels())
+        return ((label, self._load(label)) for label in label_list)
+
+    def labels_to_classifiers(
+        self,
+        labels: Optional[Iterable[str]] = None
+    ) -> Dict[str, ClassifyDescriptor]:
+        # Returned instances remain usable by the caller even if they are
+        # unloaded while loading later labels.
+        return dict(self.iter_classifiers(labels))
+
+    def classify(
+        self,
+        descriptor: DescriptorElement,
+        labels: Optional[Iterable[str]] = None,
+        factory: ClassificationElementFactory = DFLT_CLASSIFIER_FACTORY,
+        overwrite: bool = False
+    ) -> Dict[str, ClassificationElement]:
+        return {
+            label: classifier.classify_one_element(
+                descriptor, factory=factory, overwrite=overwrite
+            )
+            for label, classifier in self.iter_classifiers(labels)
+        }
+
+    def classify_arrays(
+        self,
+        array_seq: Sequence[np.ndarray],
+        labels: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[Dict[Hashable, float]]]:
+        return {
+            label: list(classifier.classify_arrays(array_seq))
+            for label, classifier in self.iter_classifiers(labels)
+        }
@@ -0,0 +1,190 @@
+import os
+import os.path as osp
+import pickle
+import shutil
+import tempfile
+import urllib.parse
+from typing import BinaryIO, Callable, List, Tuple
+
+from smqtk_classifier import ClassifyDescriptor
+
+
+class ClassifierModelStore (object):
+    """
+    Directory of pickled classifier models, one file per classifier label.
+
+    Models are written by streaming their bytes to disk and are only
+    unpickled when loaded, so they need never be buffered whole in memory as
+    bytes.
+    """
+
+    #: File extension of stored model files.
+    EXTENSION = '.pkl'
+
+    def __init__(self, directory: str):
+        """
+        :param directory: Directory to store model files in. This is created
+            if it does not exist.
+        """
+        self.directory = directory
+        if not osp.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, label: str) -> str:
+        """
+        :param label: Classifier label.
+
+        :return: Path of the model file for the given label.
+        """
+        return osp.join(self.directory,
+                        urllib.parse.quote(label, safe='') + self.EXTENSION)
+
+    def labels(self) -> List[str]:
+        """
+        :return: Sorted labels of the stored models.
+        """
+        return sorted(
+            urllib.parse.unquote(f[:-len(self.EXTENSION)])
+            for f in os.listdir(self.directory)
+            if f.endswith(self.EXTENSION)
+        )
+
+    def has_model(self, label: str) -> bool:
+        return osp.isfile(self.path(label))
+
+    def _staging_file(self) -> Tuple[BinaryIO, str]:
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def stage(self, fileobj: BinaryIO, chunk_size: int = 2**20) -> str:
+        """
+        Stream pickled model bytes from a file-like object into a temporary
+        file in the store, to be stored under a label with ``commit``.
+
+        :param fileobj: File-like object to read pickled model bytes from.
+        :param chunk_size: Number of bytes copied at a time.
+
+        :return: Path of the staged model file.
+        """
+        f, tmp_path = self._staging_file()
+        try:
+            with f:
+                shutil.copyfileobj(fileobj, f, chunk_size)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return tmp_path
+
+    def stage_classifier(self, classifier: ClassifyDescriptor) -> str:
+        """
+        Pickle a model into a temporary file in the store, to be stored under
+        a label with ``commit``.
+
+        :param classifier: Model to pickle.
+
+        :return: Path of the staged model file.
+        """
+        f, tmp_path = self._staging_file()
+        try:
+            with f:
+                pickle.dump(classifier, f)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return tmp_path
+
+    def commit(self, label: str, staged_path: str) -> str:
+        """
+        Atomically store a staged model file under a label, replacing any
+        model stored for it, so concurrent loads never see a partially written
+        model.
+
+        :param label: Classifier label.
+        :param staged_path: Path returned by ``stage`` or
+            ``stage_classifier``.
+
+        :return: Path of the stored model file.
+        """
+        path = self.path(label)
+        os.replace(staged_path, path)
+        return path
+
+    def validate(self, staged_path: str) -> None:
+        """
+        Check that a staged model file unpickles to a classifier. The
+        unpickled model is not kept.
+
+        :param staged_path: Path returned by ``stage``.
+
+        :raises EOFError: The staged model bytes were empty or truncated.
+        :raises ValueError: The staged model is not a classifier.
+        """
+        with open(staged_path, 'rb') as f:
+            model = pickle.load(f)
+        if not isinstance(model, ClassifyDescriptor):
+            raise ValueError("Not given a Classifier instance (given type"
+                             " %s)." % type(model))
+
+    def discard(self, staged_path: str) -> None:
+        """
+        Remove a staged model file that will not be committed.
+
+        :param staged_path: Path returned by ``stage`` or
+            ``stage_classifier``.
+        """
+        if osp.exists(staged_path):
+            os.remove(staged_path)
+
+    def write(self, label: str, fileobj: BinaryIO,
+              chunk_size: int = 2**20) -> str:
+        """
+        Stream pickled model bytes from a file-like object into the store,
+        replacing any model stored for the label.
+
+        The model file is written atomically, so concurrent loads never see a
+        partially written model.
+
+        :param label: Classifier label.
+        :param fileobj: File-like object to read pickled model bytes from.
+        :param chunk_size: Number of bytes copied at a time.
+
+        :return: Path of the written model file.
+        """
+        tmp_path = self.stage(fileobj, chunk_size)
+        try:
+            return self.commit(label, tmp_path)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+
+    def load(self, label: str) -> ClassifyDescriptor:
+        """
+        Unpickle the model stored for a label.
+
+        :param label: Classifier label.
+
+        :raises IOError: No model is stored for the label.
+
+        :return: Unpickled model.
+        """
+        with open(self.path(label), 'rb') as f:
+            return pickle.load(f)
+
+    def loader(self, label: str) -> Callable[[], ClassifyDescriptor]:
+        """
+        :param label: Classifier label.
+
+        :return: Callable loading the model stored for the label.
+        """
+        return lambda: self.load(label)
+
+    def remove(self, label: str) -> None:
+        """
+        Remove the model stored for a label, if any.
+
+        :param label: Classifier label.
+        """
+        try:
+            os.remove(self.path(label))
+        except OSError:
+            pass
@@ -0,0 +1,94 @@
+import collections
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+CACHE_KEY_T = Tuple[str, int, Hashable]
+
+
+class ClassificationResultCache (object):
+    """
+    Thread-safe, bounded LRU cache of class-to-probability predictions keyed
+    on classifier label, classifier version and descriptor UID.
+
+    Versions distinguish successive classifiers registered under the same
+    label, so results of a replaced classifier are never returned for its
+    replacement. Entries for a label may additionally be dropped eagerly via
+    ``invalidate``.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        :param max_entries: Maximum number of predictions cached. Least
+            recently used predictions are evicted beyond this. A value of 0
+            disables caching.
+
+        :raises ValueError: The given maximum number of entries is negative.
+        """
+        if max_entries < 0:
+            raise ValueError("Maximum number of cache entries must not be "
+                             "negative (given {}).".format(max_entries))
+        self.max_entries = int(max_entries)
+        self._lock = threading.RLock()
+        self._entries: \
+            "collections.OrderedDict[CACHE_KEY_T, Dict[Hashable, float]]" = \
+            collections.OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_many(
+        self, label: str, version: int, uids: Sequence[Hashable]
+    ) -> List[Optional[Dict[Hashable, float]]]:
+        """
+        Get cached predictions of a classifier for descriptor UIDs.
+
+        :param label: Classifier label.
+        :param version: Classifier version.
+        :param uids: Descriptor UIDs to get predictions for.
+
+        :return: Cached predictions, or None where not cached, parallel to the
+            given UIDs. Returned predictions should not be modified.
+        """
+        results: List[Optional[Dict[Hashable, float]]] = []
+        with self._lock:
+            for uid in uids:
+                key = (label, version, uid)
+                pred = self._entries.get(key)
+                if pred is not None:
+                    self._entries.move_to_end(key)
+                results.append(pred)
+        return results
+
+    def put_many(
+        self, label: str, version: int, uids: Sequence[Hashable],
+        predictions: Sequence[Dict[Hashable, float]]
+    ) -> None:
+        """
+        Cache predictions of a classifier for descriptor UIDs.
+
+        :param label: Classifier label.
+        :param version: Classifier version.
+        :param uids: Descriptor UIDs the predictions are for.
+        :param predictions: Predictions parallel to the given UIDs.
+        """
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            for uid, pred in zip(uids, predictions):
+                key = (label, version, uid)
+                self._entries[key] = pred
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, label: str) -> None:
+        """
+        Drop all cached predictions of classifiers under a label.
+
+        :param label: Classifier label.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == label]:
+                del self._entries[key]
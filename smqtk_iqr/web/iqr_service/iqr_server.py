@@ -3,12 +3,17 @@ import binascii
 import collections
 import itertools
 import json
+import math
 import multiprocessing
-import random
+import os
+import tempfile
 import time
 import threading
 import traceback
-from typing import cast, Dict, Hashable, List, Optional, Callable, Any, Tuple, Union, Sequence
+from typing import (
+    cast, Dict, FrozenSet, Hashable, List, Mapping, Optional, Callable, Any,
+    Tuple, Union, Sequence
+)
 import uuid
 import logging
 import numpy as np
@@ -46,9 +51,17 @@ from smqtk_iqr.iqr import (
     iqr_controller,
     iqr_session,
 )
+from smqtk_iqr.utils.permutation import IndexPermutation
 
 LOG = logging.getLogger(__name__)
 
+# Positive and negative descriptor UIDs a session classifier was trained on.
+CLASSIFIER_TRAIN_KEY_T = Tuple[FrozenSet[Hashable], FrozenSet[Hashable]]
+
+# Request mimetypes of form arguments, in contrast to raw body data.
+FORM_MIMETYPES = ('', 'application/x-www-form-urlencoded',
+                  'multipart/form-data')
+
 
 def new_uuid() -> str:
     return str(uuid.uuid1(clock_seq=int(time.time() * 1000000)))\
@@ -57,7 +70,8 @@ def new_uuid() -> str:
 
 def make_response_json(
     message: str,
-    **params: Union[Hashable, Sequence[Hashable], Sequence[Sequence[Hashable]]]
+    **params: Union[Hashable, Sequence[Hashable], Sequence[Sequence[Hashable]],
+                    Mapping[str, Hashable]]
 ) -> flask.Response:
     r = {
         "message": message,
@@ -105,8 +119,19 @@ class IqrService (SmqtkWebApp):
     global set and once for the nearest neighbors index. These will probably
     be the set to the same set. In more detail, the global descriptor set
     is used when the "refine" endpoint is given descriptor UUIDs
+
+    ``session_control.classifier_history_size`` is the number of replaced
+    session classifiers, with their cached results, that are kept per session
+    and restored if the session's adjudications revert to those they were
+    trained with. A session's classifier is only reused when its positive and
+    negative examples are exactly the same as when it was trained. Any change
+    to them retrains the classifier and recomputes all results; there is no
+    selective invalidation of results affected by a change.
     """
 
+    #: Default number of replaced classifiers kept per session.
+    DEFAULT_CLASSIFIER_HISTORY_SIZE = 2
+
     @classmethod
     def is_usable(cls) -> bool:
         return True
@@ -126,7 +151,20 @@ class IqrService (SmqtkWebApp):
                         "session_timeout": 3600,
                     },
                     "distance_metric": "euclidean",
-                    "autoneg_select_ratio": 1
+                    "autoneg_select_ratio": 1,
+                    "classifier_history_size":
+                        cls.DEFAULT_CLASSIFIER_HISTORY_SIZE,
+                    "session_changes_max_timeout": 30,
+                    "classification_precompute": {
+                        "enabled": False,
+                        "batch_size": 1024,
+                        "uids": None,
+                    },
+                },
+
+                "random_uids": {
+                    "seed": None,
+                    "key_index_path": None,
                 },
 
                 "plugin_notes": {
@@ -163,7 +201,19 @@ class IqrService (SmqtkWebApp):
                         "are stored. The in-memory version is recommended "
                         "because normal caching mechanisms will not account "
                         "for the variety of classifiers that can potentially "
-                        "be created via this utility.",
+                        "be created via this utility. The /classify endpoint "
+                        "records session classification results in its own "
+                        "cache and does not use this factory.",
+                    "random_uids":
+                        "Ordering of the /random_uids endpoint. The ordering "
+                        "is a pseudo-random permutation of descriptor set "
+                        "keys determined by the seed (random if null). If a "
+                        "key index path is given, descriptor set keys are "
+                        "saved there as a numpy file the first time they are "
+                        "needed and loaded from it afterwards (memory-mapped "
+                        "if possible) instead of re-scanning the descriptor "
+                        "set on restart. A refresh re-scans the descriptor "
+                        "set, rewrites the index and re-seeds the ordering.",
                 },
 
                 "plugins": {
@@ -194,9 +244,30 @@ class IqrService (SmqtkWebApp):
         super(IqrService, self).__init__(json_config)
         sc_config = json_config['iqr_service']['session_control']
 
+        random_uids_config = \
+            json_config['iqr_service'].get('random_uids', {})
+        self.random_uid_seed: Optional[int] = \
+            random_uids_config.get('seed', None)
+        self.random_uid_key_index_path: Optional[str] = \
+            random_uids_config.get('key_index_path', None)
+
         # Initialize from config
         self.positive_seed_neighbors = sc_config['positive_seed_neighbors']
         self.autoneg_select_ratio = sc_config['autoneg_select_ratio']
+        self.classifier_history_size = \
+            int(sc_config.get('classifier_history_size',
+                              self.DEFAULT_CLASSIFIER_HISTORY_SIZE))
+        # Upper bound on how long a /session_changes request may block.
+        self.session_changes_max_timeout = \
+            float(sc_config.get('session_changes_max_timeout', 30))
+        precompute_config = sc_config.get('classification_precompute', {})
+        self.precompute_enabled = bool(precompute_config.get('enabled', False))
+        self.precompute_batch_size = \
+            int(precompute_config.get('batch_size', 1024))
+        # Specific UIDs from the descriptor set to score for each session. If
+        # None, each session's working set is scored.
+        self.precompute_uids: Optional[List[Hashable]] = \
+            precompute_config.get('uids', None)
 
         metric_map: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
             "euclidean": euclidean_distance,
@@ -260,18 +331,40 @@ class IqrService (SmqtkWebApp):
         # session (True == train new classifier). Modification for specific
         # sessions under parent session's lock.
         self.session_classifier_dirty: Dict[Hashable, bool] = {}
+        # The positive and negative descriptor UIDs the current session
+        # classifier was trained with. A dirty classifier whose session
+        # adjudications still match this key is reused instead of retrained.
+        self.session_classifier_train_key: Dict[
+            Hashable, Optional[CLASSIFIER_TRAIN_KEY_T]
+        ] = {}
+        # Recently replaced session classifiers and their classification
+        # result caches, keyed by the training key they were trained with.
+        # This allows reverting an adjudication (e.g. un-doing a misclick) to
+        # restore the previous model and its cached scores without
+        # retraining. Bounded by ``classifier_history_size``.
+        # Entries are kept in insertion order, oldest first.
+        self.session_classifier_history: Dict[
+            Hashable,
+            Dict[CLASSIFIER_TRAIN_KEY_T,
+                 Tuple[ClassifyDescriptorSupervised, Dict[Hashable, float]]]
+        ] = {}
+
+        # Most recently started background classification thread per session,
+        # while it is running.
+        self._precompute_threads: Dict[Hashable, threading.Thread] = {}
 
-        # Cache of random UIDs from the configured descriptor set for use
-        self._random_uid_list_cache: Optional[List[Hashable]] = None
-        # Lock for mutation of this list cache
+        # Keys of the configured descriptor set, in a stable order, for use
+        # with a pseudo-random permutation of their indices. This may be a
+        # memory-mapped array when loaded from the configured key index.
+        self._random_uid_keys: Optional[Sequence[Hashable]] = None
+        self._random_uid_permutation: Optional[IndexPermutation] = None
+        # Lock for mutation of the above keys and permutation
         self._random_lock = threading.RLock()
 
         def session_expire_callback(session: smqtk_iqr.iqr.IqrSession) -> None:
             with session:
                 LOG.debug("Removing session %s classifier", session.uuid)
-                del self.session_classifiers[session.uuid]
-                del self.session_classification_results[session.uuid]
-                del self.session_classifier_dirty[session.uuid]
+                self._remove_session_classifier_state(session.uuid)
 
         self.controller = iqr_controller.IqrController(
             sc_config['session_expiration']['enabled'],
@@ -314,6 +407,9 @@ class IqrService (SmqtkWebApp):
         self.add_url_rule('/session_ids',
                           view_func=self.get_sessions_ids,
                           methods=['GET'])
+        self.add_url_rule('/session_exists',
+                          view_func=self.get_session_exists,
+                          methods=['GET'])
         self.add_url_rule('/session',
                           view_func=self.get_session_info,
                           methods=['GET'])
@@ -326,6 +422,9 @@ class IqrService (SmqtkWebApp):
         self.add_url_rule('/session',
                           view_func=self.clean_session,
                           methods=['DELETE'])
+        self.add_url_rule('/session_changes',
+                          view_func=self.get_session_changes,
+                          methods=['GET'])
         self.add_url_rule('/add_external_pos',
                           view_func=self.add_external_positive,
                           methods=['POST'])
@@ -338,6 +437,9 @@ class IqrService (SmqtkWebApp):
         self.add_url_rule('/adjudicate',
                           view_func=self.adjudicate,
                           methods=['POST'])
+        self.add_url_rule('/get_adjudications',
+                          view_func=self.get_adjudications,
+                          methods=['POST'])
         self.add_url_rule('/initialize',
                           view_func=self.initialize,
                           methods=['POST'])
@@ -375,6 +477,37 @@ class IqrService (SmqtkWebApp):
                           view_func=self.set_iqr_state,
                           methods=['PUT'])
 
+    def _reset_session_classifier_state(self, sid: Hashable) -> None:
+        """
+        Initialize, or reset, the classifier book-keeping for a session.
+
+        This method assumes its being executed within the IQR session lock.
+
+        :param sid: UUID of the IQR session.
+        """
+        self.session_classifiers[sid] = None
+        self.session_classification_results[sid] = {}
+        self.session_classifier_dirty[sid] = True
+        self.session_classifier_train_key[sid] = None
+        self.session_classifier_history[sid] = {}
+
+    def _remove_session_classifier_state(self, sid: Hashable) -> None:
+        """
+        Remove the classifier book-keeping for a session.
+
+        This method assumes its being executed within the IQR session lock.
+
+        :param sid: UUID of the IQR session.
+
+        :raises KeyError: No classifier state for the given session.
+        """
+        del self.session_classifiers[sid]
+        del self.session_classification_results[sid]
+        del self.session_classifier_dirty[sid]
+        del self.session_classifier_train_key[sid]
+        del self.session_classifier_history[sid]
+        self._precompute_threads.pop(sid, None)
+
     def describe_base64_data(self, b64: str, content_type: str) -> DescriptorElement:
         """
         Compute and return the descriptor element for the given base64 data.
@@ -394,6 +527,58 @@ class IqrService (SmqtkWebApp):
             de, descr_factory=self.descriptor_factory
         )
 
+    def describe_data(self, data: bytes, content_type: str) -> DescriptorElement:
+        """
+        Compute and return the descriptor element for the given data bytes.
+
+        The given data bytes are not retained.
+
+        :param data: Data bytes.
+
+        :param content_type: Data content type.
+
+        :return: Computed descriptor element.
+        """
+        de = DataMemoryElement(data, content_type)
+        return self.descriptor_generator.generate_one_element(
+            de, descr_factory=self.descriptor_factory
+        )
+
+    def _describe_external_data(self) -> Tuple[str, DescriptorElement]:
+        """
+        Get the session ID of, and describe the data sent with, an external
+        example request.
+
+        Data is either sent base64-encoded in the ``base64`` form argument,
+        along with ``sid`` and ``content_type`` form arguments, or as the raw
+        request body, with its mimetype as the request content type and
+        ``sid`` as a URL argument.
+
+        :raises ValueError: A required argument was not provided or empty.
+
+        :return: Session ID and descriptor of the data.
+        """
+        if flask.request.mimetype in FORM_MIMETYPES:
+            sid = flask.request.form.get('sid', None)
+            data_base64 = flask.request.form.get('base64', None)
+            data_content_type = flask.request.form.get('content_type', None)
+            if sid is None:
+                raise ValueError("No session id (sid) provided")
+            if not data_base64:
+                raise ValueError("No or empty base64 data provided.")
+            if not data_content_type:
+                raise ValueError("No data mimetype provided.")
+            return sid, self.describe_base64_data(data_base64,
+                                                  data_content_type)
+
+        sid = flask.request.args.get('sid', None)
+        if sid is None:
+            raise ValueError("No session id (sid) provided")
+        data = flask.request.get_data()
+        if not data:
+            raise ValueError("No or empty data provided.")
+        return sid, self.describe_data(data, flask.request.mimetype)
+
     # GET /is_ready
     # noinspection PyMethodMayBeStatic
     def is_ready(self) -> Tuple[Callable, int]:
@@ -718,18 +903,65 @@ class IqrService (SmqtkWebApp):
         return make_response_json("Current session UUID values",
                                   session_uuids=session_uuids), 200
 
+    # GET /session_exists
+    def get_session_exists(self) -> Tuple[Callable, int]:
+        """
+        Check whether a session exists without listing all session IDs.
+
+        URL Arguments:
+            sid
+                ID of the session.
+
+        Return JSON:
+            sid (str):
+                Input IQR Session UID.
+            exists (bool):
+                If a session with the given ID currently exists.
+
+        Possible error code returns:
+            400
+                No session ID provided.
+
+        """
+        sid = flask.request.args.get('sid', None)
+        if sid is None:
+            return make_response_json("No session id (sid) provided"), 400
+        exists = self.controller.has_session_uuid(sid)
+        return make_response_json("Session '%s' %s" % (
+            sid, "exists" if exists else "does not exist"
+        ), sid=sid, exists=exists), 200
+
     # GET /session
     def get_session_info(self) -> Tuple[Callable, int]:
         """
         Get a JSON return with session state information.
 
+        Responses carry an ``ETag`` header derived from the session's change
+        token and the requested view. If the request's ``If-None-Match``
+        header matches, a 304 response with no body is returned instead.
+
         URL Arguments:
             sid
                 ID of the session.
+            summary
+                Optional JSON boolean. If `true`, only counts are returned and
+                the UID lists are omitted. `false` by default.
+            i
+                Optional starting index (inclusive) applied to each UID list.
+            j
+                Optional ending index (exclusive) applied to each UID list.
+                UID list order is stable for a given ``change_token``.
 
         Return JSON:
             sid (str):
                 Input IQR Session UID.
+            revision (int):
+                Revision number of the session state.
+            change_token (str):
+                Opaque token that changes whenever the session state changes.
+            counts (dict[str, int]):
+                Total number of UIDs for each of the UID lists below, keyed by
+                list name, e.g. ``uuids_pos``.
             uuids_pos (list[str]):
                 List of working-set descriptor UIDs that are currently
                 adjudicated positive.
@@ -761,8 +993,21 @@ class IqrService (SmqtkWebApp):
                 by session refinement.
         """
         sid = flask.request.args.get('sid', None)
+        summary_str = flask.request.args.get('summary', 'false')
+        i = flask.request.args.get('i', None)
+        j = flask.request.args.get('j', None)
         if sid is None:
             return make_response_json("No session id (sid) provided"), 400
+        try:
+            summary = json.loads(summary_str)
+        except json.JSONDecodeError:
+            return make_response_json("Value for 'summary' should be a valid "
+                                      "JSON boolean."), 400
+        try:
+            list_slice = slice(None if i is None else int(i),
+                               None if j is None else int(j))
+        except ValueError:
+            return make_response_json("Invalid bounds index value(s)"), 400
 
         with self.controller:
             if not self.controller.has_session_uuid(sid):
@@ -772,33 +1017,119 @@ class IqrService (SmqtkWebApp):
             iqrs.lock.acquire()  # lock BEFORE releasing controller
 
         try:
-            uuids_pos = [d.uuid() for d in iqrs.positive_descriptors]
-            uuids_pos_external = [d.uuid() for d in
-                                  iqrs.external_positive_descriptors]
-            uuids_neg = [d.uuid() for d in iqrs.negative_descriptors]
-            uuids_neg_external = [d.uuid() for d in
-                                  iqrs.external_negative_descriptors]
-            uids_pos_in_model = [d.uuid() for d in iqrs.rank_contrib_pos]
-            uids_pos_ext_in_model = [d.uuid() for d
-                                     in iqrs.rank_contrib_pos_ext]
-            uids_neg_in_model = [d.uuid() for d in iqrs.rank_contrib_neg]
-            uids_neg_ext_in_model = [d.uuid() for d
-                                     in iqrs.rank_contrib_neg_ext]
+            revision = iqrs.revision
+            change_token = iqrs.change_token
+            etag = "%s-%s" % (change_token,
+                              "summary" if summary else "%s:%s" % (i, j))
+            if flask.request.if_none_match.contains(etag):
+                r = flask.Response(status=304)
+                r.set_etag(etag)
+                return r, 304
+
+            uid_sets = [
+                ('uuids_pos', iqrs.positive_descriptors),
+                ('uuids_neg', iqrs.negative_descriptors),
+                ('uuids_pos_ext', iqrs.external_positive_descriptors),
+                ('uuids_neg_ext', iqrs.external_negative_descriptors),
+                ('uuids_pos_in_model', iqrs.rank_contrib_pos),
+                ('uuids_pos_ext_in_model', iqrs.rank_contrib_pos_ext),
+                ('uuids_neg_in_model', iqrs.rank_contrib_neg),
+                ('uuids_neg_ext_in_model', iqrs.rank_contrib_neg_ext),
+            ]
+            counts = {k: len(d_set) for k, d_set in uid_sets}
+            uid_lists: Dict[str, List[Hashable]] = {}
+            if not summary:
+                uid_lists = {
+                    k: [d.uuid() for d
+                        in itertools.islice(d_set, *list_slice.indices(len(d_set)))]
+                    for k, d_set in uid_sets
+                }
             wi_count = iqrs.working_set.count()
         finally:
             iqrs.lock.release()
 
-        return make_response_json("Session '%s' info" % sid,
-                                  sid=sid,
-                                  uuids_pos=uuids_pos,
-                                  uuids_neg=uuids_neg,
-                                  uuids_pos_ext=uuids_pos_external,
-                                  uuids_neg_ext=uuids_neg_external,
-                                  uuids_pos_in_model=uids_pos_in_model,
-                                  uuids_pos_ext_in_model=uids_pos_ext_in_model,
-                                  uuids_neg_in_model=uids_neg_in_model,
-                                  uuids_neg_ext_in_model=uids_neg_ext_in_model,
-                                  wi_count=wi_count), 200
+        r = make_response_json("Session '%s' info" % sid,
+                               sid=sid,
+                               revision=revision,
+                               change_token=change_token,
+                               counts=counts,
+                               wi_count=wi_count,
+                               **uid_lists)
+        r.set_etag(etag)
+        return r, 200
+
+    # GET /session_changes
+    def get_session_changes(self) -> Tuple[Callable, int]:
+        """
+        Long-poll for a change to a session's state.
+
+        Blocks until the session's revision differs from the given revision or
+        until the timeout elapses, whichever comes first. Clients can use this
+        instead of repeatedly polling ``GET /session``. Each waiting request
+        occupies a server worker thread for its duration. If the session is
+        removed or expires while waiting, 404 is returned right away.
+
+        URL Arguments:
+            sid
+                ID of the session.
+            revision
+                Session revision last observed by the client, e.g. from
+                ``GET /session``. If omitted, the current revision is used,
+                i.e. wait for the next change.
+            timeout
+                Optional number of seconds to wait. This is capped by, and
+                defaults to, the configured ``session_changes_max_timeout``.
+
+        Return JSON:
+            sid (str):
+                Input IQR Session UID.
+            changed (bool):
+                If the revision differs from the given revision.
+            revision (int):
+                Current revision of the session state.
+            change_token (str):
+                Current change token of the session state.
+        """
+        sid = flask.request.args.get('sid', None)
+        revision = flask.request.args.get('revision', None)
+        timeout = flask.request.args.get('timeout', None)
+        if sid is None:
+            return make_response_json("No session id (sid) provided"), 400
+        try:
+            timeout_s = self.session_changes_max_timeout if timeout is None \
+                else float(timeout)
+        except ValueError:
+            return make_response_json("Invalid timeout value"), 400
+        # NaN would otherwise pass through the clamping below.
+        if not math.isfinite(timeout_s):
+            return make_response_json("Invalid timeout value"), 400
+        timeout_s = min(max(timeout_s, 0.), self.session_changes_max_timeout)
+
+        with self.controller:
+            if not self.controller.has_session_uuid(sid):
+                return make_response_json("session id '%s' not found" % sid,
+                                          sid=sid), 404
+            iqrs: smqtk_iqr.iqr.IqrSession = self.controller.get_session(sid)
+
+        try:
+            last_revision = iqrs.revision if revision is None else int(revision)
+        except ValueError:
+            return make_response_json("Invalid revision value"), 400
+
+        # Wait without the controller lock held so other requests proceed.
+        current_revision = iqrs.wait_for_change(last_revision, timeout_s)
+        if iqrs.closed:
+            return make_response_json("session id '%s' was removed" % sid,
+                                      sid=sid), 404
+        with iqrs:
+            change_token = iqrs.change_token
+        return make_response_json(
+            "Session '%s' changes" % sid,
+            sid=sid,
+            changed=current_revision != last_revision,
+            revision=current_revision,
+            change_token=change_token,
+        ), 200
 
     # POST /session
     def init_session(self) -> Tuple[Callable, int]:
@@ -829,9 +1160,7 @@ class IqrService (SmqtkWebApp):
         with self.controller:
             with iqrs:  # because classifier maps locked by session
                 self.controller.add_session(iqrs, self.session_timeout)
-                self.session_classifiers[sid] = None
-                self.session_classification_results[sid] = {}
-                self.session_classifier_dirty[sid] = True
+                self._reset_session_classifier_state(sid)
 
         return make_response_json("Created new session with ID '%s'" % sid,
                                   sid=sid), 201  # CREATED
@@ -861,9 +1190,7 @@ class IqrService (SmqtkWebApp):
 
         try:
             iqrs.reset()
-            self.session_classifiers[sid] = None
-            self.session_classification_results[sid] = {}
-            self.session_classifier_dirty[sid] = True
+            self._reset_session_classifier_state(sid)
 
         finally:
             iqrs.lock.release()
@@ -896,9 +1223,7 @@ class IqrService (SmqtkWebApp):
                                           sid=sid), 404
             with self.controller.get_session(sid) as iqrs:
                 iqrs.reset()
-                del self.session_classifiers[sid]
-                del self.session_classification_results[sid]
-                del self.session_classifier_dirty[sid]
+                self._remove_session_classifier_state(sid)
             self.controller.remove_session(sid)
         return make_response_json("Cleaned session resources for '%s'" % sid,
                                   sid=sid), 200
@@ -919,24 +1244,20 @@ class IqrService (SmqtkWebApp):
             content_type
                 The mimetype of the bytes given.
 
+        Alternatively, the data may be sent as the raw request body with its
+        mimetype as the request ``Content-Type``, and ``sid`` as a URL
+        argument.
+
         A return JSON along with a code 201 means a descriptor was successfully
         computed and added to the session external positives. The returned JSON
         includes a reference to the UUID of the descriptor computed under the
         ``descr_uuid`` key.
 
         """
-        sid = flask.request.form.get('sid', None)
-        data_base64 = flask.request.form.get('base64', None)
-        data_content_type = flask.request.form.get('content_type', None)
-
-        if sid is None:
-            return make_response_json("No session id (sid) provided"), 400
-        if not data_base64:
-            return make_response_json("No or empty base64 data provided."), 400
-        if not data_content_type:
-            return make_response_json("No data mimetype provided."), 400
-
-        descriptor = self.describe_base64_data(data_base64, data_content_type)
+        try:
+            sid, descriptor = self._describe_external_data()
+        except ValueError as ex:
+            return make_response_json(str(ex)), 400
 
         with self.controller:
             if not self.controller.has_session_uuid(sid):
@@ -970,25 +1291,20 @@ class IqrService (SmqtkWebApp):
             content_type
                 The mimetype of the bytes given.
 
+        Alternatively, the data may be sent as the raw request body with its
+        mimetype as the request ``Content-Type``, and ``sid`` as a URL
+        argument.
+
         A return JSON along with a code 201 means a descriptor was successfully
         computed and added to the session external negatives. The returned JSON
         includes a reference to the UUID of the descriptor computed under the
         ``descr_uuid`` key.
 
         """
-        sid = flask.request.form.get('sid', None)
-        data_base64 = flask.request.form.get('base64', None)
-        data_content_type = flask.request.form.get('content_type', None)
-
-        if sid is None:
-            return make_response_json("No session id (sid) provided"), 400
-        if not data_base64:
-            return make_response_json("No or empty base64 data provided."), 400
-        if not data_content_type:
-            return make_response_json("No data mimetype provided."), 400
-
-        descriptor = self.describe_base64_data(data_base64,
-                                               data_content_type)
+        try:
+            sid, descriptor = self._describe_external_data()
+        except ValueError as ex:
+            return make_response_json(str(ex)), 400
 
         with self.controller:
             if not self.controller.has_session_uuid(sid):
@@ -1010,22 +1326,82 @@ class IqrService (SmqtkWebApp):
     # GET /adjudicate
     def get_adjudication(self) -> Tuple[Callable, int]:
         """
-        Get the adjudication state of a descriptor given its UID.
+        Get the adjudication state of a descriptor given its UID, or of many
+        descriptors given a JSON list of UIDs.
 
         Form args:
             sid
                 Session Id.
             uid
                 Query descriptor UID.
+            uids
+                JSON list of query descriptor UIDs. Used instead of ``uid`` if
+                provided.
+
+        Returns 200 and a JSON object that includes the following:
+            is_pos: bool
+                If the ``uid`` descriptor is positively adjudicated. Only
+                returned for ``uid`` queries.
+            is_neg: bool
+                If the ``uid`` descriptor is negatively adjudicated. Only
+                returned for ``uid`` queries.
+            results: list[(str, bool, bool)]
+                List of ``(uid, is_pos, is_neg)`` tuples parallel to the
+                given ``uids``. Only returned for ``uids`` queries.
+
         """
         sid = flask.request.args.get('sid', None)
         uid = flask.request.args.get('uid', None)
+        uids_json = flask.request.args.get('uids', None)
+        return self._adjudication_response(sid, uid, uids_json)
+
+    # POST /get_adjudications
+    def get_adjudications(self) -> Tuple[flask.Response, int]:
+        """
+        Get the adjudication state of many descriptors given a JSON list of
+        their UIDs in the request body, which unlike the URL arguments of
+        ``GET /adjudicate`` is not limited in length.
 
+        Form args:
+            sid
+                Session Id.
+            uids
+                JSON list of query descriptor UIDs.
+
+        Returns 200 and a JSON object that includes the following:
+            results: list[(str, bool, bool)]
+                List of ``(uid, is_pos, is_neg)`` tuples parallel to the
+                given ``uids``.
+
+        """
+        sid = flask.request.form.get('sid', None)
+        uids_json = flask.request.form.get('uids', None)
+        if uids_json is None:
+            return make_response_json("No descriptor uids provided"), 400
+        return self._adjudication_response(sid, None, uids_json)
+
+    def _adjudication_response(
+        self, sid: Optional[str], uid: Optional[str],
+        uids_json: Optional[str]
+    ) -> Tuple[flask.Response, int]:
+        """
+        Make the response to an adjudication state query of ``uid``, or of
+        the JSON list ``uids_json`` if given.
+        """
         if sid is None:
             return make_response_json("No session id (sid) provided"), 400
-        elif uid is None:
+        elif uid is None and uids_json is None:
             return make_response_json("No descriptor uid provided"), 400
 
+        uids: List[Hashable]
+        if uids_json is not None:
+            try:
+                uids = parse_hashable_json_list(uids_json)
+            except ValueError as ex:
+                return make_response_json("%s" % str(ex)), 400
+        else:
+            uids = [uid]
+
         with self.controller:
             if not self.controller.has_session_uuid(sid):
                 return make_response_json("session id '%s' not found" % sid,
@@ -1034,21 +1410,21 @@ class IqrService (SmqtkWebApp):
             iqrs.lock.acquire()  # lock BEFORE releasing controller
 
         try:
-            all_pos = (iqrs.external_positive_descriptors |
-                       iqrs.positive_descriptors)
-            all_neg = (iqrs.external_negative_descriptors |
-                       iqrs.negative_descriptors)
-
+            adj_state = iqrs.get_adjudication_state(uids)
         finally:
             iqrs.lock.release()
 
-        is_pos = uid in {d.uuid() for d in all_pos}
-        is_neg = uid in {d.uuid() for d in all_neg}
-
-        if is_pos and is_neg:
+        if any(is_pos and is_neg for is_pos, is_neg in adj_state):
             return make_response_json("UID slotted as both positive and "
                                       "negative?"), 500
 
+        if uids_json is not None:
+            return make_response_json(
+                "%d descriptor adjudications" % len(uids),
+                results=[[u, is_pos, is_neg]
+                         for u, (is_pos, is_neg) in zip(uids, adj_state)]
+            ), 200
+        is_pos, is_neg = adj_state[0]
         return make_response_json("%s descriptor adjudication" % uid,
                                   is_pos=is_pos, is_neg=is_neg), 200
 
@@ -1626,6 +2002,11 @@ class IqrService (SmqtkWebApp):
         If the requested session has not been refined yet (no ranking), an
         empty results list is returned.
 
+        If ``n`` is provided, it is used instead of ``i`` and ``j`` and a
+        sample of ``n`` results spread across the relevancy score quantiles of
+        the non-adjudicated results is returned, ordered by descending score.
+        See ``IqrSession.get_unadjudicated_relevancy_sample``.
+
         URI Args:
             sid: str
                 UUID of the IQR session to use.
@@ -1633,11 +2014,14 @@ class IqrService (SmqtkWebApp):
                 Starting index (inclusive).
             j: int
                 Ending index (exclusive).
+            n: int
+                Optional number of results to sample across the relevancy
+                score range.
 
         Possible error code returns:
             400
-                No session ID provided. Offset/limit index values were not
-                valid integers.
+                No session ID provided. Offset/limit index values or sample
+                size were not valid integers.
             404
                 No session for the given ID.
 
@@ -1648,24 +2032,30 @@ class IqrService (SmqtkWebApp):
                 Index offset used.
             j: int
                 Index limit used.
+            n: int
+                Sample size used, if provided.
             total: int
-                Total number of negative adjudications in the current IQR
+                Total number of non-adjudicated results in the current IQR
                 session.
             results: list[(str, float)]
-                List of ``(uuid, score)`` tuples for negatively adjudicated
+                List of ``(uuid, score)`` tuples for non-adjudicated
                 descriptors in the working set, ordered by descending score.
 
         """
         sid = flask.request.args.get('sid', None)
         i = cast(Optional[int], flask.request.args.get('i', None))
         j = cast(Optional[int], flask.request.args.get('j', None))
-        # TODO: Add optional parameter that is used instead of i/j that causes
-        #       the return of N uniformly distributed examples in this result
-        #       subset based on relevancy score.
-        #       - Add on IqrSession class side?
+        n = cast(Optional[int], flask.request.args.get('n', None))
 
         if sid is None:
             return make_response_json("No session id (sid) provided"), 400
+        if n is not None:
+            try:
+                n = int(n)
+                if n < 0:
+                    raise ValueError(n)
+            except ValueError:
+                return make_response_json("Invalid sample size value"), 400
 
         with self.controller:
             if not self.controller.has_session_uuid(sid):
@@ -1675,17 +2065,27 @@ class IqrService (SmqtkWebApp):
             iqrs.lock.acquire()  # lock BEFORE releasing controller
 
         try:
-            unadj_ordered = iqrs.get_unadjudicated_relevancy()
-            total = len(unadj_ordered)
-            # int() can raise ValueError, catch
-            i = 0 if i is None else int(i)
-            j = total if j is None else int(j)
-            r = [[d.uuid(), prob] for d, prob in unadj_ordered[i:j]]
+            if n is not None:
+                total = len(iqrs.get_unadjudicated_relevancy())
+                r = [[d.uuid(), prob] for d, prob
+                     in iqrs.get_unadjudicated_relevancy_sample(n)]
+            else:
+                unadj_ordered = iqrs.get_unadjudicated_relevancy()
+                total = len(unadj_ordered)
+                # int() can raise ValueError, catch
+                i = 0 if i is None else int(i)
+                j = total if j is None else int(j)
+                r = [[d.uuid(), prob] for d, prob in unadj_ordered[i:j]]
         except ValueError:
             return make_response_json("Invalid bounds index value(s)"), 400
         finally:
             iqrs.lock.release()
 
+        if n is not None:
+            return make_response_json(
+                "success", sid=sid, n=n,
+                total=total, results=r
+            ), 200
         return make_response_json(
             "success", sid=sid, i=i, j=j,
             total=total, results=r
@@ -1700,6 +2100,10 @@ class IqrService (SmqtkWebApp):
         0. If ``j`` (limit, exclusive) is omitted, we assume the ending index
         is the same as the number of results available.
 
+        The random ordering is a seeded permutation of descriptor set key
+        indices computed only for the requested slice, so the set of keys is
+        never shuffled as a whole. See the ``random_uids`` configuration.
+
         URI Args:
             i: int
                 Starting index (inclusive). 0 by default.
@@ -1728,21 +2132,78 @@ class IqrService (SmqtkWebApp):
                                       "JSON boolean."), 400
 
         with self._random_lock:
-            if self._random_uid_list_cache is None or refresh:
-                self._random_uid_list_cache = list(self.descriptor_set.keys())
-                random.shuffle(self._random_uid_list_cache)
-            total = len(self._random_uid_list_cache)
-            try:
-                i = int(i)
-                j = total if j is None else int(j)
-                results = self._random_uid_list_cache[i:j]
-            except ValueError:
-                return make_response_json("Invalid bounds index value(s)"), 400
+            if self._random_uid_keys is None or refresh:
+                keys = self._load_random_uid_keys(bool(refresh))
+                # A refresh gets a new ordering, otherwise the configured seed
+                # is used for an ordering that is stable across restarts.
+                seed = None if refresh else self.random_uid_seed
+                self._random_uid_keys = keys
+                self._random_uid_permutation = \
+                    IndexPermutation(len(keys), seed)
+            keys = self._random_uid_keys
+            permutation = cast(IndexPermutation,
+                               self._random_uid_permutation)
+        total = len(keys)
+        try:
+            i = int(i)
+            j = total if j is None else int(j)
+        except ValueError:
+            return make_response_json("Invalid bounds index value(s)"), 400
+        idx = permutation.page(i, j)
+        if isinstance(keys, np.ndarray):
+            results = keys[idx].tolist()
+        else:
+            results = [keys[k] for k in idx]
 
         return make_response_json(
             "success", total=total, results=results
         ), 200
 
+    def _load_random_uid_keys(self, rescan: bool) -> Sequence[Hashable]:
+        """
+        Get the keys of the configured descriptor set in a stable order.
+
+        If a key index path is configured and exists, keys are loaded from it
+        unless ``rescan`` is True. Otherwise keys are read from the descriptor
+        set and, if a key index path is configured, written to it.
+
+        :param rescan: Always read keys from the descriptor set.
+
+        :return: Sequence of descriptor UIDs.
+        """
+        path = self.random_uid_key_index_path
+        if path and not rescan and os.path.isfile(path):
+            LOG.debug("Loading random UID key index: %s", path)
+            try:
+                return np.load(path, mmap_mode='r')
+            except ValueError:
+                # Arrays of python objects cannot be memory-mapped.
+                return np.load(path, allow_pickle=True)
+        keys = list(self.descriptor_set.keys())
+        if path:
+            LOG.debug("Writing random UID key index: %s", path)
+            if keys and all(isinstance(k, str) for k in keys):
+                key_arr = np.asarray(keys, dtype=str)
+            elif keys and all(isinstance(k, int) and not isinstance(k, bool)
+                              for k in keys):
+                key_arr = np.asarray(keys, dtype=np.int64)
+            else:
+                key_arr = np.empty(len(keys), dtype=object)
+                key_arr[:] = keys
+            # Write to a temporary file first so a partially written index is
+            # never loaded.
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(path)), suffix='.npy'
+            )
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, key_arr, allow_pickle=True)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        return keys
+
     def _ensure_session_classifier(
         self, iqrs: smqtk_iqr.iqr.IqrSession
     ) -> Tuple[ClassifyDescriptorSupervised, str, str]:
@@ -1753,6 +2214,13 @@ class IqrService (SmqtkWebApp):
         dirty, retrain the classifier based on the input classifier
         configuration.
 
+        Retraining is avoided when the session's positive and negative
+        examples are the same as those the current classifier was trained
+        with, in which case the classifier and its cached classification
+        results are kept. When the examples match a recently replaced
+        classifier in the session's history, that classifier and its cached
+        results are restored instead of training a new one.
+
         This method assumes its being executed within an IQR session lock.
 
         :param smqtk_iqr.iqr.IqrSession iqrs:
@@ -1781,28 +2249,182 @@ class IqrService (SmqtkWebApp):
         neg_label = "negative"
 
         if self.session_classifier_dirty[sid] or maybe_classifier is None:
-            LOG.debug("Training new classifier for current "
-                      "adjudication state...")
-            classifier = cast(
-                ClassifyDescriptorSupervised,
-                from_config_dict(
-                    self.classifier_config,
-                    ClassifyDescriptorSupervised.get_impls()
-                )
-            )
-            classifier.train(
-                {pos_label: all_pos,
-                 neg_label: all_neg}
+            train_key: CLASSIFIER_TRAIN_KEY_T = (
+                frozenset(d.uuid() for d in all_pos),
+                frozenset(d.uuid() for d in all_neg),
             )
+            prev_train_key = self.session_classifier_train_key[sid]
+            history = self.session_classifier_history[sid]
 
-            self.session_classifiers[sid] = classifier
-            self.session_classification_results[sid] = {}
+            if maybe_classifier is not None and train_key == prev_train_key:
+                LOG.debug("[%s] Adjudication state unchanged since last "
+                          "training, keeping current classifier.", sid)
+                classifier = maybe_classifier
+            else:
+                # Retain the outgoing classifier and its results in case the
+                # session returns to that adjudication state.
+                if maybe_classifier is not None and prev_train_key is not None \
+                        and self.classifier_history_size > 0:
+                    history[prev_train_key] = (
+                        maybe_classifier,
+                        self.session_classification_results[sid]
+                    )
+                    while len(history) > self.classifier_history_size:
+                        del history[next(iter(history))]
+
+                if train_key in history:
+                    LOG.debug("[%s] Restoring previously trained classifier "
+                              "for current adjudication state.", sid)
+                    classifier, c_cache = history.pop(train_key)
+                else:
+                    LOG.debug("Training new classifier for current "
+                              "adjudication state...")
+                    classifier = cast(
+                        ClassifyDescriptorSupervised,
+                        from_config_dict(
+                            self.classifier_config,
+                            ClassifyDescriptorSupervised.get_impls()
+                        )
+                    )
+                    classifier.train(
+                        {pos_label: all_pos,
+                         neg_label: all_neg}
+                    )
+                    c_cache = {}
+
+                self.session_classifiers[sid] = classifier
+                self.session_classification_results[sid] = c_cache
+                self.session_classifier_train_key[sid] = train_key
+                self._start_classification_precompute(iqrs, classifier,
+                                                      c_cache, pos_label)
             self.session_classifier_dirty[sid] = False
         else:
             classifier = cast(ClassifyDescriptorSupervised, maybe_classifier)
 
         return classifier, pos_label, neg_label
 
+    @staticmethod
+    def _classify_vectors(
+        classifier: ClassifyDescriptorSupervised,
+        vectors: Sequence[Optional[np.ndarray]],
+        pos_label: str
+    ) -> List[float]:
+        """
+        Classify descriptor vectors, returning only the positive class
+        confidence for each.
+
+        This avoids creating classification elements for results that are
+        only used for their positive class confidence.
+
+        :param classifier: Session classifier to classify with.
+        :param vectors: Descriptor vectors to classify.
+        :param pos_label: Label of the positive class.
+
+        :return: Positive class confidences parallel to the input vectors.
+        """
+        return [c[pos_label] for c in classifier.classify_arrays(
+            cast(List[np.ndarray], vectors)
+        )]
+
+    def _start_classification_precompute(
+        self, iqrs: smqtk_iqr.iqr.IqrSession,
+        classifier: ClassifyDescriptorSupervised,
+        c_cache: Dict[Hashable, float],
+        pos_label: str
+    ) -> None:
+        """
+        Start scoring the session's working set, or the configured UID list,
+        with the given classifier in a background thread if classification
+        precomputation is enabled.
+
+        This method assumes its being executed within the IQR session lock.
+
+        :param iqrs: IQR session the classifier belongs to.
+        :param classifier: Session classifier to score descriptors with.
+        :param c_cache: Classification results cache associated with the
+            given classifier to be populated.
+        :param pos_label: Label of the positive class.
+        """
+        if not self.precompute_enabled:
+            return
+
+        elem_map: Optional[Dict[Hashable, DescriptorElement]] = None
+        if self.precompute_uids is None:
+            # Working set elements carry their own vectors, so snapshot them
+            # while we have the lock.
+            elem_map = dict(iqrs.working_set.items())
+            uids = list(elem_map)
+        else:
+            uids = list(self.precompute_uids)
+
+        LOG.debug("[%s] Precomputing classifications for %d descriptors",
+                  iqrs.uuid, len(uids))
+        t = threading.Thread(
+            target=self._precompute_classifications,
+            args=(iqrs, classifier, c_cache, pos_label, uids, elem_map)
+        )
+        t.daemon = True
+        self._precompute_threads[iqrs.uuid] = t
+        t.start()
+
+    def _precompute_classifications(
+        self, iqrs: smqtk_iqr.iqr.IqrSession,
+        classifier: ClassifyDescriptorSupervised,
+        c_cache: Dict[Hashable, float],
+        pos_label: str,
+        uids: List[Hashable],
+        elem_map: Optional[Dict[Hashable, DescriptorElement]]
+    ) -> None:
+        """
+        Classify the given UIDs in batches, recording positive class
+        confidences into the given results cache.
+
+        Inference happens outside of the session lock, which is only held
+        to update the cache. Work stops early if the session's classifier is
+        replaced or the session is removed.
+
+        :param iqrs: IQR session the classifier belongs to.
+        :param classifier: Session classifier to score descriptors with.
+        :param c_cache: Classification results cache to populate.
+        :param pos_label: Label of the positive class.
+        :param uids: UIDs of the descriptors to classify.
+        :param elem_map: Optional mapping of UIDs to descriptor elements to
+            get vectors from. If None, vectors are retrieved from the
+            configured descriptor set.
+        """
+        sid = iqrs.uuid
+        batch_size = max(self.precompute_batch_size, 1)
+        try:
+            for i in range(0, len(uids), batch_size):
+                if self.session_classifiers.get(sid, None) is not classifier:
+                    LOG.debug("[%s] Session classifier replaced, stopping "
+                              "classification precompute.", sid)
+                    return
+                with iqrs.lock:
+                    batch = [uid for uid in uids[i:i + batch_size]
+                             if uid not in c_cache]
+                if not batch:
+                    continue
+                if elem_map is None:
+                    vectors = self.descriptor_set.get_many_vectors(batch)
+                else:
+                    vectors = DescriptorElement.get_many_vectors(
+                        elem_map[uid] for uid in batch
+                    )
+                proba = self._classify_vectors(classifier, vectors, pos_label)
+                with iqrs.lock:
+                    c_cache.update(zip(batch, proba))
+            LOG.debug("[%s] Classification precompute complete.", sid)
+        except Exception:
+            LOG.warning("[%s] Classification precompute failed:\n%s",
+                        sid, traceback.format_exc())
+        finally:
+            with iqrs.lock:
+                # Unless a newer precompute replaced this one.
+                if self._precompute_threads.get(sid) is \
+                        threading.current_thread():
+                    del self._precompute_threads[sid]
+
     # GET /classify
     def classify(self) -> Tuple[Callable, int]:
         """
@@ -1862,45 +2484,51 @@ class IqrService (SmqtkWebApp):
                     str(ex), sid=sid
                 ), 400
 
-            # Reduce descriptors actively classified to those not represented
-            # in the results cache.
+            # Collect results already in the cache while locked. The cache
+            # instance is associated with this classifier, so new results may
+            # still be added to it after the lock is released.
             c_cache = self.session_classification_results[sid]
-            uuid_for_clsify = set(uuids) - set(c_cache)
-            if uuid_for_clsify:
-                # Get descriptor elements for classification
-                # get_many_descriptors can raise KeyError
-                descriptors = list(self.descriptor_set
-                                   .get_many_descriptors(uuid_for_clsify))
-                classifications = classifier.classify_elements(
-                    descriptors, self.classification_factory,
-                    # TODO: overwrite? ensure memory only elements?
-                )
-
-                # Update cache
-                for c in classifications:
-                    c_cache[c.uuid] = c[pos_label]
-            elif uuids:
-                LOG.info("No classifications necessary, using cache.")
-
-            # Format output to be parallel lists of UUIDs input and
-            # positive class classification scores.
-            o_uuids = uuids
-            o_proba = [c_cache[uid] for uid in uuids]
-
-        except KeyError as ex:
-            err_uuid = str(ex)
-            LOG.warning(traceback.format_exc())
-            return make_response_json(
-                "Descriptor UUID '%s' cannot be found in the "
-                "configured descriptor set."
-                % err_uuid,
-                sid=sid,
-                uuid=err_uuid,
-            ), 404
-
+            proba_map = {uid: c_cache[uid] for uid in uuids if uid in c_cache}
         finally:
             iqrs.lock.release()
 
+        # Reduce descriptors actively classified to those not represented
+        # in the results cache. Classification happens outside the session
+        # lock so concurrent requests are not blocked on inference.
+        uuid_for_clsify = [uid for uid in dict.fromkeys(uuids)
+                           if uid not in proba_map]
+        if uuid_for_clsify:
+            try:
+                # Get descriptor vectors for classification in bulk.
+                # get_many_vectors can raise KeyError
+                vectors = self.descriptor_set.get_many_vectors(uuid_for_clsify)
+            except KeyError as ex:
+                err_uuid = str(ex)
+                LOG.warning(traceback.format_exc())
+                return make_response_json(
+                    "Descriptor UUID '%s' cannot be found in the "
+                    "configured descriptor set."
+                    % err_uuid,
+                    sid=sid,
+                    uuid=err_uuid,
+                ), 404
+            new_proba = dict(zip(
+                uuid_for_clsify,
+                self._classify_vectors(classifier, vectors, pos_label)
+            ))
+            proba_map.update(new_proba)
+
+            # Update cache
+            with iqrs:
+                c_cache.update(new_proba)
+        elif uuids:
+            LOG.info("No classifications necessary, using cache.")
+
+        # Format output to be parallel lists of UUIDs input and
+        # positive class classification scores.
+        o_uuids = uuids
+        o_proba = [proba_map[uid] for uid in uuids]
+
         return make_response_json(
             "Finished classification",
             sid=sid,
@@ -1,9 +1,9 @@
 import flask
-from io import BytesIO
 import multiprocessing
 import os
+import shutil
 import tempfile
-from typing import Dict, Optional, Callable, TYPE_CHECKING
+from typing import Dict, IO, Optional, Callable, Set, Tuple, TYPE_CHECKING
 
 from smqtk_dataprovider.utils.file import safe_create_dir
 import logging
@@ -48,13 +48,13 @@ class FileUploadMod (flask.Blueprint):
         self.working_dir = working_directory
 
         # TODO: Move chunk storage to database for APACHE multiprocessing
-        # File chunk aggregation
-        #   Top level key is the file ID of the upload. The dictionary
-        #   underneath that is the index ID'd chunks. When all chunks are
-        #   present, the file is written and the entry in this map is removed.
-        self._file_chunks: Dict[
-            str, Dict[int, BytesIO]
-        ] = {}
+        # Partial uploads
+        #   Chunks are written straight to their offset in a temporary file,
+        #   preallocated to the full file size, as they are received. Top level
+        #   key is the file ID of the upload. When all chunks are present, the
+        #   file is recorded as completed and these entries are removed.
+        self._partial_paths: Dict[str, str] = {}
+        self._received_chunks: Dict[str, Set[int]] = {}
         # Lock per file ID so as to not collide when uploading multiple chunks
         self._fid_locks: Dict[str, multiprocessing.synchronize.RLock] = {}
 
@@ -65,6 +65,23 @@ class FileUploadMod (flask.Blueprint):
         # Routing
         #
 
+        @self.route('/upload_chunk', methods=["GET"])
+        @self.parent_app.module_login.login_required
+        def test_chunk() -> Tuple[str, int]:
+            """
+            Report whether a chunk was already received, so that interrupted
+            uploads are resumed without sending it again.
+
+            Returns 200 if the chunk was received, otherwise 204.
+            """
+            args = flask.request.args
+            fid = args['flowIdentifier']
+            current_chunk = int(args['flowChunkNumber'])
+            if fid in self._completed_files or \
+                    current_chunk in self._received_chunks.get(fid, ()):
+                return "Chunk already received", 200
+            return "", 204
+
         @self.route('/upload_chunk', methods=["POST"])
         @self.parent_app.module_login.login_required
         def upload_file() -> str:
@@ -79,51 +96,54 @@ class FileUploadMod (flask.Blueprint):
             fid = form['flowIdentifier']
             current_chunk = int(form['flowChunkNumber'])
             total_chunks = int(form['flowTotalChunks'])
+            chunk_size = int(form['flowChunkSize'])
+            total_size = int(form['flowTotalSize'])
             filename = form['flowFilename']
 
             chunk_data: FileStorage = flask.request.files['file']
 
-            with self._fid_locks.setdefault(fid, multiprocessing.RLock()):
-                # Create new entry in chunk map / add to existing entry
-                # - Need to explicitly copy the buffered data as the file object
-                #   closes between chunk messages.
-                self._file_chunks.setdefault(fid, {})[current_chunk] \
-                    = BytesIO(chunk_data.read())  # type: ignore
-                message = "Uploaded chunk #%d of %d for file '%s'" \
-                    % (current_chunk, total_chunks, filename)
-
-                if total_chunks == len(self._file_chunks[fid]):
-                    LOG.debug("[%s] Final chunk uploaded", filename+"::"+fid)
-                    # have all chucks in memory now
-                    try:
-                        # Combine chunks into single file
-                        file_ext = os.path.splitext(filename)[1]
-                        file_saved_path = self._write_file_chunks(
-                            self._file_chunks[fid], file_ext
-                        )
-                        LOG.debug("[%s] saved from chunks: %s",
-                                  filename+"::"+fid, file_saved_path)
-                        # now in file, free up dict memory
-
-                        self._completed_files[fid] = file_saved_path
-                        message = "[%s] Completed upload" % (filename+"::"+fid)
-
-                    except IOError as ex:
-                        LOG.debug("[%s] Failed to write combined chunks",
-                                  filename+"::"+fid)
-                        message = "Failed to write out combined chunks for " \
-                                  "file %s: %s" % (filename, str(ex))
-                        raise RuntimeError(message)
-
-                    except NotImplementedError as ex:
-                        message = "Encountered non-implemented code path: %s" \
-                                  % str(ex)
-                        raise RuntimeError(message)
-
-                    finally:
-                        # remove chunk map entries
-                        del self._file_chunks[fid]
-                        del self._fid_locks[fid]
+            fid_lock = self._fid_locks.setdefault(fid, multiprocessing.RLock())
+            with fid_lock:
+                if fid in self._completed_files:
+                    return "[%s] Completed upload" % (filename+"::"+fid)
+                if fid not in self._partial_paths:
+                    file_ext = os.path.splitext(filename)[1]
+                    self._partial_paths[fid] = self._create_partial_file(
+                        total_size, file_ext
+                    )
+                    self._received_chunks[fid] = set()
+                partial_path = self._partial_paths[fid]
+
+            # Chunks write to disjoint regions of the file, so they need not
+            # be serialized.
+            try:
+                self._write_chunk(partial_path,
+                                  (current_chunk - 1) * chunk_size,
+                                  chunk_data.stream)
+            except IOError as ex:
+                LOG.debug("[%s] Failed to write chunk #%d",
+                          filename+"::"+fid, current_chunk)
+                self._discard_partial(fid)
+                raise RuntimeError("Failed to write chunk for file %s: %s"
+                                   % (filename, str(ex)))
+
+            message = "Uploaded chunk #%d of %d for file '%s'" \
+                % (current_chunk, total_chunks, filename)
+            with fid_lock:
+                received = self._received_chunks.get(fid)
+                if received is None:
+                    # Upload was completed or discarded concurrently.
+                    return message
+                received.add(current_chunk)
+                if total_chunks == len(received):
+                    LOG.debug("[%s] Final chunk uploaded: %s",
+                              filename+"::"+fid, partial_path)
+                    self._completed_files[fid] = partial_path
+                    # remove partial upload entries
+                    del self._partial_paths[fid]
+                    del self._received_chunks[fid]
+                    del self._fid_locks[fid]
+                    message = "[%s] Completed upload" % (filename+"::"+fid)
 
             # Flow only displays return as a string, so just returning the
             # message component.
@@ -171,24 +191,21 @@ class FileUploadMod (flask.Blueprint):
         """
         del self._completed_files[file_unique_id]
 
-    # noinspection PyMethodMayBeStatic
-    def _write_file_chunks(
-        self, chunk_map: Dict[int, BytesIO],
-        file_extension: str = ''
-    ) -> str:
+    def _create_partial_file(self, total_size: int,
+                             file_extension: str = '') -> str:
         """
-        Given a mapping of chunks, write their contents to a temporary file,
-        returning the path to that file.
+        Create a temporary file to write the chunks of an upload into,
+        preallocated to the size of the complete file.
 
         Returned file path should be manually removed by the user.
 
-        :param chunk_map: Mapping of integer index to file-like chunk
+        :param total_size: Size in bytes of the complete file.
         :param file_extension: String extension to suffix the temporary file
             with
 
-        :raises OSError: OS problems creating temporary file or writing it out.
+        :raises OSError: OS problems creating temporary file.
 
-        :return: Path to temporary combined file
+        :return: Path to the temporary file
 
         """
         # Make sure write dir exists...
@@ -196,10 +213,41 @@ class FileUploadMod (flask.Blueprint):
             safe_create_dir(self.working_dir)
         tmp_fd, tmp_path = tempfile.mkstemp(file_extension,
                                             dir=self.working_dir)
-        LOG.debug("Combining chunks into temporary file: %s", tmp_path)
-        tmp_file = open(tmp_path, 'wb')
-        for idx, chunk in sorted(chunk_map.items(), key=lambda p: p[0]):
-            data = chunk.read()
-            tmp_file.write(data)
-        tmp_file.close()
+        LOG.debug("Writing chunks into temporary file: %s", tmp_path)
+        with os.fdopen(tmp_fd, 'wb') as tmp_file:
+            # Sparse where supported, so this does not write anything yet.
+            tmp_file.truncate(total_size)
         return tmp_path
+
+    @staticmethod
+    def _write_chunk(path: str, offset: int, chunk: IO[bytes]) -> None:
+        """
+        Stream a chunk into a file at the given offset.
+
+        :param path: Path to the file to write into.
+        :param offset: Byte offset in the file to write the chunk at.
+        :param chunk: File-like object to read the chunk's bytes from.
+
+        :raises OSError: OS problems writing to the file.
+
+        """
+        with open(path, 'r+b') as f:
+            f.seek(offset)
+            shutil.copyfileobj(chunk, f)
+
+    def _discard_partial(self, file_unique_id: str) -> None:
+        """
+        Drop a partial upload, removing its temporary file.
+
+        :param file_unique_id: Unique ID of the partially uploaded file.
+
+        """
+        lock = self._fid_locks.get(file_unique_id)
+        if lock is None:
+            return
+        with lock:
+            path = self._partial_paths.pop(file_unique_id, None)
+            self._received_chunks.pop(file_unique_id, None)
+            self._fid_locks.pop(file_unique_id, None)
+        if path is not None and os.path.isfile(path):
+            os.remove(path)
@@ -2,18 +2,21 @@
 IQR Search sub-application module
 """
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import json
 import os
 import os.path as osp
 import random
 import shutil
+import threading
+import time
+import urllib.parse
 from typing import Any, Dict, Hashable, Type, TypeVar, Optional, TYPE_CHECKING
 import zipfile
 import logging
 
 import flask
-import PIL.Image
 
 from smqtk_dataprovider import DataSet, DataElement
 from smqtk_dataprovider.utils.file import safe_create_dir
@@ -27,7 +30,7 @@ from smqtk_core.configuration import (
 from smqtk_iqr.utils.web import ServiceProxy
 from smqtk_iqr.iqr import IqrSession
 from smqtk_iqr.utils.mimetype import get_mimetypes
-from smqtk_iqr.utils.preview_cache import PreviewCache
+from smqtk_iqr.utils.preview_cache import PreviewCache, PreviewPending
 from smqtk_iqr.web.search_app.modules.file_upload.FileUploadMod import FileUploadMod
 from smqtk_iqr.web.search_app.modules.static_host import StaticDirectoryHost
 
@@ -75,6 +78,30 @@ class IqrSearch (flask.Flask, Configurable):
         del d['parent_app']
 
         d['iqr_service_url'] = None
+        # Connection pool, timeout and retry options of the client used to
+        # talk to the IQR service. See ``smqtk_iqr.utils.web.ServiceProxy``.
+        d['iqr_service_client'] = {
+            'pool_size': 10,
+            'timeout': None,
+            'retries': 2,
+            'backoff_factor': 0.1,
+        }
+        # Seconds a session ID confirmed to exist on the IQR service is
+        # trusted before checking with the service again.
+        d['session_cache_ttl'] = 30
+        # Number of threads generating data previews for a batch preview
+        # request concurrently.
+        d['preview_workers'] = 4
+        # Thumbnail size and format of data previews, and the optional total
+        # size budget in bytes of stored previews. See
+        # ``smqtk_iqr.utils.preview_cache.PreviewCache``.
+        d['preview_cache'] = {
+            'max_dimension': 256,
+            'image_format': 'JPEG',
+            'max_bytes': None,
+            'video_format': 'WEBP',
+            'video_workers': 1,
+        }
 
         # fill in plugin configs
         d['data_set'] = make_default_config(DataSet.get_impls())
@@ -110,7 +137,11 @@ class IqrSearch (flask.Flask, Configurable):
 
     def __init__(
         self, parent_app: 'IqrSearchDispatcher', iqr_service_url: str,
-        data_set: DataSet, working_directory: str
+        data_set: DataSet, working_directory: str,
+        iqr_service_client: Optional[Dict[str, Any]] = None,
+        session_cache_ttl: float = 30,
+        preview_workers: int = 4,
+        preview_cache: Optional[Dict[str, Any]] = None
     ):
         """
         Initialize a generic IQR Search module with a single descriptor and
@@ -128,6 +159,20 @@ class IqrSearch (flask.Flask, Configurable):
             These may be considered temporary and may be removed between
             executions of this app.
 
+        :param iqr_service_client: Optional keyword arguments to the
+            ``ServiceProxy`` used to talk to the IQR service, e.g. its
+            connection pool size, timeout and retries.
+
+        :param session_cache_ttl: Seconds a session ID confirmed to exist on
+            the IQR service is trusted before checking with the service again.
+
+        :param preview_workers: Number of threads generating data previews for
+            a batch preview request concurrently.
+
+        :param preview_cache: Optional keyword arguments to the
+            ``PreviewCache`` of data previews, e.g. their maximum dimension,
+            image format and total size budget.
+
         :raises ValueError: Invalid Descriptor or indexer type
 
         """
@@ -139,7 +184,15 @@ class IqrSearch (flask.Flask, Configurable):
 
         self._parent_app = parent_app
         self._data_set = data_set
-        self._iqr_service = ServiceProxy(iqr_service_url.rstrip('/'))
+        self._iqr_service_client_config = dict(iqr_service_client or {})
+        self._iqr_service = ServiceProxy(iqr_service_url.rstrip('/'),
+                                         **self._iqr_service_client_config)
+
+        # Session IDs known to exist on the IQR service, mapped to the time
+        # after which they must be checked again.
+        self.session_cache_ttl = session_cache_ttl
+        self._known_sids: Dict[str, float] = {}
+        self._known_sids_lock = threading.Lock()
 
         # base directory that's transformed by the ``work_dir`` property into
         # an absolute path.
@@ -174,12 +227,17 @@ class IqrSearch (flask.Flask, Configurable):
         ] = {}
 
         # Preview Image Caching
+        self._preview_cache_config = dict(preview_cache or {})
         self._preview_cache = PreviewCache(osp.join(self._static_data_dir,
-                                                    "previews"))
-
-        # Cache mapping of written static files for data elements
-        self._static_cache: Dict[Hashable, str] = {}
-        self._static_cache_element: Dict[Hashable, DataElement] = {}
+                                                    "previews"),
+                                           **self._preview_cache_config)
+
+        # Pool of threads generating previews for batch preview requests.
+        self.preview_workers = preview_workers
+        self._preview_executor = ThreadPoolExecutor(
+            max_workers=preview_workers,
+            thread_name_prefix="IqrSearch-preview"
+        )
 
         #
         # Routing
@@ -394,53 +452,63 @@ class IqrSearch (flask.Flask, Configurable):
             associated with the give UID (plus some other metadata).
             """
             uid = flask.request.args['uid']
+            sid = self.get_current_iqr_session()
+            info = self.get_preview_info(uid, sid)
+            return flask.jsonify(info)
 
-            info: Dict[str, Any] = {
-                "success": True,
-                "message": None,
-                "shape": None,  # (width, height)
-                "static_file_link": None,
-                "static_preview_link": None,
-            }
-
-            # Try to find a DataElement by the given UUID in our indexed data
-            # or in the session's example data.
-            de: Optional[DataElement]
-            if self._data_set.has_uuid(uid):
-                de = self._data_set.get_data(uid)
-            else:
-                sid = self.get_current_iqr_session()
-                de = self._iqr_example_data[sid].get(uid, None)
+        @self.route("/get_data_file", methods=["GET"])
+        @self._parent_app.module_login.login_required
+        def get_data_file() -> flask.Response:
+            """
+            Serve the full data file associated with the given UID.
 
+            Data files on disk are served in place, without being copied,
+            while the content of other data elements is served from memory.
+            Conditional and byte range requests are supported.
+            """
+            uid = flask.request.args['uid']
+            sid = self.get_current_iqr_session()
+            de = self.get_data_element(uid, sid)
             if not de:
-                info["success"] = False
-                info["message"] = "UUID '%s' not part of the base or working " \
-                                  "data set!" % uid
-            else:
-                # Preview_path should be a path within our statically hosted
-                # area.
-                preview_path = self._preview_cache.get_preview_image(de)
-                img = PIL.Image.open(preview_path)
-                info["shape"] = img.size
-
-                if de.uuid() not in self._static_cache:
-                    self._static_cache[de.uuid()] = \
-                        de.write_temp(self._static_data_dir)
-                    self._static_cache_element[de.uuid()] = de
-
-                # Need to format links by transforming the generated paths to
-                # something usable by webpage:
-                # - make relative to the static directory, and then pre-pending
-                #   the known static url to the
-                info["static_preview_link"] = \
-                    self._static_data_prefix + '/' + \
-                    os.path.relpath(preview_path, self._static_data_dir)
-                info['static_file_link'] = \
-                    self._static_data_prefix + '/' + \
-                    os.path.relpath(self._static_cache[de.uuid()],
-                                    self._static_data_dir)
+                flask.abort(404)
+            mimetype = de.content_type() or 'application/octet-stream'
+            if isinstance(de, DataFileElement):
+                return flask.send_file(osp.abspath(de.write_temp()),
+                                       mimetype=mimetype, conditional=True)
+            return flask.send_file(BytesIO(de.get_bytes()),
+                                   mimetype=mimetype, conditional=True)
+
+        @self.route("/get_data_preview_images", methods=["POST"])
+        @self._parent_app.module_login.login_required
+        def get_data_preview_images() -> flask.Response:
+            """
+            Return the preview image links and metadata for many data files,
+            generating missing previews concurrently.
 
-            return flask.jsonify(info)
+            Form args:
+                uids
+                    JSON list of UIDs to get previews for.
+
+            :return: {
+                    results: [
+                        <info as returned by ``get_data_preview_image``>,
+                        ...
+                    ]
+                }
+            """
+            uids = json.loads(flask.request.form.get('uids', '[]'))
+            sid = self.get_current_iqr_session()
+            # Generate the preview for repeated UIDs only once.
+            unique_uids = list(dict.fromkeys(uids))
+            uid_info = dict(zip(
+                unique_uids,
+                self._preview_executor.map(
+                    lambda u: self.get_preview_info(u, sid), unique_uids
+                )
+            ))
+            return flask.jsonify({
+                "results": [uid_info[uid] for uid in uids],
+            })
 
         @self.route('/iqr_ingest_file', methods=['POST'])
         @self._parent_app.module_login.login_required
@@ -477,10 +545,12 @@ class IqrSearch (flask.Flask, Configurable):
             # Extend session ingest -- modifying
             LOG.debug("[%s::%s] Adding new data to session "
                       "external positives", sid, fid)
-            data_b64 = base64.b64encode(upload_data.get_bytes())
-            data_ct = upload_data.content_type()
-            r = self._iqr_service.post('add_external_pos', sid=sid,
-                                       base64=data_b64, content_type=data_ct)
+            # Stream the file as the raw request body rather than base64
+            # encoding it into a form.
+            data_ct = upload_data.content_type() or 'application/octet-stream'
+            with open(sess_upload, 'rb') as data_file:
+                r = self._iqr_service.post_body('add_external_pos', data_file,
+                                                data_ct, sid=sid)
             r.raise_for_status()
 
             return str(uuid)
@@ -550,6 +620,39 @@ class IqrSearch (flask.Flask, Configurable):
                 "is_neg": get_r_json['is_neg'],
             })
 
+        @self.route("/get_adjudications", methods=["POST"])
+        @self._parent_app.module_login.login_required
+        def get_adjudications() -> flask.Response:
+            """
+            Get the adjudication status of many data/descriptor elements, in
+            either our example set or working index, by UUID with a single
+            IQR service request.
+
+            Form args:
+                uids
+                    JSON list of UUIDs to get adjudication status for.
+
+            :return: {
+                    results: [
+                        [<uuid>, <is_pos:bool>, <is_neg:bool>],
+                        ...
+                    ]
+                }
+            """
+            uids = json.loads(flask.request.form.get('uids', '[]'))
+            results = []
+            if uids:
+                sid = self.get_current_iqr_session()
+                # Sent in the request body as a page of UIDs may be too long
+                # for a URL.
+                post_r = self._iqr_service.post('get_adjudications', sid=sid,
+                                                uids=json.dumps(uids))
+                post_r.raise_for_status()
+                results = post_r.json()['results']
+            return flask.jsonify({
+                "results": results,
+            })
+
         @self.route("/adjudicate", methods=["POST"])
         @self._parent_app.module_login.login_required
         def adjudicate() -> flask.Response:
@@ -681,6 +784,7 @@ class IqrSearch (flask.Flask, Configurable):
             })
 
     def __del__(self) -> None:
+        self._preview_executor.shutdown(wait=False)
         for wdir in self._iqr_work_dirs.values():
             if os.path.isdir(wdir):
                 shutil.rmtree(wdir)
@@ -688,6 +792,10 @@ class IqrSearch (flask.Flask, Configurable):
     def get_config(self) -> Dict[str, Any]:
         return {
             'iqr_service_url': self._iqr_service.url,
+            'iqr_service_client': self._iqr_service_client_config,
+            'session_cache_ttl': self.session_cache_ttl,
+            'preview_workers': self.preview_workers,
+            'preview_cache': self._preview_cache_config,
             'working_directory': self._working_dir,
             'data_set': to_config_dict(self._data_set),
         }
@@ -704,15 +812,7 @@ class IqrSearch (flask.Flask, Configurable):
         Get the current IQR Session UUID.
         """
         sid = str(flask.session.sid)  # type: ignore
-
-        # Ensure there is an initialized session on the configured service.
-        created_session = False
-        get_r = self._iqr_service.get('session_ids')
-        get_r.raise_for_status()
-        if sid not in get_r.json()['session_uuids']:
-            post_r = self._iqr_service.post('session', sid=sid)
-            post_r.raise_for_status()
-            created_session = True
+        created_session = self._ensure_service_session(sid)
 
         if created_session or (sid not in self._iqr_work_dirs):
             # Dictionaries not initialized yet for this UUID.
@@ -723,6 +823,116 @@ class IqrSearch (flask.Flask, Configurable):
 
         return sid
 
+    def _ensure_service_session(self, sid: str) -> bool:
+        """
+        Ensure there is an initialized session on the configured service,
+        unless it was confirmed to exist within the last
+        ``session_cache_ttl`` seconds.
+
+        All checks of session existence go through here, so that the TTL
+        cache of known session IDs is kept in one place.
+
+        :param sid: Session ID.
+
+        :return: If the session was created on the service.
+        """
+        now = time.monotonic()
+        with self._known_sids_lock:
+            if self._known_sids.get(sid, 0) > now:
+                return False
+
+        created_session = False
+        get_r = self._iqr_service.get('session_exists', sid=sid)
+        get_r.raise_for_status()
+        if not get_r.json()['exists']:
+            post_r = self._iqr_service.post('session', sid=sid)
+            post_r.raise_for_status()
+            created_session = True
+        with self._known_sids_lock:
+            # Drop expired entries so the cache tracks active sessions.
+            self._known_sids = {k: t for k, t in self._known_sids.items()
+                                if t > now}
+            self._known_sids[sid] = now + self.session_cache_ttl
+        return created_session
+
+    def get_preview_info(self, uid: Hashable, sid: str) -> Dict[str, Any]:
+        """
+        Get the preview image link and metadata for the data file associated
+        with the given UID, generating the preview if needed.
+
+        :param uid: UID of the data element in the base data set or in the
+            session's example data.
+        :param sid: Session ID whose example data to also look in.
+
+        :return: Dictionary of the ``success`` of the lookup and preview
+            generation, a failure ``message``, the preview image ``shape`` as (width, height), the
+            ``static_file_link`` and ``static_preview_link`` of the data file
+            and its preview, and whether the preview is still being generated
+            (``preview_pending``), in which case the preview link is to a
+            placeholder image.
+        """
+        info: Dict[str, Any] = {
+            "success": True,
+            "message": None,
+            "shape": None,  # (width, height)
+            "static_file_link": None,
+            "static_preview_link": None,
+            "preview_pending": False,
+        }
+
+        de = self.get_data_element(uid, sid)
+        if not de:
+            info["success"] = False
+            info["message"] = "UUID '%s' not part of the base or working " \
+                              "data set!" % uid
+            return info
+
+        # Preview_path should be a path within our statically hosted
+        # area.
+        try:
+            preview_path, metadata = self._preview_cache.get_preview(de)
+        except PreviewPending:
+            preview_path = self._preview_cache.placeholder_path()
+            metadata = self._preview_cache.get_metadata(preview_path)
+            info["preview_pending"] = True
+        except (ValueError, RuntimeError, OSError) as ex:
+            # E.g. an undecodable image, or a failed or missing ffmpeg.
+            LOG.warning("Failed generating preview of '%s'", uid,
+                        exc_info=True)
+            info["success"] = False
+            info["message"] = "Failed generating preview of '%s': %s" \
+                              % (uid, ex)
+            return info
+        info["shape"] = metadata['shape']
+
+        # Need to format links by transforming the generated paths to
+        # something usable by webpage:
+        # - make relative to the static directory, and then pre-pending
+        #   the known static url to the
+        info["static_preview_link"] = \
+            self._static_data_prefix + '/' + \
+            os.path.relpath(preview_path, self._static_data_dir)
+        # The data file itself is served from where it is by the
+        # ``get_data_file`` route.
+        info['static_file_link'] = \
+            'get_data_file?' + urllib.parse.urlencode({'uid': uid})
+        return info
+
+    def get_data_element(self, uid: Hashable,
+                         sid: str) -> Optional[DataElement]:
+        """
+        Find a data element by UID in our indexed data or in a session's
+        example data.
+
+        :param uid: UID of the data element.
+        :param sid: Session ID whose example data to also look in.
+
+        :return: The data element, or None if not found.
+        """
+        if self._data_set.has_uuid(uid):
+            return self._data_set.get_data(uid)
+        return self._iqr_example_data.get(sid, {}).get(uid, None)
+
     def reset_session_local(self, sid: str) -> None:
         """
         Reset elements of this server for a given session ID.
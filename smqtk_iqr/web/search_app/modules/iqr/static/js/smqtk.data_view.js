@@ -48,6 +48,10 @@ function DataView(container, rank, uid, probability, is_example) {
 
     this.loading_gif = "static/img/loading.gif";
 
+    // Milliseconds to wait before asking again for a preview that is still
+    // being generated.
+    this.preview_retry_ms = 2000;
+
     //
     // View Layout
     //
@@ -126,6 +130,82 @@ function DataView(container, rank, uid, probability, is_example) {
     return this;
 }
 
+/**
+ * Per-UID requests waiting to be sent, as a mapping of batch endpoint URL to
+ * a mapping of UID to success and error callbacks.
+ */
+DataView.pending_requests = {};
+
+/**
+ * Request information about a data element from a batch endpoint of the
+ * server.
+ *
+ * Requests to the same endpoint made in the same pass of the event loop, e.g.
+ * by all the views of a page of results, are coalesced into a single server
+ * request. Batch endpoints take a JSON list of ``uids`` and return a
+ * ``results`` list parallel to it.
+ *
+ * @param url Batch endpoint URL.
+ * @param uid UID of the data element.
+ * @param success Function called with the element's result once received.
+ * @param error Function called with the error if the request failed.
+ */
+DataView.batch_request = function (url, uid, success, error) {
+    if (!DataView.pending_requests.hasOwnProperty(url)) {
+        DataView.pending_requests[url] = {};
+        setTimeout(function () {
+            DataView.send_batch_request(url);
+        }, 0);
+    }
+    var pending = DataView.pending_requests[url];
+    if (!pending.hasOwnProperty(uid)) {
+        pending[uid] = {uid: uid, callbacks: []};
+    }
+    pending[uid].callbacks.push({success: success, error: error});
+};
+
+/**
+ * Send all pending requests to a batch endpoint in one server request.
+ *
+ * @param url Batch endpoint URL.
+ */
+DataView.send_batch_request = function (url) {
+    var pending = DataView.pending_requests[url];
+    delete DataView.pending_requests[url];
+
+    var requests = [];
+    for (var key in pending) {
+        if (pending.hasOwnProperty(key)) {
+            requests.push(pending[key]);
+        }
+    }
+
+    $.ajax({
+        url: url,
+        method: "POST",
+        data: {
+            uids: JSON.stringify(requests.map(function (r) { return r.uid; }))
+        },
+        success: function (data)
+        {
+            // noinspection JSUnresolvedVariable
+            data.results.forEach(function (result, i) {
+                requests[i].callbacks.forEach(function (c) {
+                    c.success(result);
+                });
+            });
+        },
+        error: function (jqXHR, textStatus, errorThrown)
+        {
+            requests.forEach(function (r) {
+                r.callbacks.forEach(function (c) {
+                    c.error(errorThrown);
+                });
+            });
+        }
+    });
+};
+
 /**
  * Update the view of this element based on current state.
  */
@@ -173,28 +253,20 @@ DataView.prototype.update_view = function (server_update) {
 
     if (server_update)
     {
-        var query_url = null;
-        if (this.is_example) {
-            query_url = "get_example_adjudication";
-        }
-        else {
-            query_url = "get_index_adjudication";
-        }
-
-        $.ajax({
-            url: query_url+"?uid="+this.uid,
-            success: function (data)
+        DataView.batch_request("get_adjudications", this.uid,
+            function (result)
             {
-                inst.is_positive = data['is_pos'];
-                inst.is_negative = data['is_neg'];
+                // result is [uid, is_pos, is_neg]
+                inst.is_positive = result[1];
+                inst.is_negative = result[2];
 
                 update_adj_button_view();
             },
-            error: function (jqXHR, textStatus, errorThrown)
+            function (errorThrown)
             {
                 alert_error("AJAX Error: " + errorThrown);
             }
-        });
+        );
     }
     else
     {
@@ -208,9 +280,8 @@ DataView.prototype.update_view = function (server_update) {
     else
     {
         // Get the preview image information from the server
-        $.ajax({
-            url: "get_data_preview_image?uid=" + this.uid,
-            success: function (data) {
+        DataView.batch_request("get_data_preview_images", this.uid,
+            function (data) {
                 // Check for failures
                 if  (!data.success) {
                     alert_error("Image fetch error: " + data.message);
@@ -221,20 +292,30 @@ DataView.prototype.update_view = function (server_update) {
                     inst.image_preview_data = data.static_preview_link;
                     // noinspection JSUnresolvedVariable
                     inst.static_view_link = data.static_file_link;
-                    inst.image_loaded = true;
-
                     inst.img_long_side =
                         parseInt(data.shape[1]) > parseInt(data.shape[0]);
+
+                    // noinspection JSUnresolvedVariable
+                    if (data.preview_pending) {
+                        // Showing a placeholder until the preview is
+                        // generated, so ask again later.
+                        setTimeout(function () {
+                            inst.update_view();
+                        }, inst.preview_retry_ms);
+                    }
+                    else {
+                        inst.image_loaded = true;
+                    }
                 }
                 update_image();
             },
-            error: function (jqXHR, textStatus, errorThrown) {
+            function (errorThrown) {
                 alert_error("Failed to load preview image for ID " + inst.uid
                         + ": " + errorThrown);
                 inst.image_preview_data = "broken-image-src";
                 update_image();
             }
-        });
+        );
     }
 };
 
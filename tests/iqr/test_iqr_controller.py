@@ -0,0 +1,40 @@
+import unittest.mock as mock
+
+from smqtk_relevancy.interfaces.rank_relevancy import RankRelevancyWithFeedback
+from smqtk_iqr.iqr.iqr_controller import IqrController
+from smqtk_iqr.iqr.iqr_session import IqrSession
+
+
+class TestIqrController (object):
+    """
+    Unit tests pertaining to the IqrController class.
+    """
+
+    def test_remove_session_closes(self) -> None:
+        """
+        Test that removing a session closes it.
+        """
+        controller = IqrController()
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback))
+        controller.add_session(iqrs)
+        controller.remove_session(iqrs.uuid)
+        assert not controller.has_session_uuid(iqrs.uuid)
+        assert iqrs.closed
+
+    def test_expired_sessions_wake_waiters(self) -> None:
+        """
+        Test that threads waiting for expired sessions to change are woken.
+        """
+        controller = IqrController(expire_enabled=True, expire_check=0.01)
+        try:
+            other_iqrs = IqrSession(
+                mock.MagicMock(spec=RankRelevancyWithFeedback))
+            iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback))
+            controller.add_session(other_iqrs, timeout=0.05)
+            controller.add_session(iqrs, timeout=0.05)
+            assert iqrs.wait_for_change(0, timeout=10) == 0
+            assert iqrs.closed
+            assert other_iqrs.wait_for_change(0, timeout=10) == 0
+            assert other_iqrs.closed
+        finally:
+            controller.stop_expiration_monitor()
@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 import unittest.mock as mock
 
@@ -838,6 +840,133 @@ class TestIqrSession (object):
         # instances.
         assert id(actual1) != id(actual2)
 
+    def test_get_adjudication_state(self) -> None:
+        """
+        Test that adjudication state lookups reflect working set and external
+        adjudications, before and after the UID index is built.
+        """
+        p0 = DescriptorMemoryElement(0).set_vector([0])
+        n1 = DescriptorMemoryElement(1).set_vector([1])
+        e2 = DescriptorMemoryElement(2).set_vector([2])
+        self.iqrs.adjudicate(new_positives=[p0], new_negatives=[n1])
+        assert self.iqrs.get_adjudication_state([0, 1, 2, 3]) == \
+            [(True, False), (False, True), (False, False), (False, False)]
+
+        # Index is now built and should be updated incrementally.
+        self.iqrs.external_descriptors(positive=[e2])
+        self.iqrs.adjudicate(new_negatives=[p0], un_negatives=[n1])
+        assert self.iqrs.get_adjudication_state([0, 1, 2]) == \
+            [(False, True), (False, False), (True, False)]
+        self.iqrs.external_descriptors(negative=[e2])
+        assert self.iqrs.get_adjudication_state([2]) == [(False, True)]
+
+        self.iqrs.reset()
+        assert self.iqrs.get_adjudication_state([0, 1, 2]) == \
+            [(False, False)] * 3
+
+    def test_get_adjudication_state_shared_uid(self) -> None:
+        """
+        Test that a UID adjudicated both externally and in the working set
+        remains adjudicated until neither adjudication remains.
+        """
+        d_ws = DescriptorMemoryElement(0).set_vector([0])
+        d_ext = DescriptorMemoryElement(0).set_vector([0])
+        self.iqrs.adjudicate(new_positives=[d_ws])
+        self.iqrs.external_descriptors(positive=[d_ext])
+        assert self.iqrs.get_adjudication_state([0]) == [(True, False)]
+        self.iqrs.adjudicate(un_positives=[d_ws])
+        assert self.iqrs.get_adjudication_state([0]) == [(True, False)]
+
+    def test_revision(self) -> None:
+        """
+        Test that the revision and change token only change when session
+        state changes.
+        """
+        d0 = DescriptorMemoryElement(0).set_vector([0])
+        assert self.iqrs.revision == 0
+        token0 = self.iqrs.change_token
+
+        self.iqrs.adjudicate(new_positives=[d0])
+        assert self.iqrs.revision == 1
+        # No effective change.
+        self.iqrs.adjudicate(new_positives=[d0])
+        self.iqrs.external_descriptors()
+        assert self.iqrs.revision == 1
+
+        self.iqrs.external_descriptors(negative=[d0])
+        assert self.iqrs.revision == 2
+        self.iqrs.reset()
+        assert self.iqrs.revision == 3
+        assert self.iqrs.change_token != token0
+
+        # Another instance with the same UID does not share change tokens.
+        other = IqrSession(self.iqrs.rank_relevancy_with_feedback,
+                           session_uid=self.iqrs.uuid)
+        assert other.change_token != token0
+
+    def test_wait_for_change(self) -> None:
+        """
+        Test that waiting for a change returns when another thread changes the
+        session, and times out with the same revision otherwise.
+        """
+        assert self.iqrs.wait_for_change(0, timeout=0.01) == 0
+
+        d0 = DescriptorMemoryElement(0).set_vector([0])
+        t = threading.Timer(
+            0.05, lambda: self.iqrs.adjudicate(new_positives=[d0])
+        )
+        t.start()
+        try:
+            assert self.iqrs.wait_for_change(0, timeout=10) == 1
+        finally:
+            t.join()
+        # Already different revisions return immediately.
+        assert self.iqrs.wait_for_change(0) == 1
+
+    def test_wait_for_change_closed(self) -> None:
+        """
+        Test that closing the session wakes threads waiting for a change.
+        """
+        t = threading.Timer(0.05, self.iqrs.close)
+        t.start()
+        try:
+            assert self.iqrs.wait_for_change(0, timeout=10) == 0
+        finally:
+            t.join()
+        assert self.iqrs.closed
+        # Closed sessions return immediately.
+        assert self.iqrs.wait_for_change(0) == 0
+
+    def test_get_unadjudicated_relevancy_sample_stratified(self) -> None:
+        """
+        Test that a sample is drawn from the middle of equal-sized strata
+        across the ordered non-adjudicated results, in descending score order.
+        """
+        ordered = [('d{}'.format(i), 1. - i / 10.) for i in range(10)]
+        self.iqrs._ordered_non_adj = ordered  # type: ignore
+        actual = self.iqrs.get_unadjudicated_relevancy_sample(3)
+        # Strata of size 10/3 with middles at 1.67, 5.0 and 8.33.
+        assert actual == [ordered[1], ordered[5], ordered[8]]
+
+    def test_get_unadjudicated_relevancy_sample_small(self) -> None:
+        """
+        Test that all non-adjudicated results are returned when there are no
+        more of them than the requested sample size, and that an empty list is
+        returned in a pre-refine state.
+        """
+        assert self.iqrs.get_unadjudicated_relevancy_sample(5) == []
+        self.iqrs._ordered_non_adj = [('a', 0.9), ('b', 0.1)]  # type: ignore
+        assert self.iqrs.get_unadjudicated_relevancy_sample(2) == \
+            [('a', 0.9), ('b', 0.1)]
+        assert self.iqrs.get_unadjudicated_relevancy_sample(0) == []
+
+    def test_get_unadjudicated_relevancy_sample_negative(self) -> None:
+        """
+        Test that a negative sample size raises a ValueError.
+        """
+        with pytest.raises(ValueError, match="must not be negative"):
+            self.iqrs.get_unadjudicated_relevancy_sample(-1)
+
     def test_reset_result_cache_invalidation(self) -> None:
         """
         Test that calling the reset method resets the result view caches to
@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from smqtk_iqr.utils.descriptor_cache import DescriptorCache
+
+
+class TestDescriptorCache (unittest.TestCase):
+
+    def test_lru_eviction(self) -> None:
+        cache = DescriptorCache(max_entries=2)
+        cache.put('a', np.array([1.]))
+        cache.put('b', np.array([2.]))
+        # Touch 'a' so that 'b' is the least recently used.
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', np.array([3.]))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        v = cache.get('a')
+        assert v is not None
+        np.testing.assert_array_equal(v, [1.])
+        v = cache.get('c')
+        assert v is not None
+        np.testing.assert_array_equal(v, [3.])
+        self.assertDictEqual(cache.stats(), {
+            'hits': 3, 'disk_hits': 0, 'misses': 1, 'evictions': 1,
+            'entries': 2, 'max_entries': 2,
+        })
+
+    def test_memory_disabled(self) -> None:
+        cache = DescriptorCache(max_entries=0)
+        cache.put('a', np.array([1.]))
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+
+    def test_disk_tier(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            cache = DescriptorCache(max_entries=1, disk_dir=d)
+            cache.put('aa11', np.array([1., 2.]))
+            cache.put('bb22', np.array([3., 4.]))
+            # Evicted from memory but still on disk.
+            v = cache.get('aa11')
+            assert v is not None
+            np.testing.assert_array_equal(v, [1., 2.])
+            self.assertEqual(cache.stats()['disk_hits'], 1)
+
+            # A new cache on the same directory sees persisted vectors.
+            cache2 = DescriptorCache(max_entries=1, disk_dir=d)
+            v = cache2.get('bb22')
+            assert v is not None
+            np.testing.assert_array_equal(v, [3., 4.])
+            self.assertIsNone(cache2.get('cc33'))
+
+    def test_negative_max_entries(self) -> None:
+        self.assertRaises(ValueError, DescriptorCache, -1)
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from smqtk_iqr.utils.permutation import IndexPermutation
+
+
+class TestIndexPermutation (unittest.TestCase):
+
+    def test_bijection(self) -> None:
+        # Every index maps to a unique index in range, for sizes around the
+        # power-of-two domain boundaries.
+        for size in (0, 1, 2, 3, 4, 5, 15, 16, 17, 1000):
+            p = IndexPermutation(size, seed=7)
+            self.assertEqual(len(p), size)
+            self.assertEqual(sorted(p.page().tolist()), list(range(size)))
+
+    def test_seeded_determinism(self) -> None:
+        a = IndexPermutation(100, seed=1).page()
+        b = IndexPermutation(100, seed=1).page()
+        c = IndexPermutation(100, seed=2).page()
+        np.testing.assert_array_equal(a, b)
+        self.assertNotEqual(a.tolist(), c.tolist())
+        self.assertNotEqual(a.tolist(), list(range(100)))
+
+    def test_page_slice_semantics(self) -> None:
+        p = IndexPermutation(26, seed=3)
+        full = p.page().tolist()
+        self.assertEqual(p.page(3).tolist(), full[3:])
+        self.assertEqual(p.page(None, -4).tolist(), full[:-4])
+        self.assertEqual(p.page(7, 10).tolist(), full[7:10])
+        self.assertEqual(p.page(-5, -2).tolist(), full[-5:-2])
+        self.assertEqual(p.page(10, 7).tolist(), [])
+        self.assertEqual(p.page(20, 100).tolist(), full[20:])
+
+    def test_permute_scalar(self) -> None:
+        p = IndexPermutation(10, seed=1)
+        full = p.page()
+        with np.errstate(over='raise'):
+            for i in range(10):
+                out = p.permute(i)
+                self.assertEqual(out.shape, ())
+                self.assertEqual(int(out), full[i])
+        # Input shape is kept.
+        self.assertEqual(p.permute(np.arange(6).reshape(2, 3)).tolist(),
+                         full[:6].reshape(2, 3).tolist())
+
+    def test_permute_out_of_range(self) -> None:
+        p = IndexPermutation(10, seed=0)
+        self.assertRaises(IndexError, p.permute, 10)
+        self.assertRaises(IndexError, p.permute, np.array([0, -1]))
+
+    def test_negative_size(self) -> None:
+        self.assertRaises(ValueError, IndexPermutation, -1)
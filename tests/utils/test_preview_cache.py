@@ -0,0 +1,146 @@
+from io import BytesIO
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+
+import PIL.Image
+from smqtk_dataprovider.impls.data_element.file import DataFileElement
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
+
+from smqtk_iqr.utils.preview_cache import PreviewCache, PreviewPending
+
+
+def _png_element(width: int, height: int, color: int = 0) -> DataMemoryElement:
+    buf = BytesIO()
+    PIL.Image.new('RGB', (width, height), (color, 0, 0)).save(buf, 'PNG')
+    return DataMemoryElement(buf.getvalue(), 'image/png')
+
+
+class TestPreviewCache (unittest.TestCase):
+
+    def test_thumbnail(self) -> None:
+        elem = _png_element(400, 100)
+        with tempfile.TemporaryDirectory() as d:
+            cache = PreviewCache(d, max_dimension=64, image_format='webp')
+            fp = cache.get_preview_image(elem)
+            self.assertTrue(fp.endswith(elem.sha1() + '.webp'))
+            with PIL.Image.open(fp) as img:
+                self.assertEqual(img.format, 'WEBP')
+                self.assertEqual(img.size, (64, 16))
+            self.assertEqual(cache.total_bytes, os.path.getsize(fp))
+
+    def test_persists_across_instances(self) -> None:
+        elem = _png_element(8, 8)
+        with tempfile.TemporaryDirectory() as d:
+            fp = PreviewCache(d).get_preview_image(elem)
+            cache = PreviewCache(d)
+            self.assertEqual(cache.total_bytes, os.path.getsize(fp))
+            self.assertEqual(cache.get_preview_image(elem), fp)
+
+    def test_size_budget_eviction(self) -> None:
+        elems = [_png_element(32, 32, color=c) for c in (0, 100, 200)]
+        with tempfile.TemporaryDirectory() as d:
+            fp_a = PreviewCache(d).get_preview_image(elems[0])
+            size = os.path.getsize(fp_a)
+            os.remove(fp_a)
+
+            # Room for about two previews.
+            cache = PreviewCache(d, max_bytes=int(size * 2.5))
+            fp_a = cache.get_preview_image(elems[0])
+            fp_b = cache.get_preview_image(elems[1])
+            # Touch 'a' so that 'b' is the least recently used.
+            cache.get_preview_image(elems[0])
+            fp_c = cache.get_preview_image(elems[2])
+            self.assertTrue(os.path.isfile(fp_a))
+            self.assertFalse(os.path.isfile(fp_b))
+            self.assertTrue(os.path.isfile(fp_c))
+            self.assertLessEqual(cache.total_bytes, int(size * 2.5))
+            # Evicted previews are regenerated on request.
+            self.assertEqual(cache.get_preview_image(elems[1]), fp_b)
+            self.assertTrue(os.path.isfile(fp_b))
+
+    def test_invalid_format(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            self.assertRaises(ValueError, PreviewCache, d,
+                              image_format='BMP')
+
+    def test_metadata(self) -> None:
+        elem = _png_element(100, 50)
+        with tempfile.TemporaryDirectory() as d:
+            cache = PreviewCache(d, max_dimension=20, image_format='PNG')
+            fp = cache.get_preview_image(elem)
+            expected = {'shape': [20, 10], 'format': 'PNG',
+                        'bytes': os.path.getsize(fp)}
+            self.assertDictEqual(cache.get_metadata(fp), expected)
+            self.assertTrue(os.path.isfile(fp + PreviewCache.METADATA_EXT))
+
+            # A new instance serves metadata from the sidecar without opening
+            # the image.
+            cache = PreviewCache(d, max_dimension=20, image_format='PNG')
+            with mock.patch('PIL.Image.open') as m_open:
+                self.assertDictEqual(cache.get_metadata(fp), expected)
+                m_open.assert_not_called()
+
+    def test_get_preview_evicted_before_use(self) -> None:
+        elem = _png_element(100, 50)
+        with tempfile.TemporaryDirectory() as d:
+            cache = PreviewCache(d, max_dimension=20, image_format='PNG')
+            orig_generate = cache._generate_preview
+
+            def generate_then_evict(e: DataMemoryElement) -> str:
+                fp = orig_generate(e)
+                if m_generate.call_count == 1:
+                    os.remove(fp)
+                return fp
+
+            with mock.patch.object(cache, '_generate_preview',
+                                   side_effect=generate_then_evict) \
+                    as m_generate:
+                fp, metadata = cache.get_preview(elem)
+            self.assertEqual(m_generate.call_count, 2)
+            self.assertTrue(os.path.isfile(fp))
+            self.assertEqual(metadata['shape'], [20, 10])
+            self.assertEqual(cache.get_preview(elem), (fp, metadata))
+
+    def test_video_preview_background(self) -> None:
+        elem = DataMemoryElement(b'not really a video', 'video/mp4')
+        started = threading.Event()
+        release = threading.Event()
+
+        def fake_preview(in_fp: str, out_fp: str, out_format: str,
+                         **_: object) -> None:
+            started.set()
+            release.wait(5)
+            PIL.Image.new('RGB', (8, 4)).save(out_fp, format=out_format)
+
+        with tempfile.TemporaryDirectory() as d, \
+                mock.patch('smqtk_iqr.utils.preview_cache.video.'
+                           'ffmpeg_animated_preview',
+                           side_effect=fake_preview) as m_preview:
+            cache = PreviewCache(d, video_format='webp')
+            self.assertRaises(PreviewPending, cache.get_preview_image, elem)
+            self.assertTrue(started.wait(5))
+            # Still pending, and neither queued nor hashed again.
+            with mock.patch.object(PreviewCache, '_content_sha1') as m_sha1:
+                self.assertRaises(PreviewPending, cache.get_preview_image,
+                                  elem)
+            m_sha1.assert_not_called()
+            release.set()
+            cache._video_executor.shutdown(wait=True)
+
+            fp = cache.get_preview_image(elem)
+            self.assertTrue(fp.endswith(elem.sha1() + '.webp'))
+            self.assertEqual(cache.get_metadata(fp)['shape'], [8, 4])
+            self.assertEqual(m_preview.call_count, 1)
+            self.assertTrue(os.path.isfile(cache.placeholder_path()))
+
+    def test_file_checksum_streamed(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            fp = os.path.join(d, 'data.bin')
+            with open(fp, 'wb') as f:
+                f.write(os.urandom(3000))
+            elem = DataFileElement(fp)
+            self.assertEqual(PreviewCache._content_sha1(elem, chunk_size=1024),
+                             elem.sha1())
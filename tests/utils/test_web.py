@@ -1,4 +1,9 @@
+import io
 import unittest
+import unittest.mock as mock
+
+import requests
+
 from smqtk_iqr.utils.web import ServiceProxy
 
 
@@ -30,3 +35,62 @@ class TestServiceProxy (unittest.TestCase):
 
         test_url = 'https://this.site/bar'
         assert ServiceProxy(test_url).url == test_url
+
+    def test_requests_use_session(self) -> None:
+        """ Test that requests go through the proxy's pooled session with
+        the configured timeout, and that latency is counted per endpoint.
+        """
+        proxy = ServiceProxy('localhost:5000', timeout=3.5)
+        with mock.patch.object(proxy.session, 'request') as m_request:
+            m_request.return_value.status_code = 200
+            proxy.get('session', sid='a')
+            proxy.get('session', sid='b')
+            proxy.post('adjudicate', sid='a')
+            m_request.return_value.status_code = 503
+            proxy.delete('session', sid='a')
+
+        m_request.assert_any_call('GET', 'http://localhost:5000/session',
+                                  timeout=3.5, params={'sid': 'a'})
+        m_request.assert_any_call('POST', 'http://localhost:5000/adjudicate',
+                                  timeout=3.5, data={'sid': 'a'})
+        stats = proxy.stats()
+        self.assertSetEqual(set(stats), {'GET session', 'POST adjudicate',
+                                         'DELETE session'})
+        self.assertEqual(stats['GET session']['count'], 2)
+        self.assertEqual(stats['GET session']['errors'], 0)
+        self.assertEqual(stats['DELETE session']['errors'], 1)
+        self.assertGreaterEqual(stats['GET session']['max_seconds'],
+                                stats['GET session']['mean_seconds'])
+
+    def test_post_body(self) -> None:
+        """ Test that a raw body is sent with its content type and that
+        parameters are sent as URL arguments.
+        """
+        proxy = ServiceProxy('localhost:5000')
+        body = io.BytesIO(b'data')
+        with mock.patch.object(proxy.session, 'request') as m_request:
+            m_request.return_value.status_code = 201
+            proxy.post_body('add_external_pos', body, 'image/png', sid='a')
+        m_request.assert_called_once_with(
+            'POST', 'http://localhost:5000/add_external_pos', timeout=None,
+            params={'sid': 'a'}, data=body,
+            headers={'Content-Type': 'image/png'}
+        )
+
+    def test_request_error_counted(self) -> None:
+        proxy = ServiceProxy('localhost:5000')
+        with mock.patch.object(proxy.session, 'request',
+                               side_effect=requests.ConnectionError):
+            self.assertRaises(requests.ConnectionError, proxy.get, 'session')
+        self.assertEqual(proxy.stats()['GET session']['errors'], 1)
+
+    def test_pool_and_retries(self) -> None:
+        proxy = ServiceProxy('localhost:5000', pool_size=4, retries=3,
+                             backoff_factor=0.5)
+        adapter = proxy.session.get_adapter('http://localhost:5000')
+        self.assertEqual(adapter._pool_maxsize, 4)  # type: ignore
+        self.assertEqual(adapter.max_retries.total, 3)  # type: ignore
+        self.assertEqual(adapter.max_retries.backoff_factor,  # type: ignore
+                         0.5)
+        self.assertIn(503,
+                      adapter.max_retries.status_forcelist)  # type: ignore
@@ -1,11 +1,14 @@
 import base64
+import io
 import json
 import math
 import unittest.mock as mock
 import os
+import tempfile
+import threading
 import unittest
 
-from typing import Any
+from typing import Any, Dict, Hashable, List
 
 import pickle
 
@@ -15,8 +18,9 @@ from smqtk_iqr.iqr import IqrSession
 from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
 from smqtk_core import Pluggable
 from smqtk_core.plugin import OS_ENV_PATH_SEP
+from smqtk_iqr.utils import probability
 from smqtk_iqr.web.classifier_service.classifier_server import \
-    SmqtkClassifierService
+    SmqtkClassifierService, adjust_predictions
 
 from .dummy_classifier import DummyClassifier, DummySupervisedClassifier, \
     STUB_CLASSIFIER_MOD_PATH
@@ -226,6 +230,117 @@ class TestClassifierService (unittest.TestCase):
             self.assertDictEqual(resp_data['result'][old_label], results_exp)
             self.assertDictEqual(resp_data['result'][new_label], results_exp)
 
+    def test_classify_batch_multipart(self) -> None:
+        results_exp = dict(positive=0.5, negative=0.5)
+        self.app.classify_batch_size = 2
+        files = [(io.BytesIO(b'TEST ELEMENT %d' % i), 'f%d.txt' % i,
+                  'text/plain') for i in range(3)]
+
+        with mock.patch.object(
+            self.app.descriptor_gen, 'generate_elements',
+            wraps=self.app.descriptor_gen.generate_elements
+        ) as m_gen, self.app.test_client() as cli:
+            rv = cli.post('/classify_batch', data={'data': files},
+                          content_type='multipart/form-data')
+            self.assertStatus(rv, 200)
+            resp_data = json.loads(rv.data.decode())
+            self.assertMessage(resp_data, "Finished classification.")
+            self.assertEqual(len(resp_data['result']), 3)
+            for item_result in resp_data['result']:
+                self.assertDictEqual(item_result, {'dummy': results_exp})
+            # Three items in batches of two.
+            self.assertEqual(m_gen.call_count, 2)
+
+    def test_classify_batch_ndjson(self) -> None:
+        items = [
+            {'bytes_b64': base64.b64encode(b'A').decode(),
+             'content_type': 'text/plain'},
+            {'bytes_b64': base64.b64encode(b'B').decode()},
+        ]
+        body = '\n'.join(json.dumps(i) for i in items) + '\n'
+
+        with self.app.test_client() as cli:
+            rv = cli.post('/classify_batch?content_type=text/plain&'
+                          'adjustment=' + json.dumps({'positive': -1}),
+                          data=body, content_type='application/x-ndjson')
+            self.assertStatus(rv, 200)
+            result = json.loads(rv.data.decode())['result']
+            self.assertEqual(len(result), 2)
+            for item_result in result:
+                self.assertAlmostEqual(item_result['dummy']['positive'],
+                                       1/(1+math.exp(-1)))
+
+            # Item without a content type when there is no default.
+            rv = cli.post('/classify_batch', data=body,
+                          content_type='application/x-ndjson')
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "line 2")
+
+            rv = cli.post('/classify_batch', data='{"foo": 1}\n',
+                          content_type='application/x-ndjson')
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "Invalid item on line 1")
+
+    def test_classify_descriptor_cache(self) -> None:
+        element = base64.b64encode(b'TEST ELEMENT').decode()
+        files = [(io.BytesIO(b'TEST ELEMENT'), 'f0.txt', 'text/plain'),
+                 (io.BytesIO(b'OTHER ELEMENT'), 'f1.txt', 'text/plain'),
+                 (io.BytesIO(b'OTHER ELEMENT'), 'f2.txt', 'text/plain')]
+
+        with mock.patch.object(
+            self.app.descriptor_gen, 'generate_elements',
+            wraps=self.app.descriptor_gen.generate_elements
+        ) as m_gen, self.app.test_client() as cli:
+            for _ in range(2):
+                rv = cli.post('/classify', data={
+                    'content_type': 'text/plain',
+                    'bytes_b64': element,
+                })
+                self.assertStatus(rv, 200)
+            self.assertEqual(m_gen.call_count, 1)
+
+            # Cached content is shared with batch classification, and
+            # duplicate content in a batch is described once.
+            rv = cli.post('/classify_batch', data={'data': files},
+                          content_type='multipart/form-data')
+            self.assertStatus(rv, 200)
+            self.assertEqual(len(json.loads(rv.data.decode())['result']), 3)
+            self.assertEqual(m_gen.call_count, 2)
+            self.assertEqual(len(list(m_gen.call_args[0][0])), 1)
+
+            # Unsupported content is rejected even if the bytes are cached.
+            rv = cli.post('/classify_batch', data={
+                'data': [(io.BytesIO(b'TEST ELEMENT'), 'f.png', 'image/png')]
+            }, content_type='multipart/form-data')
+            self.assertStatus(rv, 400)
+
+            rv = cli.get('/descriptor_cache_stats')
+            self.assertStatus(rv, 200)
+            resp_data = json.loads(rv.data.decode())
+            self.assertEqual(resp_data['hits'], 2)
+            self.assertEqual(resp_data['misses'], 3)
+            self.assertEqual(resp_data['entries'], 2)
+
+    def test_classify_batch_failures(self) -> None:
+        with self.app.test_client() as cli:
+            rv = cli.post('/classify_batch', data={})
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "No data items provided")
+
+            rv = cli.post('/classify_batch', data={'label': '['})
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "Invalid label")
+
+            rv = cli.post('/classify_batch', data={'adjustment': '['})
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "not properly formatted JSON")
+
+            rv = cli.post('/classify_batch',
+                          data={'label': json.dumps(['foo'])})
+            self.assertStatus(rv, 404)
+            resp_data = json.loads(rv.data.decode())
+            self.assertListEqual(resp_data['missing_labels'], ['foo'])
+
     def test_get_add_del_classifier(self) -> None:
         old_label = 'dummy'
         new_label = 'dummy2'
@@ -269,6 +384,144 @@ class TestClassifierService (unittest.TestCase):
             self.assertMessage(resp_data, "Classifier labels.")
             self.assertSetEqual(set(resp_data['labels']), {old_label})
 
+    def test_get_add_classifier_binary(self) -> None:
+        octet = 'application/octet-stream'
+        with self.app.test_client() as cli:
+            rv = cli.get('/classifier?label=dummy', headers={'Accept': octet})
+            self.assertStatus(rv, 200)
+            self.assertEqual(rv.mimetype, octet)
+            self.assertIsInstance(pickle.loads(rv.data), DummyClassifier)
+
+            rv = cli.post('/classifier?label=dummy2&lock_label=true',
+                          data=rv.data, content_type=octet)
+            self.assertStatus(rv, 201)
+            self.assertIsInstance(
+                self.app.classifier_collection.get_classifier('dummy2'),
+                DummyClassifier
+            )
+            self.assertIn('dummy2', self.app.immutable_labels)
+
+            rv = cli.post('/classifier?label=dummy3', data=b'',
+                          content_type=octet)
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "empty or truncated")
+
+            rv = cli.post('/classifier?label=dummy3',
+                          data=pickle.dumps({'not': 'a classifier'}),
+                          content_type=octet)
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "is not a Classifier")
+
+    def test_classifier_model_store(self) -> None:
+        octet = 'application/octet-stream'
+        pickle_data = pickle.dumps(DummyClassifier.from_config({}))
+        with tempfile.TemporaryDirectory() as d:
+            self.config['classifier_model_store_dir'] = d
+            app = SmqtkClassifierService(json_config=self.config)
+            with app.test_client() as cli:
+                rv = cli.post('/classifier?label=stored', data=pickle_data,
+                              content_type=octet)
+                self.assertStatus(rv, 201)
+                rv = cli.post('/classifier', data={
+                    'label': 'stored_b64',
+                    'bytes_b64': base64.b64encode(pickle_data).decode(),
+                })
+                self.assertStatus(rv, 201)
+                rv = cli.post('/classifier?label=bad',
+                              data=pickle.dumps(1), content_type=octet)
+                self.assertStatus(rv, 400)
+                self.assertListEqual(app.model_store.labels(),  # type: ignore
+                                     ['stored', 'stored_b64'])
+
+                # Stored classifiers are streamed back from their file.
+                rv = cli.get('/classifier?label=stored',
+                             headers={'Accept': octet})
+                self.assertStatus(rv, 200)
+                self.assertEqual(rv.data, pickle_data)
+
+            # Stored classifiers are registered again without being loaded.
+            app = SmqtkClassifierService(json_config=self.config)
+            self.assertSetEqual(app.classifier_collection.labels(),
+                                {'dummy', 'stored', 'stored_b64'})
+            self.assertSetEqual(app.classifier_collection.resident_labels(),
+                                set())
+            self.assertIsInstance(
+                app.classifier_collection.get_classifier('stored'),
+                DummyClassifier
+            )
+            with app.test_client() as cli:
+                rv = cli.delete('/classifier', data={'label': 'stored'})
+                self.assertStatus(rv, 200)
+            self.assertListEqual(app.model_store.labels(),  # type: ignore
+                                 ['stored_b64'])
+
+    def test_classifier_model_store_concurrency(self) -> None:
+        """
+        Test that uploads are received without holding the model store lock
+        nor keeping the model loaded, and that a classifier removed while
+        being retrieved is not found.
+        """
+        octet = 'application/octet-stream'
+        pickle_data = pickle.dumps(DummyClassifier.from_config({}))
+        lock_free = []
+        stage = self.app.model_store.stage
+
+        def try_lock() -> None:
+            lock_free.append(
+                self.app._model_store_lock.acquire(blocking=False))
+            if lock_free[-1]:
+                self.app._model_store_lock.release()
+
+        def check_stage(*args: Any) -> str:
+            t = threading.Thread(target=try_lock)
+            t.start()
+            t.join()
+            return stage(*args)
+
+        with mock.patch.object(self.app.model_store, 'stage',
+                               side_effect=check_stage), \
+                self.app.test_client() as cli:
+            rv = cli.post('/classifier?label=stored', data=pickle_data,
+                          content_type=octet)
+            self.assertStatus(rv, 201)
+        self.assertListEqual(lock_free, [True])
+        self.assertIn('stored', self.app.classifier_collection.labels())
+        self.assertNotIn('stored',
+                         self.app.classifier_collection.resident_labels())
+
+        # Removed after the label is checked.
+        with mock.patch.object(self.app.classifier_collection, 'labels',
+                               return_value={'gone'}), \
+                self.app.test_client() as cli:
+            rv = cli.get('/classifier?label=gone', headers={'Accept': octet})
+            self.assertStatus(rv, 404)
+            rv = cli.get('/classifier?label=gone')
+            self.assertStatus(rv, 404)
+
+    def test_uploaded_classifiers_unloaded(self) -> None:
+        """
+        Test that without a configured model store directory, uploaded
+        classifiers are still stored and count towards the resident limit.
+        """
+        self.config['max_resident_classifiers'] = 1
+        app = SmqtkClassifierService(json_config=self.config)
+        pickle_data = pickle.dumps(DummyClassifier.from_config({}))
+        with app.test_client() as cli:
+            rv = cli.post('/classifier?label=uploaded', data=pickle_data,
+                          content_type='application/octet-stream')
+            self.assertStatus(rv, 201)
+        self.assertListEqual(app.model_store.labels(), ['uploaded'])
+
+        app.classifier_collection.get_classifier(self.dummy_label)
+        self.assertSetEqual(app.classifier_collection.resident_labels(),
+                            {self.dummy_label})
+        self.assertIsInstance(
+            app.classifier_collection.get_classifier('uploaded'),
+            DummyClassifier
+        )
+        self.assertSetEqual(app.classifier_collection.resident_labels(),
+                            {'uploaded'})
+
     def test_add_imm_del_classifier(self) -> None:
         pickle_data = pickle.dumps(DummyClassifier.from_config({}))
         enc_data = base64.b64encode(pickle_data).decode('utf8')
@@ -563,6 +816,125 @@ class TestClassifierService (unittest.TestCase):
                 "dummy": [{"positive": 0.5, "negative": 0.5}]
             }
 
+    def test_classify_uids_adjusted(self) -> None:
+        """ Test that adjustments are applied to all classified UIDs. """
+        self.app.descriptor_set.add_many_descriptors([
+            DescriptorMemoryElement(0).set_vector([0]),
+            DescriptorMemoryElement(1).set_vector([1]),
+        ])
+        with self.app.test_client() as cli:
+            rv = cli.post("classify_uids", data=dict(
+                uid_list=json.dumps([0, 1]),
+                adjustment=json.dumps({'positive': -1}),
+            ))
+            self.assertStatus(rv, 200)
+            result = rv.json['result']['dummy']  # type: ignore
+            self.assertEqual(len(result), 2)
+            for r in result:
+                self.assertAlmostEqual(r['positive'], 1/(1+math.exp(-1)))
+                self.assertAlmostEqual(r['negative'], 1/(1+math.exp(1)))
+
+            rv = cli.post("classify_uids", data=dict(
+                uid_list=json.dumps([0, 1]),
+                adjustment=json.dumps({'positive': 'a'}),
+            ))
+            self.assertStatus(rv, 400)
+
+            # Predictions that cannot be adjusted, not the cached ones.
+            self.app.classify_uids_cache.invalidate(self.dummy_label)
+            with mock.patch.object(DummyClassifier, '_classify_arrays',
+                                   side_effect=lambda arrays: (
+                                       {'negative': 0., 'positive': 0.}
+                                       for _ in arrays)):
+                rv = cli.post("classify_uids", data=dict(
+                    uid_list=json.dumps([0, 1]),
+                    adjustment=json.dumps({'positive': -1}),
+                ))
+                self.assertStatus(rv, 400)
+                self.assertResponseMessageRegex(
+                    rv, "At least one probability must be positive")
+
+                rv = cli.post('/classify', data={
+                    'content_type': 'text/plain',
+                    'bytes_b64': base64.b64encode(b'TEST ELEMENT').decode(),
+                    'adjustment': json.dumps({'positive': -1}),
+                })
+                self.assertStatus(rv, 400)
+                self.assertResponseMessageRegex(
+                    rv, "At least one probability must be positive")
+
+    def test_classify_uids_cached(self) -> None:
+        """ Test that repeated UIDs are only classified once per classifier
+        version. """
+        self.app.descriptor_set.add_many_descriptors([
+            DescriptorMemoryElement(0).set_vector([0]),
+            DescriptorMemoryElement(1).set_vector([1]),
+        ])
+        exp = {"positive": 0.5, "negative": 0.5}
+        with mock.patch.object(
+            DummyClassifier, '_classify_arrays',
+            autospec=True, side_effect=DummyClassifier._classify_arrays
+        ) as m_classify, mock.patch.object(
+            self.app.descriptor_set, 'get_many_vectors',
+            wraps=self.app.descriptor_set.get_many_vectors
+        ) as m_get_vecs, self.app.test_client() as cli:
+            rv = cli.post("classify_uids", data=dict(uid_list=json.dumps([0])))
+            self.assertStatus(rv, 200)
+            rv = cli.post("classify_uids",
+                          data=dict(uid_list=json.dumps([0, 1])))
+            self.assertStatus(rv, 200)
+            self.assertListEqual(rv.json['result']['dummy'],  # type: ignore
+                                 [exp, exp])
+            # Only the uncached UID is retrieved and classified again.
+            self.assertEqual(m_classify.call_count, 2)
+            self.assertListEqual(m_get_vecs.call_args[0][0], [1])
+
+            rv = cli.post("classify_uids",
+                          data=dict(uid_list=json.dumps([1, 0])))
+            self.assertStatus(rv, 200)
+            self.assertEqual(m_classify.call_count, 2)
+            self.assertEqual(m_get_vecs.call_count, 2)
+
+            # Replacing a classifier invalidates its cached results.
+            self.app.immutable_labels.clear()
+            rv = cli.delete('/classifier', data={'label': 'dummy'})
+            self.assertStatus(rv, 200)
+            self.assertEqual(len(self.app.classify_uids_cache), 0)
+            rv = cli.post('/classifier', data={
+                'label': 'dummy',
+                'bytes_b64': base64.b64encode(
+                    pickle.dumps(DummyClassifier())).decode(),
+            })
+            self.assertStatus(rv, 201)
+            rv = cli.post("classify_uids",
+                          data=dict(uid_list=json.dumps([0, 1])))
+            self.assertStatus(rv, 200)
+            self.assertEqual(m_classify.call_count, 3)
+
+            rv = cli.post("classify_uids",
+                          data=dict(uid_list=json.dumps([[0]])))
+            self.assertStatus(rv, 400)
+
+    def test_adjust_predictions(self) -> None:
+        """ Test that predictions are adjusted as one matrix. """
+        predictions: List[Dict[Hashable, float]] = [
+            {'negative': 0.5, 'positive': 0.5},
+            {'positive': 0.2, 'negative': 0.8},
+        ]
+        with mock.patch(
+            'smqtk_iqr.web.classifier_service.classifier_server.probability'
+            '.adjust_proba', wraps=probability.adjust_proba
+        ) as m_adjust:
+            adjusted = adjust_predictions(predictions, {'positive': -1})
+            m_adjust.assert_called_once()
+        e = math.exp(1)
+        self.assertAlmostEqual(adjusted[0]['positive'], e / (e + 1))
+        self.assertAlmostEqual(adjusted[1]['positive'],
+                               0.2 * e / (0.2 * e + 0.8))
+        self.assertAlmostEqual(adjusted[1]['negative'],
+                               0.8 / (0.2 * e + 0.8))
+        self.assertListEqual(adjust_predictions([], {'positive': 1}), [])
+
     def test_classify_failures(self) -> None:
         content_type = 'text/plain'
         bytes_b64 = base64.b64encode(b'TEST ELEMENT').decode()
@@ -800,6 +1172,24 @@ class TestClassifierService (unittest.TestCase):
                 rv, "Label already exists in classifier collection."
             )
 
+    def test_add_iqr_state_classifier_corrupt_state(self) -> None:
+        """
+        Test that failing to load the given IQR session state is reported as
+        such rather than as a duplicate label.
+        """
+        test_label = 'test-label-corrupt'
+        with self.app.test_client() as cli:
+            rv = cli.post('/iqr_classifier', data={
+                'bytes_b64': base64.b64encode(b"not a state file"),
+                'label': test_label,
+            })
+            self.assertStatus(rv, 500)
+            self.assertResponseMessageRegex(
+                rv, "Failed training IQR-session-based classifier for label "
+                    "'%s': " % test_label
+            )
+        self.assertNotIn(test_label, self.app.classifier_collection.labels())
+
     @mock.patch.dict(os.environ, {
         Pluggable.PLUGIN_ENV_VAR:
             OS_ENV_PATH_SEP.join([
@@ -845,3 +1235,140 @@ class TestClassifierService (unittest.TestCase):
             # classifier.
             self.assertEqual(len(self.app.classifier_collection.labels()), 2)
             self.assertIn(test_label, self.app.classifier_collection.labels())
+
+    @mock.patch.dict(os.environ, {
+        Pluggable.PLUGIN_ENV_VAR:
+            OS_ENV_PATH_SEP.join([
+                STUB_CLASSIFIER_MOD_PATH,
+                'tests.web.classifier_service.dummy_descriptor_generator',
+            ])
+    })
+    def test_add_iqr_state_classifier_model_store(self) -> None:
+        """
+        Test that IQR state classifiers are written to the model store, so
+        they may be unloaded and are registered again on restart.
+        """
+        rank_relevancy = mock.MagicMock(spec=RankRelevancy)
+        iqrs = IqrSession(rank_relevancy, session_uid=str("0"))
+        iqrs.adjudicate(
+            new_positives=[DescriptorMemoryElement(0).set_vector([0])],
+            new_negatives=[DescriptorMemoryElement(1).set_vector([1])]
+        )
+        test_iqrs_b64 = base64.b64encode(iqrs.get_state_bytes())
+        test_label = 'test-label-stored'
+
+        with tempfile.TemporaryDirectory() as d:
+            self.config['classifier_model_store_dir'] = d
+            self.config['max_resident_classifiers'] = 1
+            app = SmqtkClassifierService(json_config=self.config)
+            with app.test_client() as cli:
+                rv = cli.post('/iqr_classifier', data={
+                    'bytes_b64': test_iqrs_b64,
+                    'label': test_label,
+                })
+                self.assertStatus(rv, 201)
+            self.assertListEqual(app.model_store.labels(),  # type: ignore
+                                 [test_label])
+            self.assertListEqual(os.listdir(d),
+                                 [os.path.basename(
+                                     app.model_store.path(  # type: ignore
+                                         test_label))])
+            self.assertSetEqual(app.classifier_collection.resident_labels(),
+                                {test_label})
+            # Loading another classifier unloads the trained one.
+            app.classifier_collection.get_classifier(self.dummy_label)
+            self.assertSetEqual(app.classifier_collection.resident_labels(),
+                                {self.dummy_label})
+
+            app = SmqtkClassifierService(json_config=self.config)
+            self.assertIsInstance(
+                app.classifier_collection.get_classifier(test_label),
+                DummySupervisedClassifier
+            )
+
+    @mock.patch.dict(os.environ, {
+        Pluggable.PLUGIN_ENV_VAR:
+            OS_ENV_PATH_SEP.join([
+                STUB_CLASSIFIER_MOD_PATH,
+                'tests.web.classifier_service.dummy_descriptor_generator',
+            ])
+    })
+    def test_add_iqr_state_classifier_async(self) -> None:
+        """
+        Test asynchronous IQR classifier training and job status queries.
+        """
+        rank_relevancy = mock.MagicMock(spec=RankRelevancy)
+        iqrs = IqrSession(rank_relevancy, session_uid=str("0"))
+        iqrs.adjudicate(
+            new_positives=[DescriptorMemoryElement(0).set_vector([0])],
+            new_negatives=[DescriptorMemoryElement(1).set_vector([1])]
+        )
+        test_iqrs_b64 = base64.b64encode(iqrs.get_state_bytes())
+        test_label = 'test-label-async'
+        train_event = threading.Event()
+
+        with mock.patch(STUB_CLASSIFIER_MOD_PATH +
+                        ".DummySupervisedClassifier._train",
+                        side_effect=lambda *_: train_event.wait(5)), \
+                self.app.test_client() as cli:
+            rv = cli.post('/iqr_classifier', data={
+                'bytes_b64': test_iqrs_b64,
+                'label': test_label,
+                'async': 'true',
+            })
+            self.assertStatus(rv, 202)
+            job_id = json.loads(rv.data.decode())['job_id']
+
+            # Not visible until trained, but the label is reserved.
+            self.assertNotIn(test_label,
+                             self.app.classifier_collection.labels())
+            rv = cli.get('/iqr_classifier_job', query_string={'job_id': job_id})
+            self.assertStatus(rv, 200)
+            self.assertIn(json.loads(rv.data.decode())['status'],
+                          {'queued', 'running'})
+            rv = cli.post('/iqr_classifier', data={
+                'bytes_b64': test_iqrs_b64,
+                'label': test_label,
+            })
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "already being trained")
+
+            train_event.set()
+            self.app._training_executor.shutdown(wait=True)
+            rv = cli.get('/iqr_classifier_job', query_string={'job_id': job_id})
+            job = json.loads(rv.data.decode())
+            self.assertEqual(job['status'], 'finished')
+            self.assertEqual(job['label'], test_label)
+            self.assertIsNone(job['error'])
+            self.assertIn(test_label, self.app.classifier_collection.labels())
+
+    def test_iqr_classifier_job_failures(self) -> None:
+        with self.app.test_client() as cli:
+            rv = cli.get('/iqr_classifier_job')
+            self.assertStatus(rv, 400)
+
+            rv = cli.get('/iqr_classifier_job', query_string={'job_id': 'foo'})
+            self.assertStatus(rv, 404)
+
+            rv = cli.post('/iqr_classifier', data={
+                'bytes_b64': base64.b64encode(b'not a state'),
+                'label': 'foo',
+                'async': 'true',
+            })
+            self.assertStatus(rv, 202)
+            job_id = json.loads(rv.data.decode())['job_id']
+            self.app._training_executor.shutdown(wait=True)
+            rv = cli.get('/iqr_classifier_job', query_string={'job_id': job_id})
+            job = json.loads(rv.data.decode())
+            self.assertEqual(job['status'], 'failed')
+            self.assertIsNotNone(job['error'])
+            self.assertNotIn('foo', self.app.classifier_collection.labels())
+
+            rv = cli.post('/iqr_classifier', data={
+                'bytes_b64': base64.b64encode(b'not a state'),
+                'label': 'foo',
+                'async': 'maybe',
+            })
+            self.assertStatus(rv, 400)
+            self.assertResponseMessageRegex(rv, "Invalid boolean value for "
+                                                "'async'")
@@ -0,0 +1,126 @@
+import os
+import unittest
+import unittest.mock as mock
+from typing import Optional
+
+import numpy as np
+
+from smqtk_classifier import ClassifyDescriptor
+from smqtk_classifier.exceptions import MissingLabelError
+from smqtk_core import Pluggable
+
+from smqtk_iqr.web.classifier_service.lazy_classifier_collection import \
+    LazyClassifyDescriptorCollection
+
+from .dummy_classifier import DummyClassifier, STUB_CLASSIFIER_MOD_PATH
+
+
+KEY_C_DUMMY = "tests.web.classifier_service.dummy_classifier.DummyClassifier"
+
+
+@mock.patch.dict(os.environ, {
+    Pluggable.PLUGIN_ENV_VAR: STUB_CLASSIFIER_MOD_PATH
+})
+class TestLazyClassifyDescriptorCollection (unittest.TestCase):
+
+    def make_collection(
+        self, max_resident: Optional[int] = None
+    ) -> LazyClassifyDescriptorCollection:
+        config = LazyClassifyDescriptorCollection.get_default_config()
+        for label in ('a', 'b', 'c'):
+            config[label] = {'type': KEY_C_DUMMY, KEY_C_DUMMY: {}}
+        return LazyClassifyDescriptorCollection.from_config(
+            config, max_resident=max_resident
+        )
+
+    def test_lazy_load(self) -> None:
+        with mock.patch.object(DummyClassifier, 'from_config',
+                               wraps=DummyClassifier.from_config) as m_fc:
+            c = self.make_collection()
+            self.assertEqual(m_fc.call_count, 0)
+            self.assertSetEqual(c.labels(), {'a', 'b', 'c'})
+            self.assertEqual(c.size(), 3)
+            self.assertSetEqual(c.resident_labels(), set())
+
+            self.assertIsInstance(c.get_classifier('a'), DummyClassifier)
+            self.assertIs(c.get_classifier('a'), c.get_classifier('a'))
+            self.assertEqual(m_fc.call_count, 1)
+            self.assertSetEqual(c.resident_labels(), {'a'})
+
+            pred = c.classify_arrays([np.zeros(2)], labels=['b'])
+            self.assertListEqual(list(pred.keys()), ['b'])
+            self.assertSetEqual(c.resident_labels(), {'a', 'b'})
+
+    def test_lru_unload(self) -> None:
+        c = self.make_collection(max_resident=2)
+        c.get_classifier('a')
+        c.get_classifier('b')
+        c.get_classifier('a')
+        c.get_classifier('c')
+        # 'b' was least recently used.
+        self.assertSetEqual(c.resident_labels(), {'a', 'c'})
+        # Unloaded classifiers are still registered and re-loaded on use.
+        self.assertSetEqual(c.labels(), {'a', 'b', 'c'})
+        self.assertIsInstance(c.get_classifier('b'), DummyClassifier)
+        self.assertSetEqual(c.resident_labels(), {'b', 'c'})
+
+        # All classifiers can be used at once regardless of the limit.
+        pred = c.classify_arrays([np.zeros(2)])
+        self.assertSetEqual(set(pred.keys()), {'a', 'b', 'c'})
+        self.assertEqual(len(c.resident_labels()), 2)
+
+    def test_classify_loads_one_at_a_time(self) -> None:
+        c = self.make_collection(max_resident=1)
+        resident_while_loading = []
+        orig_load = c._label_to_loader['b']
+
+        def load_b() -> ClassifyDescriptor:
+            # The lock is not held while loading.
+            self.assertTrue(c._label_to_classifier_lock.acquire(blocking=False))
+            c._label_to_classifier_lock.release()
+            resident_while_loading.append(c.resident_labels())
+            return orig_load()
+        c._label_to_loader['b'] = load_b
+
+        it = c.iter_classifiers()
+        self.assertSetEqual(c.resident_labels(), set())
+        self.assertEqual(next(it)[0], 'a')
+        self.assertSetEqual(c.resident_labels(), {'a'})
+        self.assertEqual(next(it)[0], 'b')
+        self.assertListEqual(resident_while_loading, [{'a'}])
+        self.assertSetEqual(c.resident_labels(), {'b'})
+
+        pred = c.classify_arrays([np.zeros(2)])
+        self.assertSetEqual(set(pred.keys()), {'a', 'b', 'c'})
+        self.assertSetEqual(set(c.labels_to_classifiers().keys()),
+                            {'a', 'b', 'c'})
+        self.assertEqual(len(c.resident_labels()), 1)
+        self.assertRaises(MissingLabelError, c.iter_classifiers, ['d'])
+
+    def test_added_classifiers_stay_resident(self) -> None:
+        c = self.make_collection(max_resident=1)
+        c.add_classifier('d', DummyClassifier())
+        c.get_classifier('a')
+        c.get_classifier('b')
+        self.assertSetEqual(c.resident_labels(), {'b', 'd'})
+        self.assertRaises(ValueError, c.add_classifier, 'a',
+                          DummyClassifier())
+        self.assertSetEqual(set(c.get_config().keys()), {'a', 'b', 'c', 'd'})
+
+    def test_remove_classifier(self) -> None:
+        c = self.make_collection()
+        c.get_classifier('a')
+        c.remove_classifier('a')
+        c.remove_classifier('b')
+        self.assertSetEqual(c.labels(), {'c'})
+        self.assertSetEqual(c.resident_labels(), set())
+        self.assertRaises(KeyError, c.get_classifier, 'a')
+        self.assertRaises(KeyError, c.remove_classifier, 'a')
+        self.assertRaises(MissingLabelError, c.labels_to_classifiers, ['a'])
+
+    def test_invalid_config(self) -> None:
+        config = {'a': {'type': 'not.a.Classifier'}}
+        self.assertRaises(ValueError,
+                          LazyClassifyDescriptorCollection.from_config,
+                          config)
+        self.assertRaises(ValueError, self.make_collection, 0)
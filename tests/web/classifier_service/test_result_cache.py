@@ -0,0 +1,37 @@
+import unittest
+
+from smqtk_iqr.web.classifier_service.result_cache import \
+    ClassificationResultCache
+
+
+class TestClassificationResultCache (unittest.TestCase):
+
+    def test_versions(self) -> None:
+        cache = ClassificationResultCache()
+        cache.put_many('a', 1, ['x', 'y'], [{'p': 1.}, {'p': 0.}])
+        self.assertListEqual(cache.get_many('a', 1, ['y', 'z']),
+                             [{'p': 0.}, None])
+        self.assertListEqual(cache.get_many('a', 2, ['x']), [None])
+        self.assertListEqual(cache.get_many('b', 1, ['x']), [None])
+
+    def test_eviction(self) -> None:
+        cache = ClassificationResultCache(max_entries=2)
+        cache.put_many('a', 0, [1, 2], [{'p': 1.}, {'p': 2.}])
+        cache.get_many('a', 0, [1])
+        cache.put_many('a', 0, [3], [{'p': 3.}])
+        self.assertEqual(len(cache), 2)
+        self.assertListEqual(cache.get_many('a', 0, [1, 2, 3]),
+                             [{'p': 1.}, None, {'p': 3.}])
+
+        disabled = ClassificationResultCache(max_entries=0)
+        disabled.put_many('a', 0, [1], [{'p': 1.}])
+        self.assertEqual(len(disabled), 0)
+        self.assertRaises(ValueError, ClassificationResultCache, -1)
+
+    def test_invalidate(self) -> None:
+        cache = ClassificationResultCache()
+        cache.put_many('a', 0, [1], [{'p': 1.}])
+        cache.put_many('b', 0, [1], [{'p': 1.}])
+        cache.invalidate('a')
+        self.assertListEqual(cache.get_many('a', 0, [1]), [None])
+        self.assertListEqual(cache.get_many('b', 0, [1]), [{'p': 1.}])
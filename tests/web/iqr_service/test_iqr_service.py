@@ -2,14 +2,17 @@ import base64
 import json
 import unittest.mock as mock
 import os
+import tempfile
+import threading
+import time
 import unittest
+import numpy as np
 from werkzeug.test import Response
 from typing import Any, Generator, Optional, Dict
 
 from smqtk_relevancy import RankRelevancyWithFeedback
 
 from smqtk_descriptors import DescriptorElement
-from smqtk_classifier.impls.classification_element.memory import MemoryClassificationElement
 from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
 from smqtk_core import Pluggable
 from smqtk_iqr.iqr.iqr_session import IqrSession
@@ -55,6 +58,7 @@ class TestIqrService (unittest.TestCase):
         plugin_config['neighbor_index']['type'] = key_nn_stub
         plugin_config['rank_relevancy_with_feedback']['type'] = key_rr_stub
 
+        self.config = config
         self.app = IqrService(config)
 
     def assertStatusCode(self, r: Response, code: int) -> None:
@@ -74,6 +78,21 @@ class TestIqrService (unittest.TestCase):
         self.assertIsInstance(self.app.descriptor_generator, StubDescrGenerator)
         self.assertIsInstance(self.app.neighbor_index, StubNearestNeighborIndex)
 
+    @mock.patch.dict(os.environ, {
+        Pluggable.PLUGIN_ENV_VAR: STUB_MODULE_PATH
+    })
+    def test_classifier_history_size_default(self) -> None:
+        # A configuration without the option gets the default configured
+        # value.
+        self.assertEqual(self.app.classifier_history_size,
+                         self.config['iqr_service']['session_control']
+                         ['classifier_history_size'])
+        del self.config['iqr_service']['session_control'][
+            'classifier_history_size']
+        app = IqrService(self.config)
+        self.assertEqual(app.classifier_history_size,
+                         self.app.classifier_history_size)
+
     def test_add_descriptor_from_data_no_args(self) -> None:
         """ Test that providing no arguments causes a 400 error. """
         r = self.app.test_client().post('/add_descriptor_from_data')
@@ -141,6 +160,42 @@ class TestIqrService (unittest.TestCase):
         r_json = json.loads(r.data.decode())
         self.assertEqual(r_json['uid'], expected_descriptor_uid)
 
+    def test_add_external_pos_raw_body(self) -> None:
+        """
+        Test that external example data may be sent as the raw request body
+        instead of base64 encoded in a form.
+        """
+        descriptor = DescriptorMemoryElement('ext-uid')
+        self.app.describe_data = mock.MagicMock(  # type: ignore
+            return_value=descriptor
+        )
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback),
+                          session_uid='abc')
+        self.app.controller.add_session(iqrs)
+
+        with self.app.test_client() as tc:
+            r = tc.post('/add_external_pos?sid=abc', data=b'image bytes',
+                        content_type='image/png')
+            self.assertStatusCode(r, 201)
+            self.app.describe_data.assert_called_once_with(b'image bytes',
+                                                           'image/png')
+            assert iqrs.external_positive_descriptors == {descriptor}
+
+            r = tc.post('/add_external_neg', data=b'image bytes',
+                        content_type='image/png')
+            self.assertStatusCode(r, 400)
+            self.assertJsonMessageRegex(r, "No session id")
+
+            r = tc.post('/add_external_neg?sid=abc', data=b'',
+                        content_type='image/png')
+            self.assertStatusCode(r, 400)
+            self.assertJsonMessageRegex(r, "No or empty data provided")
+
+            # Form requests still require base64 data.
+            r = tc.post('/add_external_neg', data={'sid': 'abc'})
+            self.assertStatusCode(r, 400)
+            self.assertJsonMessageRegex(r, "No or empty base64 data provided")
+
     def test_get_nn_index_status(self) -> None:
         self.app.neighbor_index.count = mock.MagicMock(return_value=0)  # type: ignore
         with self.app.test_client() as tc:
@@ -646,6 +701,137 @@ class TestIqrService (unittest.TestCase):
             # IQR working set expected size
             assert r_json['wi_count'] == 8
 
+    def test_get_session_info_summary_etag(self) -> None:
+        """
+        Test the counts-only summary view, paging of UID lists and that
+        unchanged sessions answer conditional requests with 304.
+        """
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback),
+                          session_uid='abc')
+        iqrs.adjudicate(new_positives=[
+            DescriptorMemoryElement(uid).set_vector([0]) for uid in 'cde'
+        ])
+        self.app.controller.add_session(iqrs)
+
+        with self.app.test_client() as tc:
+            r: Response = tc.get('/session?sid=abc&summary=true')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['revision'] == iqrs.revision
+            assert r.json['change_token'] == iqrs.change_token
+            assert r.json['counts']['uuids_pos'] == 3
+            assert r.json['counts']['uuids_neg'] == 0
+            assert 'uuids_pos' not in r.json
+            etag = r.headers['ETag']
+
+            r = tc.get('/session?sid=abc&summary=true',
+                       headers={'If-None-Match': etag})
+            self.assertStatusCode(r, 304)
+            assert r.data == b''
+
+            # Different views have different ETags.
+            r = tc.get('/session?sid=abc&i=1',
+                       headers={'If-None-Match': etag})
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert len(r.json['uuids_pos']) == 2
+            assert r.json['counts']['uuids_pos'] == 3
+
+            iqrs.adjudicate(new_negatives=[
+                DescriptorMemoryElement('c').set_vector([0])
+            ])
+            r = tc.get('/session?sid=abc&summary=true',
+                       headers={'If-None-Match': etag})
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['counts']['uuids_neg'] == 1
+            assert r.headers['ETag'] != etag
+
+            r = tc.get('/session?sid=abc&summary=nope')
+            self.assertStatusCode(r, 400)
+            r = tc.get('/session?sid=abc&i=x')
+            self.assertStatusCode(r, 400)
+
+    def test_get_session_exists(self) -> None:
+        """
+        Test checking for the existence of a single session.
+        """
+        self.app.controller.add_session(
+            IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback),
+                       session_uid='abc')
+        )
+
+        with self.app.test_client() as tc:
+            r: Response = tc.get('/session_exists?sid=abc')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['sid'] == 'abc'
+            assert r.json['exists'] is True
+
+            r = tc.get('/session_exists?sid=nope')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['exists'] is False
+
+            r = tc.get('/session_exists')
+            self.assertStatusCode(r, 400)
+
+    def test_get_session_changes(self) -> None:
+        """
+        Test long-polling for session changes.
+        """
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback),
+                          session_uid='abc')
+        self.app.controller.add_session(iqrs)
+
+        with self.app.test_client() as tc:
+            r: Response = tc.get('/session_changes?sid=abc&timeout=0')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['changed'] is False
+            assert r.json['revision'] == 0
+
+            iqrs.adjudicate(new_positives=[
+                DescriptorMemoryElement('a').set_vector([0])
+            ])
+            r = tc.get('/session_changes?sid=abc&revision=0&timeout=5')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['changed'] is True
+            assert r.json['revision'] == 1
+            assert r.json['change_token'] == iqrs.change_token
+
+            r = tc.get('/session_changes?sid=abc&revision=x')
+            self.assertStatusCode(r, 400)
+            r = tc.get('/session_changes?sid=abc&timeout=x')
+            self.assertStatusCode(r, 400)
+            for timeout in ('nan', 'inf', '-inf'):
+                r = tc.get('/session_changes?sid=abc&timeout=' + timeout)
+                self.assertStatusCode(r, 400)
+            r = tc.get('/session_changes?sid=nope')
+            self.assertStatusCode(r, 404)
+
+    def test_get_session_changes_removed(self) -> None:
+        """
+        Test that long-polling a session that is removed while waiting
+        returns 404 right away.
+        """
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback),
+                          session_uid='abc')
+        self.app.controller.add_session(iqrs)
+
+        t = threading.Timer(0.05, self.app.controller.remove_session,
+                            args=('abc',))
+        t.start()
+        try:
+            with self.app.test_client() as tc:
+                s = time.monotonic()
+                r: Response = tc.get('/session_changes?sid=abc&timeout=10')
+                self.assertLess(time.monotonic() - s, 5)
+        finally:
+            t.join()
+        self.assertStatusCode(r, 404)
+
     def test_refine_no_session_id(self) -> None:
         with self.app.test_client() as tc:
             r = tc.post('/refine')
@@ -900,6 +1086,89 @@ class TestIqrService (unittest.TestCase):
             assert r_json['results'] == [[0, 0.3], [2, 0.2], [1, 0.1]]
         self.app.controller.has_session_uuid.assert_called_once_with(test_sid)
 
+    def test_get_adjudication(self) -> None:
+        """
+        Test getting the adjudication state of a single UID and of a batch of
+        UIDs.
+        """
+        iqrs = IqrSession(mock.MagicMock(spec=RankRelevancyWithFeedback))
+        iqrs.adjudicate(
+            new_positives=[DescriptorMemoryElement('a').set_vector([0])],
+            new_negatives=[DescriptorMemoryElement('b').set_vector([1])],
+        )
+        self.app.controller.has_session_uuid = mock.MagicMock(return_value=True)  # type: ignore
+        self.app.controller.get_session = mock.MagicMock(return_value=iqrs)  # type: ignore
+
+        with self.app.test_client() as tc:
+            r = tc.get('/adjudicate?sid=0&uid=a')
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['is_pos'] is True
+            assert r.json['is_neg'] is False
+
+            r = tc.get('/adjudicate?sid=0&uids={}'
+                       .format(json.dumps(['b', 'c', 'a'])))
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['results'] == [
+                ['b', False, True], ['c', False, False], ['a', True, False],
+            ]
+
+            r = tc.get('/adjudicate?sid=0&uids=not-json')
+            self.assertStatusCode(r, 400)
+            r = tc.get('/adjudicate?sid=0&uids="a"')
+            self.assertStatusCode(r, 400)
+            r = tc.get('/adjudicate?sid=0')
+            self.assertStatusCode(r, 400)
+
+            # Batches may also be sent in the request body.
+            r = tc.post('/get_adjudications', data={
+                'sid': '0', 'uids': json.dumps(['b', 'c', 'a']),
+            })
+            self.assertStatusCode(r, 200)
+            assert r.json is not None
+            assert r.json['results'] == [
+                ['b', False, True], ['c', False, False], ['a', True, False],
+            ]
+            r = tc.post('/get_adjudications', data={'sid': '0'})
+            self.assertStatusCode(r, 400)
+            r = tc.post('/get_adjudications', data={'uids': '["a"]'})
+            self.assertStatusCode(r, 400)
+
+    def test_get_unadjudicated_relevancy_sample(self) -> None:
+        """
+        Test that providing ``n`` returns a relevancy-stratified sample of the
+        non-adjudicated results instead of an index slice.
+        """
+        self.app.controller.has_session_uuid = mock.MagicMock(return_value=True)  # type: ignore
+        self.app.controller.get_session = mock.MagicMock()  # type: ignore
+        d0 = DescriptorMemoryElement(0).set_vector([0])
+        d1 = DescriptorMemoryElement(1).set_vector([1])
+        d2 = DescriptorMemoryElement(2).set_vector([2])
+        iqrs = self.app.controller.get_session()
+        iqrs.get_unadjudicated_relevancy.return_value = [
+            [d0, 0.3], [d2, 0.2], [d1, 0.1],
+        ]
+        iqrs.get_unadjudicated_relevancy_sample.return_value = [
+            [d0, 0.3], [d1, 0.1],
+        ]
+
+        with self.app.test_client() as tc:
+            r = tc.get('/get_unadjudicated_relevancy?sid=0000&n=2')
+            self.assertStatusCode(r, 200)
+            r_json: Optional[Dict] = r.json
+            assert r_json is not None
+            assert r_json['n'] == 2
+            assert r_json['total'] == 3
+            assert r_json['results'] == [[0, 0.3], [1, 0.1]]
+            iqrs.get_unadjudicated_relevancy_sample.assert_called_once_with(2)
+
+            r = tc.get('/get_unadjudicated_relevancy?sid=0000&n=-1')
+            self.assertStatusCode(r, 400)
+            self.assertJsonMessageRegex(r, "Invalid sample size")
+            r = tc.get('/get_unadjudicated_relevancy?sid=0000&n=foo')
+            self.assertStatusCode(r, 400)
+
     @mock.patch('smqtk_iqr.web.iqr_service.iqr_server.ClassifyDescriptorSupervised'
                 '.get_impls')
     def test_classify(self, m_sc_get_impls: Any) -> None:
@@ -910,32 +1179,30 @@ class TestIqrService (unittest.TestCase):
         # instance.
         m_sc_get_impls.return_value = {StubClassifier}
 
-        # Setup descriptor set to have descriptors we test query for
-        mock_descriptors = [
-            DescriptorMemoryElement('a').set_vector([0.4]),
-            DescriptorMemoryElement('b').set_vector([0.5]),
-            DescriptorMemoryElement('c').set_vector([0.6]),
-        ]
-        self.app.descriptor_set.get_many_descriptors = mock.MagicMock(  # type: ignore
-            return_value=mock_descriptors
+        # Setup descriptor set to have descriptor vectors we test query for
+        mock_vectors = {
+            'a': np.array([0.4]),
+            'b': np.array([0.5]),
+            'c': np.array([0.6]),
+        }
+        self.app.descriptor_set.get_many_vectors = mock.MagicMock(  # type: ignore
+            side_effect=lambda uids: [mock_vectors[uid] for uid in uids]
         )
         # Mock stub classifier return
-        mock_classifications = [
-            MemoryClassificationElement('', 'a'),
-            MemoryClassificationElement('', 'b'),
-            MemoryClassificationElement('', 'c'),
-        ]
-        mock_classifications[0].set_classification(
-            {'positive': 0.6, 'negative': 0.4})
-        mock_classifications[1].set_classification(
-            {'positive': 0.5, 'negative': 0.5})
-        mock_classifications[2].set_classification(
-            {'positive': 0.4, 'negative': 0.6})
-        StubClassifier.classify_elements = mock.MagicMock(  # type: ignore
-            return_value=iter(mock_classifications)
+        mock_classifications = {
+            0.4: {'positive': 0.6, 'negative': 0.4},
+            0.5: {'positive': 0.5, 'negative': 0.5},
+            0.6: {'positive': 0.4, 'negative': 0.6},
+        }
+        m_classify_arrays = mock.patch.object(
+            StubClassifier, 'classify_arrays',
+            side_effect=lambda vecs: (mock_classifications[v[0]] for v in vecs)
         )
+        m_classify_elements = mock.patch.object(StubClassifier,
+                                                'classify_elements')
 
-        with self.app.test_client() as tc:
+        with self.app.test_client() as tc, m_classify_arrays, \
+                m_classify_elements as m_ce:
             # Initialize a new session.
             tc.post("/session",
                     data=dict(
@@ -969,6 +1236,98 @@ class TestIqrService (unittest.TestCase):
             assert r_json['sid'] == '0'
             assert r_json['uuids'] == ['a', 'b', 'c']
             assert r_json['proba'] == [0.6, 0.5, 0.4]
+            # Vectors are classified directly without creating
+            # classification elements.
+            m_ce.assert_not_called()
+
+    @mock.patch('smqtk_iqr.web.iqr_service.iqr_server.ClassifyDescriptorSupervised'
+                '.get_impls')
+    def test_ensure_session_classifier_reuse(self, m_sc_get_impls: Any) -> None:
+        """
+        Test that a dirty session classifier is not retrained when the
+        adjudication state it was trained on has not changed, and that a
+        previous classifier is restored when the adjudication state reverts.
+        """
+        m_sc_get_impls.return_value = {StubClassifier}
+        self.app.classifier_config['type'] = \
+            "tests.web.iqr_service.stubs.StubClassifier"
+
+        with mock.patch.object(StubClassifier, '_train') as m_train:
+            self.app.test_client().post("/session", data=dict(sid="0"))
+            iqrs = self.app.controller.get_session("0")
+            p0 = DescriptorMemoryElement(0).set_vector([0.0])
+            n0 = DescriptorMemoryElement(1).set_vector([1.0])
+            n1 = DescriptorMemoryElement(2).set_vector([0.9])
+            iqrs.positive_descriptors.add(p0)
+            iqrs.negative_descriptors.add(n0)
+
+            c1, _, _ = self.app._ensure_session_classifier(iqrs)
+            assert m_train.call_count == 1
+            self.app.session_classification_results["0"]['a'] = 0.5
+
+            # Marked dirty without an effective change: no retraining and the
+            # results cache is kept.
+            self.app.session_classifier_dirty["0"] = True
+            c2, _, _ = self.app._ensure_session_classifier(iqrs)
+            assert c2 is c1
+            assert m_train.call_count == 1
+            assert self.app.session_classification_results["0"] == {'a': 0.5}
+
+            # Changed adjudications train a new classifier with a new cache.
+            iqrs.negative_descriptors.add(n1)
+            self.app.session_classifier_dirty["0"] = True
+            c3, _, _ = self.app._ensure_session_classifier(iqrs)
+            assert c3 is not c1
+            assert m_train.call_count == 2
+            assert self.app.session_classification_results["0"] == {}
+
+            # Reverting restores the previous classifier and its cache.
+            iqrs.negative_descriptors.remove(n1)
+            self.app.session_classifier_dirty["0"] = True
+            c4, _, _ = self.app._ensure_session_classifier(iqrs)
+            assert c4 is c1
+            assert m_train.call_count == 2
+            assert self.app.session_classification_results["0"] == {'a': 0.5}
+
+    @mock.patch('smqtk_iqr.web.iqr_service.iqr_server.ClassifyDescriptorSupervised'
+                '.get_impls')
+    def test_classification_precompute(self, m_sc_get_impls: Any) -> None:
+        """
+        Test that training a session classifier with precomputation enabled
+        scores the session working set in the background.
+        """
+        m_sc_get_impls.return_value = {StubClassifier}
+        self.app.precompute_enabled = True
+        self.app.precompute_batch_size = 2
+
+        def classify_arrays(array_iter: Any) -> Generator:
+            for v in array_iter:
+                yield {'positive': float(v[0]), 'negative': 1 - float(v[0])}
+
+        with mock.patch.object(StubClassifier, '_train'), \
+                mock.patch.object(StubClassifier, '_classify_arrays',
+                                  side_effect=classify_arrays):
+            self.app.test_client().post("/session", data=dict(sid="0"))
+            iqrs = self.app.controller.get_session("0")
+            iqrs.positive_descriptors.add(
+                DescriptorMemoryElement(0).set_vector([0.0]))
+            iqrs.negative_descriptors.add(
+                DescriptorMemoryElement(1).set_vector([1.0]))
+            iqrs.working_set.add_many_descriptors([
+                DescriptorMemoryElement(uid).set_vector([v])
+                for uid, v in [('a', 0.1), ('b', 0.2), ('c', 0.3)]
+            ])
+
+            self.app._ensure_session_classifier(iqrs)
+            # Finished threads are no longer tracked.
+            deadline = time.monotonic() + 10
+            while "0" in self.app._precompute_threads and \
+                    time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert "0" not in self.app._precompute_threads
+            assert self.app.session_classification_results["0"] == {
+                'a': 0.1, 'b': 0.2, 'c': 0.3
+            }
 
     def test_get_iqr_state_no_sid(self) -> None:
         # Test that calling GET /state with no SID results in error.
@@ -1181,3 +1540,37 @@ class TestIqrService (unittest.TestCase):
             self.assertStatusCode(r, 200)
             assert r.json is not None
             assert r.json['results'] == result_all[7:10]
+
+    def test_get_random_uids_seeded_key_index(self) -> None:
+        """
+        Test that with a configured seed and key index the random ordering is
+        stable across service instances and that the key index is used instead
+        of re-scanning the descriptor set.
+        """
+        expected = list(map(chr, range(97, 97+26)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, 'keys.npy')
+            self.app.random_uid_seed = 42
+            self.app.random_uid_key_index_path = index_path
+            self.app.descriptor_set.keys = mock.MagicMock(  # type: ignore
+                return_value=list(expected)
+            )
+            with self.app.test_client() as tc:
+                r = tc.get('/random_uids')
+                self.assertStatusCode(r, 200)
+                assert r.json is not None
+                result1 = r.json['results']
+            assert sorted(result1) == expected
+            assert os.path.isfile(index_path)
+            self.app.descriptor_set.keys.assert_called_once()  # type: ignore
+
+            # Simulate a service restart.
+            self.app._random_uid_keys = None
+            self.app.descriptor_set.keys.reset_mock()  # type: ignore
+            with self.app.test_client() as tc:
+                r = tc.get('/random_uids?i=2&j=-3')
+                self.assertStatusCode(r, 200)
+                assert r.json is not None
+                assert r.json['total'] == 26
+                assert r.json['results'] == result1[2:-3]
+            self.app.descriptor_set.keys.assert_not_called()  # type: ignore
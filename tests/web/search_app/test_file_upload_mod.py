@@ -0,0 +1,82 @@
+from io import BytesIO
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+
+import flask
+from smqtk_core import Pluggable
+
+from smqtk_iqr.web.search_app import IqrSearchDispatcher
+from smqtk_iqr.web.search_app.modules.file_upload.FileUploadMod import (
+    FileUploadMod
+)
+
+
+class TestFileUploadMod (unittest.TestCase):
+    """
+    Unit tests pertaining to the FileUploadMod class.
+    """
+
+    @mock.patch.dict(os.environ, {
+        Pluggable.PLUGIN_ENV_VAR: __name__
+    })
+    def setUp(self) -> None:
+        self.dispatcher_app = IqrSearchDispatcher(
+            IqrSearchDispatcher.get_default_config()
+        )
+        self.work_dir = tempfile.TemporaryDirectory()
+        # Routes are wrapped at construction, so skip the login check there.
+        with mock.patch.object(self.dispatcher_app.module_login,
+                               'login_required', new=lambda f: f):
+            self.mod = FileUploadMod('uploader', self.dispatcher_app,
+                                     self.work_dir.name,
+                                     url_prefix='/uploader')
+        self.app = flask.Flask(__name__)
+        self.app.register_blueprint(self.mod)
+
+    def tearDown(self) -> None:
+        self.work_dir.cleanup()
+
+    def _params(self, chunk: int) -> dict:
+        return {
+            'flowIdentifier': 'fid',
+            'flowChunkNumber': chunk,
+            'flowTotalChunks': 3,
+            'flowChunkSize': 4,
+            'flowTotalSize': 10,
+            'flowFilename': 'data.bin',
+        }
+
+    def _post_chunk(self, tc: object, chunk: int, data: bytes) -> None:
+        params = self._params(chunk)
+        params['file'] = (BytesIO(data), 'blob')
+        r = tc.post('/uploader/upload_chunk', data=params,  # type: ignore
+                    content_type='multipart/form-data')
+        self.assertEqual(r.status_code, 200)
+
+    def test_out_of_order_chunks(self) -> None:
+        """
+        Test that chunks are written at their offsets as they arrive and that
+        received chunks are reported for resuming.
+        """
+        with self.app.test_client() as tc:
+            self._post_chunk(tc, 3, b'89')
+            self._post_chunk(tc, 1, b'0123')
+            self.assertEqual(
+                tc.get('/uploader/upload_chunk',
+                       query_string=self._params(1)).status_code, 200)
+            self.assertEqual(
+                tc.get('/uploader/upload_chunk',
+                       query_string=self._params(2)).status_code, 204)
+            self.assertNotIn('fid', self.mod._completed_files)
+            self._post_chunk(tc, 2, b'4567')
+
+        path = self.mod.get_path_for_id('fid')
+        self.assertEqual(os.path.splitext(path)[1], '.bin')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'0123456789')
+        # Partial upload state and its lock are cleaned up.
+        self.assertDictEqual(self.mod._partial_paths, {})
+        self.assertDictEqual(self.mod._received_chunks, {})
+        self.assertDictEqual(self.mod._fid_locks, {})
@@ -1,9 +1,17 @@
+from io import BytesIO
+import json
 import os
+import tempfile
 import unittest
 import unittest.mock as mock
 
+import PIL.Image
+
+from smqtk_iqr.utils.web import ServiceProxy
 from smqtk_iqr.web.search_app.modules.iqr.iqr_search import IqrSearch
 from smqtk_iqr.web.search_app import IqrSearchDispatcher
+from smqtk_dataprovider.impls.data_element.file import DataFileElement
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
 from smqtk_dataprovider.impls.data_set.memory import DataMemorySet
 
 from smqtk_core import Pluggable
@@ -38,3 +46,196 @@ class TestIqrSearch (unittest.TestCase):
 
         assert app.mod_upload is not None
         assert app.mod_static_dir is not None
+
+    def test_iqr_service_client_config(self) -> None:
+        """
+        Test that IQR service client options are passed to its proxy.
+        """
+        client_config = {'pool_size': 3, 'timeout': 2.0}
+        app = IqrSearch(self.dispatcher_app, "test", self.dataset, ".",
+                        iqr_service_client=client_config)
+
+        assert app._iqr_service.pool_size == 3
+        assert app._iqr_service.timeout == 2.0
+        assert app.get_config()['iqr_service_client'] == client_config
+
+    def test_get_current_iqr_session_cached(self) -> None:
+        """
+        Test that session existence is checked directly with the service and
+        only again once the cached check expires.
+        """
+        with tempfile.TemporaryDirectory() as work_dir:
+            app = IqrSearch(self.dispatcher_app, "test", self.dataset,
+                            work_dir, session_cache_ttl=60)
+            m_service = mock.MagicMock(spec=ServiceProxy)
+            m_service.get.return_value.json.return_value = {'exists': False}
+            app._iqr_service = m_service
+
+            with mock.patch(IqrSearch.__module__ + '.flask.session',
+                            new=mock.Mock(sid='abc')):
+                assert app.get_current_iqr_session() == 'abc'
+                assert app.get_current_iqr_session() == 'abc'
+                m_service.get.assert_called_once_with('session_exists',
+                                                      sid='abc')
+                m_service.post.assert_called_once_with('session', sid='abc')
+
+                # Expired entries are checked again.
+                app._known_sids['abc'] = 0
+                m_service.get.return_value.json.return_value = \
+                    {'exists': True}
+                assert app.get_current_iqr_session() == 'abc'
+                assert m_service.get.call_count == 2
+                assert m_service.post.call_count == 1
+
+    def test_get_adjudications(self) -> None:
+        """
+        Test that adjudication status of many UIDs is proxied with a single
+        IQR service request.
+        """
+        # Routes are wrapped at construction, so skip the login check there.
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(self.dispatcher_app.module_login,
+                                  'login_required', new=lambda f: f):
+            app = IqrSearch(self.dispatcher_app, "test", self.dataset,
+                            work_dir)
+            m_service = mock.MagicMock(spec=ServiceProxy)
+            m_service.post.return_value.json.return_value = {
+                'results': [['a', True, False], ['b', False, False]]
+            }
+            app._iqr_service = m_service
+            app.get_current_iqr_session = mock.Mock(  # type: ignore
+                return_value='abc')
+
+            with app.test_client() as tc:
+                r = tc.post('/get_adjudications',
+                            data={'uids': json.dumps(['a', 'b'])})
+            assert r.status_code == 200
+            assert r.json == {
+                'results': [['a', True, False], ['b', False, False]]
+            }
+            m_service.post.assert_called_once_with(
+                'get_adjudications', sid='abc', uids=json.dumps(['a', 'b'])
+            )
+
+    def test_get_data_preview_images(self) -> None:
+        """
+        Test that previews of many UIDs are returned parallel to the given
+        UIDs, with failures reported per UID.
+        """
+        buf = BytesIO()
+        PIL.Image.new('RGB', (4, 2)).save(buf, format='PNG')
+        elem = DataMemoryElement(buf.getvalue(), 'image/png')
+        self.dataset.add_data(elem)
+
+        # Routes are wrapped at construction, so skip the login check there.
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(self.dispatcher_app.module_login,
+                                  'login_required', new=lambda f: f):
+            app = IqrSearch(self.dispatcher_app, "test", self.dataset,
+                            work_dir, preview_workers=2)
+            app.get_current_iqr_session = mock.Mock(  # type: ignore
+                return_value='abc')
+
+            with app.test_client() as tc:
+                r = tc.post('/get_data_preview_images', data={
+                    'uids': json.dumps([elem.uuid(), 'missing',
+                                        elem.uuid()])
+                })
+            assert r.status_code == 200
+            results = r.get_json()['results']
+            assert len(results) == 3
+            assert results[0]['success']
+            assert results[0]['shape'] == [4, 2]
+            assert results[0]['static_preview_link'].startswith(
+                'static/data/previews/')
+            assert results[0]['static_file_link'] == \
+                'get_data_file?uid=' + str(elem.uuid())
+            assert results[2] == results[0]
+            assert not results[1]['success']
+            # Data files are not copied into the static directory.
+            assert os.listdir(os.path.join(work_dir, 'static')) == \
+                ['previews']
+
+    def test_get_data_preview_images_failures(self) -> None:
+        """
+        Test that failing to generate some previews of a batch fails only
+        their results.
+        """
+        buf = BytesIO()
+        PIL.Image.new('RGB', (4, 2)).save(buf, format='PNG')
+        good = DataMemoryElement(buf.getvalue(), 'image/png')
+        bad_image = DataMemoryElement(b'not an image', 'image/png')
+        bad_video = DataMemoryElement(b'not a video', 'video/mp4')
+        self.dataset.add_data(good, bad_image, bad_video)
+        uids = json.dumps([bad_image.uuid(), good.uuid(), bad_video.uuid()])
+
+        # Routes are wrapped at construction, so skip the login check there.
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(self.dispatcher_app.module_login,
+                                  'login_required', new=lambda f: f), \
+                mock.patch('smqtk_iqr.utils.preview_cache.video.'
+                           'ffmpeg_animated_preview',
+                           side_effect=OSError("No ffmpeg")):
+            app = IqrSearch(self.dispatcher_app, "test", self.dataset,
+                            work_dir)
+            app.get_current_iqr_session = mock.Mock(  # type: ignore
+                return_value='abc')
+
+            with app.test_client() as tc:
+                r = tc.post('/get_data_preview_images', data={'uids': uids})
+                assert r.status_code == 200
+                results = r.get_json()['results']
+                assert not results[0]['success']
+                assert results[1]['success']
+                assert results[2]['preview_pending']
+
+                # The video preview failure surfaces once done.
+                app._preview_cache._video_executor.shutdown(wait=True)
+                r = tc.post('/get_data_preview_images', data={'uids': uids})
+            assert r.status_code == 200
+            results = r.get_json()['results']
+            assert [res['success'] for res in results] == [False, True, False]
+            assert 'No ffmpeg' in results[2]['message']
+            assert results[1]['shape'] == [4, 2]
+
+    def test_get_data_file(self) -> None:
+        """
+        Test that data files are served in place, with range support, and
+        that in-memory data is served from memory.
+        """
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(self.dispatcher_app.module_login,
+                                  'login_required', new=lambda f: f):
+            fp = os.path.join(work_dir, 'data.png')
+            with open(fp, 'wb') as f:
+                f.write(b'0123456789')
+            file_elem = DataFileElement(fp, readonly=True)
+            mem_elem = DataMemoryElement(b'abc', 'text/plain')
+            self.dataset.add_data(file_elem, mem_elem)
+
+            app = IqrSearch(self.dispatcher_app, "test", self.dataset,
+                            work_dir)
+            app.get_current_iqr_session = mock.Mock(  # type: ignore
+                return_value='abc')
+
+            with app.test_client() as tc:
+                r = tc.get('/get_data_file',
+                           query_string={'uid': file_elem.uuid()},
+                           headers={'Range': 'bytes=2-5'})
+                assert r.status_code == 206
+                assert r.data == b'2345'
+                assert r.mimetype == 'image/png'
+                r.close()
+
+                r = tc.get('/get_data_file',
+                           query_string={'uid': mem_elem.uuid()})
+                assert r.status_code == 200
+                assert r.data == b'abc'
+                r.close()
+
+                r = tc.get('/get_data_file', query_string={'uid': 'missing'})
+                assert r.status_code == 404
+            # Nothing was copied into the static directory.
+            static_dir = os.path.join(work_dir, 'static')
+            assert not os.path.isdir(static_dir) or \
+                set(os.listdir(static_dir)) <= {'previews'}